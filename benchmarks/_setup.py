@@ -0,0 +1,44 @@
+"""Shared set-up for the benchmark scripts.
+
+Each script calls setup() to configure Django against a throwaway SQLite file
+(the configured database is never touched) and seed() to fill it.
+"""
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'mysite.settings')
+
+
+def setup():
+    """Set Django up with a fresh database in a temporary file and return its path."""
+    import django
+
+    django.setup()
+    from django.db import connection
+    from django.test.utils import setup_test_environment
+
+    setup_test_environment()
+    path = os.path.join(tempfile.mkdtemp(prefix='ku-polls-bench-'), 'bench.sqlite3')
+    connection.settings_dict['TEST']['NAME'] = path
+    connection.creation.create_test_db(verbosity=0, autoclobber=True)
+    return path
+
+
+def seed(questions=10, choices=5, users=50):
+    """Create published questions with choices and voters, and return (questions, users)."""
+    from django.contrib.auth.models import User
+    from django.utils import timezone
+    from polls.models import Choice, Question
+
+    now = timezone.now()
+    created = [Question.objects.create(question_text=f'Benchmark question {number}',
+                                       pub_date=now - timezone.timedelta(days=number + 1))
+               for number in range(questions)]
+    Choice.objects.bulk_create([Choice(question=question, choice_text=f'Choice {number}')
+                                for question in created for number in range(choices)])
+    User.objects.bulk_create([User(username=f'bench-voter-{number}') for number in range(users)])
+    return created, list(User.objects.filter(username__startswith='bench-voter-').order_by('pk'))
@@ -0,0 +1,113 @@
+"""Compare requests/sec of the polls views under the WSGI and ASGI handlers.
+
+Both handlers run in-process with the full middleware stack: WSGI requests
+come from a pool of threads, ASGI requests from coroutines on one event loop,
+with the same number of requests in flight. Each worker is logged in as its
+own voter. The vote rate limits and load shedding are off unless
+--rate-limit is given; either way, votes turned away with 429 or 503 are
+reported apart from errors. Prints one JSON object per (endpoint, handler)
+pair.
+
+    python benchmarks/asgi_vs_wsgi.py --requests 2000 --concurrency 100
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import _setup
+
+
+def wsgi_run(clients, send, total):
+    """Send total requests from one thread per client and return (seconds, statuses)."""
+    pool = iter(clients)
+    lock = threading.Lock()
+    local = threading.local()
+
+    def request(number):
+        if not hasattr(local, 'client'):
+            with lock:
+                local.client = next(pool)
+        return send(local.client, number).status_code
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(len(clients)) as executor:
+        statuses = list(executor.map(request, range(total)))
+    return time.perf_counter() - started, statuses
+
+
+def asgi_run(clients, send, total):
+    """Send total requests from one coroutine per client and return (seconds, statuses)."""
+    async def main():
+        numbers = iter(range(total))
+        statuses = []
+
+        async def worker(client):
+            for number in numbers:
+                statuses.append((await send(client, number)).status_code)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker(client) for client in clients))
+        return time.perf_counter() - started, statuses
+
+    return asyncio.run(main())
+
+
+def main():
+    """Run every endpoint under both handlers."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=1000)
+    parser.add_argument('--concurrency', type=int, default=50)
+    parser.add_argument('--rate-limit', action='store_true', help='keep the vote rate limits and load shedding on')
+    options = parser.parse_args()
+    _setup.setup()
+    from contextlib import nullcontext
+    from django.test import AsyncClient, Client
+    from django.urls import reverse
+    from polls.models import Choice
+    from polls.ratelimit import limits_off
+
+    questions, voters = _setup.seed(users=options.concurrency)
+    question = questions[0]
+    choice_ids = list(Choice.objects.filter(question=question).values_list('pk', flat=True))
+    urls = {
+        'index': reverse('polls:index'),
+        'results': reverse('polls:results', args=(question.id,)),
+        'detail': reverse('polls:detail', args=(question.id,)),
+    }
+    vote_url = reverse('polls:vote', args=(question.id,))
+
+    def clients(client_class):
+        # a failed request (e.g. "database is locked") is counted as a 500, not raised
+        made = [client_class(raise_request_exception=False) for _ in voters]
+        for client, voter in zip(made, voters):
+            client.force_login(voter)
+        return made
+
+    handlers = {'wsgi': (Client, wsgi_run), 'asgi': (AsyncClient, asgi_run)}
+    for name, (handler, (client_class, run)) in itertools.product([*urls, 'vote'], handlers.items()):
+        if name == 'vote':
+            def send(client, number):
+                return client.post(vote_url, {'choice': choice_ids[number % len(choice_ids)]})
+        else:
+            def send(client, number, url=urls[name]):
+                return client.get(url)
+        with nullcontext() if options.rate_limit else limits_off():
+            seconds, statuses = run(clients(client_class), send, options.requests)
+        print(json.dumps({
+            'endpoint': name,
+            'handler': handler,
+            'concurrency': options.concurrency,
+            'requests': options.requests,
+            'errors': sum(status >= 400 and status not in (429, 503) for status in statuses),
+            'rate_limited': statuses.count(429),
+            'overloaded': statuses.count(503),
+            'requests_per_second': round(options.requests / seconds, 1),
+        }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""Measure the overhead of the request metrics (polls.metrics) on the polls views.
+
+Each view is requested in-process with and without MetricsMiddleware and the
+query timing wrapper, alternating request by request. The fastest of several
+rounds of each is kept, and the slowdown is printed as JSON per view.
+
+The end-to-end numbers are noisy on a busy machine, so the fixed cost of the
+middleware around a trivial view and of timing one query are printed as well.
+
+    python benchmarks/metrics_overhead.py --requests 500 --rounds 5
+"""
+import argparse
+import json
+import time
+
+import _setup
+
+
+def main():
+    """Time every view with and without metrics."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--requests', type=int, default=500, help='requests per round')
+    parser.add_argument('--rounds', type=int, default=5)
+    options = parser.parse_args()
+    _setup.setup()
+    from django.conf import settings
+    from django.db import connection
+    from django.http import HttpResponse
+    from django.test import Client, RequestFactory
+    from django.test.utils import override_settings
+    from django.urls import reverse
+    from polls.metrics import MetricsMiddleware, RequestStats, _current, time_queries
+
+    questions, voters = _setup.seed(users=1)
+    question = questions[0]
+    urls = {
+        'index': reverse('polls:index'),
+        'detail': reverse('polls:detail', args=(question.id,)),
+        'results': reverse('polls:results', args=(question.id,)),
+    }
+    # a client builds its middleware chain on its first request and keeps it
+    clients = {}
+    without = [name for name in settings.MIDDLEWARE if name != 'polls.metrics.MetricsMiddleware']
+    for metrics, middleware in ((True, settings.MIDDLEWARE), (False, without)):
+        with override_settings(MIDDLEWARE=middleware):
+            clients[metrics] = Client()
+            clients[metrics].force_login(voters[0])
+            clients[metrics].get(urls['index'])
+
+    def timed(url, metrics):
+        wrappers = connection.execute_wrappers
+        if not metrics:
+            wrappers.remove(time_queries)
+        try:
+            started = time.perf_counter()
+            clients[metrics].get(url)
+            return time.perf_counter() - started
+        finally:
+            if not metrics:
+                wrappers.append(time_queries)
+
+    connection.ensure_connection()
+    for name, url in urls.items():
+        # alternate request by request, so that noise hits both sides alike
+        best = {True: float('inf'), False: float('inf')}
+        for _ in range(options.rounds):
+            seconds = {True: 0.0, False: 0.0}
+            for _ in range(options.requests):
+                for metrics in (False, True):
+                    seconds[metrics] += timed(url, metrics)
+            best = {metrics: min(best[metrics], seconds[metrics]) for metrics in best}
+        print(json.dumps({
+            'view': name,
+            'requests': options.requests,
+            'ms_per_request': round(best[False] * 1000 / options.requests, 3),
+            'ms_per_request_with_metrics': round(best[True] * 1000 / options.requests, 3),
+            'overhead_percent': round(100 * (best[True] / best[False] - 1), 2),
+        }))
+
+    request = RequestFactory().get(urls['index'])
+    middleware = MetricsMiddleware(lambda request: HttpResponse())
+    count = options.requests * 100
+    started = time.perf_counter()
+    for _ in range(count):
+        middleware(request)
+    per_request = (time.perf_counter() - started) / count
+    _current.set(RequestStats())
+    started = time.perf_counter()
+    for _ in range(count):
+        time_queries(lambda *args: None, 'SELECT 1', (), False, {})
+    per_query = (time.perf_counter() - started) / count
+    print(json.dumps({
+        'middleware_us_per_request': round(per_request * 1e6, 2),
+        'timing_us_per_query': round(per_query * 1e6, 2),
+    }))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,62 @@
+"""Measure the cost of the vote rate limits and the write queue (polls.ratelimit).
+
+Each check is timed in a loop over many voters, for the memory and the cache
+buckets (through the configured cache, sync and async), and the time per
+check is printed as JSON in microseconds, together with the cost of taking
+and giving back a place in the write queue.
+
+    python benchmarks/ratelimit_overhead.py --checks 100000 --voters 1000
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import _setup
+
+
+def main():
+    """Time the limiter's checks and the write queue."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--checks', type=int, default=100000)
+    parser.add_argument('--voters', type=int, default=1000, help='distinct users the checks are spread over')
+    options = parser.parse_args()
+    _setup.setup()
+    from django.core.cache import cache
+    from polls.ratelimit import BACKENDS, VoteLimiter, WriteQueue
+
+    # limits no check reaches, so every check does the full work of an allowed vote
+    rate = (options.checks, 60)
+
+    def timed(function):
+        started = time.perf_counter()
+        function()
+        return round((time.perf_counter() - started) * 1e6 / options.checks, 3)
+
+    for name, buckets in BACKENDS.items():
+        limiter = VoteLimiter(rate, rate, buckets())
+        cache.clear()
+        sync = timed(lambda: [limiter.check(number % options.voters, number % 10) for number in range(options.checks)])
+        cache.clear()
+
+        async def checks():
+            for number in range(options.checks):
+                await limiter.acheck(number % options.voters, number % 10)
+        print(json.dumps({
+            'backend': name,
+            'checks': options.checks,
+            'us_per_check': sync,
+            'us_per_async_check': timed(lambda: asyncio.run(checks())),
+        }))
+
+    queue = WriteQueue(50)
+
+    def slots():
+        for _ in range(options.checks):
+            with queue.slot():
+                pass
+    print(json.dumps({'write_queue_us_per_vote': timed(slots)}))
+
+
+if __name__ == '__main__':
+    main()
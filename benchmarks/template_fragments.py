@@ -0,0 +1,72 @@
+"""Measure the time the cached choice list and results table fragments save.
+
+The detail and results pages of a question are requested in-process, either
+with their fragment cached or with it dropped before the request (outside the
+timing), so that it is rendered again, alternating request by request. The
+fastest of several rounds of each is kept and printed as JSON per page.
+
+    python benchmarks/template_fragments.py --choices 20 --requests 500 --rounds 5
+"""
+import argparse
+import json
+import time
+
+import _setup
+
+
+def main():
+    """Time the detail and results pages with and without their cached fragment."""
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--choices', type=int, default=20, help='choices of the question')
+    parser.add_argument('--requests', type=int, default=500, help='requests per round')
+    parser.add_argument('--rounds', type=int, default=5)
+    options = parser.parse_args()
+    _setup.setup()
+    from django.core.cache import cache
+    from django.core.cache.utils import make_template_fragment_key
+    from django.test import Client
+    from django.urls import reverse
+    from polls.cache import _version_key, results_version
+
+    questions, voters = _setup.seed(questions=1, choices=options.choices, users=1)
+    question = questions[0]
+    client = Client()
+    client.force_login(voters[0])
+    pages = {
+        'detail': (reverse('polls:detail', args=(question.id,)),
+                   lambda: make_template_fragment_key('polls_detail_choices', [
+                       question.id, cache.get(_version_key(question.id, 'choices')), None])),
+        'results': (reverse('polls:results', args=(question.id,)),
+                    lambda: make_template_fragment_key('polls_results_table', [
+                        question.id, results_version(question.id)])),
+    }
+
+    def timed(url, fragment_key, cached):
+        if not cached:
+            cache.delete(fragment_key())
+        started = time.perf_counter()
+        client.get(url)
+        return time.perf_counter() - started
+
+    for name, (url, fragment_key) in pages.items():
+        client.get(url)
+        # alternate request by request, so that noise hits both sides alike
+        best = {True: float('inf'), False: float('inf')}
+        for _ in range(options.rounds):
+            seconds = {True: 0.0, False: 0.0}
+            for _ in range(options.requests):
+                for cached in (False, True):
+                    seconds[cached] += timed(url, fragment_key, cached)
+            best = {cached: min(best[cached], seconds[cached]) for cached in best}
+        print(json.dumps({
+            'page': name,
+            'choices': options.choices,
+            'requests': options.requests,
+            'ms_per_request_rendered': round(best[False] * 1000 / options.requests, 3),
+            'ms_per_request_cached': round(best[True] * 1000 / options.requests, 3),
+            'saved_percent': round(100 * (1 - best[True] / best[False]), 2),
+        }))
+
+
+if __name__ == '__main__':
+    main()
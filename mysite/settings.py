@@ -47,32 +47,58 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # MetricsMiddleware comes first so that it times the whole request
+    "polls.metrics.MetricsMiddleware",
     "django.middleware.security.SecurityMiddleware",
+    # SessionMiddleware manages sessions spanning multiple requests
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
+    # AuthenticationMiddleware associates a user with session and requests
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
-    # SessionMiddleware manages sessions spanning multiple requests
-    'django.contrib.sessions.middleware.SessionMiddleware',
-    # AuthenticationMiddleware associates a user with session and requests
-    'django.contrib.auth.middleware.AuthenticationMiddleware',
+    # ReplicaReadMiddleware lets read-only requests read polls from the replicas
+    'polls.routers.ReplicaReadMiddleware',
 ]
 
+# Sessions and logged-in users are only served from the cache when it is
+# shared by every process (CACHE_BACKEND is not LocMem or Dummy, see CACHES):
+# with a per-process cache, a logout or a deactivated user would only be
+# forgotten by the process that handled the request.
+POLLS_SHARED_CACHE = config('CACHE_BACKEND', default='django.core.cache.backends.locmem.LocMemCache') not in (
+    'django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache')
+
 AUTHENTICATION_BACKENDS = [
-    # username/password authentication
-    'django.contrib.auth.backends.ModelBackend',
+    # username/password authentication, with logged-in users kept in the
+    # cache when it is shared
+    'polls.auth.CachedModelBackend' if POLLS_SHARED_CACHE else 'django.contrib.auth.backends.ModelBackend',
 ]
 
+# Sessions are read from a shared cache and written through to the database
+# (cached_db), or only kept in the database without one (db);
+# "django.contrib.sessions.backends.signed_cookies" keeps them in the browser
+# instead and needs no storage at all.
+SESSION_ENGINE = config('SESSION_ENGINE', default='django.contrib.sessions.backends.{}'.format(
+    'cached_db' if POLLS_SHARED_CACHE else 'db'))
+# Seconds a logged-in user is served from the cache before being read again
+POLLS_USER_CACHE_TIMEOUT = config('POLLS_USER_CACHE_TIMEOUT', default=60, cast=int)
+
 ROOT_URLCONF = "mysite.urls"
 
 TEMPLATES = [
     {
         'BACKEND': 'django.template.backends.django.DjangoTemplates',
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
-        'APP_DIRS': True,
         'OPTIONS': {
+            # compiled templates are kept in memory; runserver's autoreloader
+            # clears them when a template changes
+            'loaders': [
+                ('django.template.loaders.cached.Loader', [
+                    'django.template.loaders.filesystem.Loader',
+                    'django.template.loaders.app_directories.Loader',
+                ]),
+            ],
             'context_processors': [
                 'django.template.context_processors.debug',
                 'django.template.context_processors.request',
@@ -89,13 +115,96 @@ WSGI_APPLICATION = "mysite.wsgi.application"
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# mysite.sqlite3 is Django's SQLite backend plus the PRAGMAs and transaction
+# mode below, so that concurrent voters wait for the write lock instead of
+# failing with "database is locked".
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.sqlite3",
-        "NAME": BASE_DIR / "db.sqlite3",
+        "ENGINE": "mysite.sqlite3",
+        "NAME": config("DATABASE_NAME", default=BASE_DIR / "db.sqlite3"),
+        # seconds to keep connections open between requests, checking them
+        # before reuse; only worth it under WSGI (e.g. 600), because under ASGI
+        # each request runs in a new thread and never reuses a connection
+        # (Django ticket #33497), which would only leave idle ones open
+        "CONN_MAX_AGE": config("DATABASE_CONN_MAX_AGE", default=0, cast=int),
+        "CONN_HEALTH_CHECKS": config("DATABASE_CONN_HEALTH_CHECKS", default=True, cast=bool),
+        "OPTIONS": {
+            "transaction_mode": config("SQLITE_TRANSACTION_MODE", default="IMMEDIATE"),
+            "pragmas": {
+                "journal_mode": config("SQLITE_JOURNAL_MODE", default="WAL"),
+                "synchronous": config("SQLITE_SYNCHRONOUS", default="NORMAL"),
+                # milliseconds to wait for a lock before "database is locked"
+                "busy_timeout": config("SQLITE_BUSY_TIMEOUT", default=5000, cast=int),
+                # bytes of the file read through mmap, 0 turns it off
+                "mmap_size": config("SQLITE_MMAP_SIZE", default=128 * 1024 * 1024, cast=int),
+                # page cache per connection, negative is in KiB
+                "cache_size": config("SQLITE_CACHE_SIZE", default=-32000, cast=int),
+            },
+        },
+    }
+}
+
+# Read replicas: comma-separated database files that are copies of the primary
+# (kept in sync with `manage.py sync_replicas`), with an optional weight each.
+# Read-only requests read polls from them, see polls/routers.py.
+DATABASE_REPLICAS = config("DATABASE_REPLICAS", default="", cast=Csv())
+DATABASE_REPLICA_WEIGHTS = config("DATABASE_REPLICA_WEIGHTS", default="", cast=Csv(int))
+POLLS_REPLICAS = {}
+for number, (name, weight) in enumerate(zip(DATABASE_REPLICAS, DATABASE_REPLICA_WEIGHTS + [1] * len(DATABASE_REPLICAS)),
+                                        start=1):
+    DATABASES[f"replica{number}"] = {**DATABASES["default"], "NAME": name, "TEST": {"MIRROR": "default"}}
+    POLLS_REPLICAS[f"replica{number}"] = weight
+DATABASE_ROUTERS = ["polls.routers.ReplicaRouter"]
+# Bearer token Prometheus must send to read /metrics (empty: only logged-in staff can read it)
+POLLS_METRICS_TOKEN = config("POLLS_METRICS_TOKEN", default="")
+# Seconds a browser that wrote something reads from the primary only
+POLLS_REPLICA_PIN_SECONDS = config("POLLS_REPLICA_PIN_SECONDS", default=5, cast=int)
+
+
+# Cache
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# Use a shared backend (e.g. Redis or Memcached) when running several
+# processes, so results invalidation after a vote reaches all of them.
+
+CACHES = {
+    "default": {
+        "BACKEND": config('CACHE_BACKEND',
+                          default='django.core.cache.backends.locmem.LocMemCache',
+                          cast=str),
+        "LOCATION": config('CACHE_LOCATION', default='ku-polls', cast=str),
     }
 }
 
+# seconds a computed results payload stays cached (it is also dropped on vote)
+POLLS_RESULTS_CACHE_TIMEOUT = config('POLLS_RESULTS_CACHE_TIMEOUT', default=300, cast=int)
+# seconds a results or choices version lives in the cache; with a per-process
+# cache, this bounds how long another process serves results from before a vote
+POLLS_VERSION_CACHE_TIMEOUT = config('POLLS_VERSION_CACHE_TIMEOUT', default=300, cast=int)
+# upper bound in seconds for caching the index list (it also expires at the
+# next publication or end date, and is dropped when a question is saved)
+POLLS_INDEX_CACHE_TIMEOUT = config('POLLS_INDEX_CACHE_TIMEOUT', default=3600, cast=int)
+# Live results stream (needs the ASGI server): updates per second per poll,
+# seconds between keep-alive comments, and seconds before a stream is recycled
+POLLS_STREAM_MAX_RATE = config('POLLS_STREAM_MAX_RATE', default=2, cast=float)
+POLLS_STREAM_HEARTBEAT = config('POLLS_STREAM_HEARTBEAT', default=15, cast=int)
+POLLS_STREAM_MAX_AGE = config('POLLS_STREAM_MAX_AGE', default=300, cast=int)
+
+# Write-behind vote buffer: votes are appended to a staging table and applied
+# in batches by `manage.py flush_votes` (see polls/voting.py).
+POLLS_VOTE_BUFFER = config('POLLS_VOTE_BUFFER', default=False, cast=bool)
+POLLS_VOTE_BUFFER_BATCH = config('POLLS_VOTE_BUFFER_BATCH', default=500, cast=int)
+POLLS_VOTE_BUFFER_INTERVAL = config('POLLS_VOTE_BUFFER_INTERVAL', default=1.0, cast=float)
+
+# Vote rate limits (see polls/ratelimit.py) as votes/seconds, empty for none,
+# counted in this process ("memory") or in the shared cache ("cache")
+POLLS_VOTE_RATE_USER = config('POLLS_VOTE_RATE_USER', default='10/60')
+POLLS_VOTE_RATE_QUESTION = config('POLLS_VOTE_RATE_QUESTION', default='')
+POLLS_RATE_LIMIT_BACKEND = config('POLLS_RATE_LIMIT_BACKEND', default='memory')
+# votes a process lets queue for the database before answering 503 (0 for no limit),
+# and the seconds it then asks voters to wait
+POLLS_MAX_PENDING_WRITES = config('POLLS_MAX_PENDING_WRITES', default=50, cast=int)
+POLLS_OVERLOAD_RETRY_AFTER = config('POLLS_OVERLOAD_RETRY_AFTER', default=1, cast=int)
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -132,6 +241,23 @@ USE_TZ = True
 # https://docs.djangoproject.com/en/4.1/howto/static-files/
 
 STATIC_URL = "static/"
+# where collectstatic puts the files
+STATIC_ROOT = config('STATIC_ROOT', default=os.path.join(BASE_DIR, 'staticfiles'))
+
+STORAGES = {
+    "default": {
+        "BACKEND": "django.core.files.storage.FileSystemStorage",
+    },
+    # "mysite.staticfiles.CompressedManifestStaticFilesStorage" gives files
+    # content-hashed names and writes precompressed copies; it needs
+    # collectstatic to have run before any page can be rendered
+    "staticfiles": {
+        "BACKEND": config('STATICFILES_STORAGE',
+                          default='django.contrib.staticfiles.storage.StaticFilesStorage'),
+    },
+}
+# Serve STATIC_ROOT from the app itself (mysite.staticfiles.serve), without a separate web server
+SERVE_STATIC = config('SERVE_STATIC', default=False, cast=bool)
 
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.1/ref/settings/#default-auto-field
@@ -0,0 +1 @@
+"""SQLite database backend tuned for many concurrent requests."""
@@ -0,0 +1,51 @@
+"""SQLite backend that sets PRAGMAs on every new connection and begins transactions IMMEDIATE.
+
+Django's sqlite3 backend passes OPTIONS straight to sqlite3.connect, so two
+extra keys are taken out first:
+
+    pragmas -- dict of PRAGMA name to value run on each new connection,
+               e.g. {'journal_mode': 'WAL', 'busy_timeout': 5000}
+    transaction_mode -- DEFERRED (SQLite's default), IMMEDIATE or EXCLUSIVE
+
+With WAL, readers never block the writer and the writer never blocks readers.
+A DEFERRED transaction that reads before it writes can still fail at once with
+"database is locked" when another writer committed in between (busy_timeout
+does not help there), so transactions take the write lock up front with
+IMMEDIATE and wait for it for up to busy_timeout milliseconds instead.
+"""
+import re
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+PRAGMA_VALUE = re.compile(r'^-?\w+$')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """sqlite3 DatabaseWrapper with connection PRAGMAs and a transaction mode."""
+
+    def get_connection_params(self):
+        """Return the sqlite3.connect arguments without the options handled here."""
+        options = self.settings_dict['OPTIONS']
+        self.pragmas = dict(options.get('pragmas', {}))
+        self.transaction_mode = options.get('transaction_mode', 'DEFERRED').upper()
+        if self.transaction_mode not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f"transaction_mode must be one of {', '.join(TRANSACTION_MODES)}, not {self.transaction_mode!r}.")
+        for name, value in self.pragmas.items():
+            if not (PRAGMA_VALUE.match(name) and PRAGMA_VALUE.match(str(value))):
+                raise ImproperlyConfigured(f"Invalid SQLite pragma {name}={value!r}.")
+        params = super().get_connection_params()
+        params.pop('pragmas', None)
+        params.pop('transaction_mode', None)
+        return params
+
+    def get_new_connection(self, conn_params):
+        """Open a connection and apply the configured PRAGMAs to it."""
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        self.cursor().execute(f'BEGIN {self.transaction_mode}')
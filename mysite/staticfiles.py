@@ -0,0 +1,144 @@
+"""Content-hashed, precompressed static files and a view serving them.
+
+CompressedManifestStaticFilesStorage is a ManifestStaticFilesStorage (file
+names carry a hash of their content, listed in staticfiles.json) that also
+writes a gzip and, when the optional ``brotli`` package is installed, a
+brotli copy of every text file next to it during ``collectstatic``. A copy
+that would not be smaller is not kept.
+
+serve() answers requests for those files from STATIC_ROOT. It picks the
+smallest precompressed copy the client accepts, so nothing is compressed per
+request, and sends hashed names with an immutable, year-long Cache-Control
+(their content can never change under the same name). Files go out as a
+FileResponse, which WSGI servers send with sendfile() where they can.
+"""
+import gzip
+import mimetypes
+import os
+import re
+from django.conf import settings
+from django.contrib.staticfiles.storage import ManifestStaticFilesStorage
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+COMPRESSIBLE = frozenset(('.css', '.js', '.map', '.svg', '.json', '.txt', '.html', '.xml'))
+# in order of preference, the smallest first
+ENCODINGS = (('br', '.br'), ('gzip', '.gz'))
+IMMUTABLE = 'public, max-age=31536000, immutable'
+# ManifestStaticFilesStorage puts 12 hex digits of the MD5 before the extension
+HASHED_NAME = re.compile(r'\.[0-9a-f]{12}\.[^./]+$')
+
+
+def _compressors():
+    yield '.gz', lambda data: gzip.compress(data, compresslevel=9, mtime=0)
+    if brotli is not None:
+        yield '.br', lambda data: brotli.compress(data, quality=11)
+
+
+class CompressedManifestStaticFilesStorage(ManifestStaticFilesStorage):
+    """ManifestStaticFilesStorage that also writes .gz (and .br) copies of text files."""
+
+    def post_process(self, paths, dry_run=False, **options):
+        """Hash the files as usual, then compress the originals and their hashed copies."""
+        yield from super().post_process(paths, dry_run, **options)
+        if dry_run:
+            return
+        names = set()
+        for name in paths:
+            if os.path.splitext(name)[1].lower() in COMPRESSIBLE:
+                names.update((name, self.stored_name(name)))
+        for name in sorted(names):
+            for compressed in self.compress(name):
+                yield compressed, compressed, True
+
+    def compress(self, name):
+        """Write the compressed copies of a stored file that are smaller than it, and return their names."""
+        path = self.path(name)
+        with open(path, 'rb') as file:
+            data = file.read()
+        written = []
+        for suffix, compress in _compressors():
+            compressed = compress(data)
+            if len(compressed) < len(data):
+                with open(path + suffix, 'wb') as file:
+                    file.write(compressed)
+                written.append(name + suffix)
+            elif os.path.exists(path + suffix):
+                # left over from an earlier version of the file
+                os.remove(path + suffix)
+        return written
+
+
+def accepted_encodings(header):
+    """Return the content codings an Accept-Encoding header allows (quality above zero)."""
+    accepted = set()
+    for part in header.split(','):
+        coding, _, params = part.partition(';')
+        quality = 1.0
+        for param in params.split(';'):
+            name, _, value = param.strip().partition('=')
+            if name == 'q':
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        if quality > 0:
+            accepted.add(coding.strip().lower())
+    if '*' in accepted:
+        accepted.update(encoding for encoding, _ in ENCODINGS)
+    return accepted
+
+
+def _cache_control(path):
+    return IMMUTABLE if HASHED_NAME.search(path) else 'no-cache'
+
+
+@require_safe
+def serve(request, path):
+    """Serve a collected static file, precompressed when the client accepts it.
+
+    Arguments:
+        request {HTTP_REQUEST}
+        path {str} -- file name relative to STATIC_ROOT
+
+    Raises:
+        Http404: if there is no such file, or the path leads out of STATIC_ROOT.
+    """
+    try:
+        fullpath = safe_join(settings.STATIC_ROOT, path)
+    except SuspiciousFileOperation:
+        raise Http404('No such static file.')
+    if not os.path.isfile(fullpath) or os.path.splitext(fullpath)[1] in ('.gz', '.br'):
+        raise Http404('No such static file.')
+    accepted = accepted_encodings(request.headers.get('Accept-Encoding', ''))
+    encoding, filename = None, fullpath
+    for candidate, suffix in ENCODINGS:
+        if candidate in accepted and os.path.isfile(fullpath + suffix):
+            encoding, filename = candidate, fullpath + suffix
+            break
+    stat = os.stat(fullpath)
+    # each encoding is a different representation, so it has its own ETag
+    etag = f'"{int(stat.st_mtime):x}-{stat.st_size:x}{"-" + encoding if encoding else ""}"'
+    response = get_conditional_response(request, etag=etag, last_modified=int(stat.st_mtime))
+    if response is None:
+        content_type = mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+        response = FileResponse(open(filename, 'rb'), content_type=content_type)
+        # FileResponse names the file it sends, which would be the compressed copy
+        response.headers.pop('Content-Disposition', None)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+    # a 304 carries the validators too, so caches can refresh the copy they hold
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(stat.st_mtime)
+    response.headers['Cache-Control'] = _cache_control(path)
+    patch_vary_headers(response, ('Accept-Encoding',))
+    return response
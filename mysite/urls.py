@@ -13,15 +13,22 @@ Including another URLconf
     1. Import the include() function: from django.urls import include, path
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
+import re
+from django.conf import settings
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from django.views.generic import RedirectView
-from . import views
+from polls.metrics import metrics_view
+from . import staticfiles, views
 
 urlpatterns = [
     path("admin/", admin.site.urls),
     path("polls/", include('polls.urls')),
     path('', RedirectView.as_view(url='/polls/')),
     path('accounts/', include('django.contrib.auth.urls')),
-    path('signup', views.signup, name='signup')
+    path('signup', views.signup, name='signup'),
+    path('metrics', metrics_view, name='metrics'),
 ]
+
+if settings.SERVE_STATIC:
+    urlpatterns.append(re_path(rf'^{re.escape(settings.STATIC_URL.lstrip("/"))}(?P<path>.+)$', staticfiles.serve))
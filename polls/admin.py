@@ -1,6 +1,11 @@
 """Import admin and models from django.contrib and .models."""""
+from django import forms
 from django.contrib import admin
-from .models import Question, Choice
+from django.core.exceptions import ValidationError
+from django.db.models import Sum
+from .models import Question, Choice, Vote
+from .pagination import ApproximateCountPaginator
+from .voting import delete_votes, record_vote
 
 
 class ChoiceInline(admin.StackedInline):
@@ -8,6 +13,29 @@ class ChoiceInline(admin.StackedInline):
 
     model = Choice
     extra = 3
+    # the tally is maintained by polls.voting, an admin save must not overwrite it
+    readonly_fields = ('votes',)
+
+
+class VotingStateFilter(admin.SimpleListFilter):
+    """Filter questions by voting state, in SQL through QuestionQuerySet."""
+
+    title = 'voting state'
+    parameter_name = 'voting'
+
+    def lookups(self, request, model_admin):
+        """Offer open, closed and recently published questions."""
+        return [('open', 'Open for voting'), ('closed', 'Closed'), ('recent', 'Published recently')]
+
+    def queryset(self, request, queryset):
+        """Narrow the questions down to the chosen state."""
+        if self.value() == 'open':
+            return queryset.open_for_voting()
+        if self.value() == 'closed':
+            return queryset.closed()
+        if self.value() == 'recent':
+            return queryset.recent()
+        return queryset
 
 
 class QuestionAdmin(admin.ModelAdmin):
@@ -20,8 +48,87 @@ class QuestionAdmin(admin.ModelAdmin):
     ]
     inlines = [ChoiceInline]
     list_display = ('question_text', 'pub_date',
-                    'was_published_recently', 'end_date')
+                    'was_published_recently', 'end_date', 'total_votes')
+    # pub_date and end_date are indexed, so the date filters are index range scans
+    list_filter = [VotingStateFilter, 'pub_date', 'end_date']
+    date_hierarchy = 'pub_date'
+
+    def get_queryset(self, request):
+        """Add each question's vote total from the stored tallies, in the changelist query itself."""
+        return super().get_queryset(request).annotate(total_votes=Sum('choice__votes'))
+
+    @admin.display(ordering='total_votes', description='Votes')
+    def total_votes(self, question):
+        """Return the question's total votes."""
+        return question.total_votes or 0
+
+
+class ChoiceAdmin(admin.ModelAdmin):
+    """ChoiceAdmin."""
+
+    list_display = ('choice_text', 'question', 'votes')
+    list_select_related = ('question',)
+    raw_id_fields = ('question',)
+    readonly_fields = ('votes',)
+
+
+class VoteAdminForm(forms.ModelForm):
+    """Vote form that only accepts a choice of the vote's question."""
+
+    class Meta:
+        """All fields, the voter and question are read-only once the vote exists."""
+
+        model = Vote
+        fields = '__all__'
+
+    def clean(self):
+        """Check that the choice belongs to the vote's question.
+
+        Raises:
+            ValidationError: on the choice, if it belongs to another question.
+        """
+        cleaned_data = super().clean()
+        choice = cleaned_data.get('choice')
+        question = cleaned_data.get('question')
+        question_id = question.pk if question is not None else self.instance.question_id
+        if choice is not None and not self.has_error('question') and choice.question_id != question_id:
+            self.add_error('choice', ValidationError("Pick a choice of the vote's question.", code='other_question'))
+        return cleaned_data
+
+
+class VoteAdmin(admin.ModelAdmin):
+    """VoteAdmin for millions of votes.
+
+    Related objects are joined into the changelist query and picked by id in
+    the form (no select boxes listing every user and choice), and the page
+    count is estimated instead of counting the whole table.
+    """
+
+    list_display = ('id', 'user', 'question', 'choice')
+    list_select_related = ('user', 'question', 'choice')
+    raw_id_fields = ('user', 'question', 'choice')
+    form = VoteAdminForm
+    paginator = ApproximateCountPaginator
+    show_full_result_count = False
+
+    def get_readonly_fields(self, request, obj=None):
+        """The voter and question of an existing vote are fixed, only its choice can change."""
+        return ('user', 'question') if obj else ()
+
+    def save_model(self, request, obj, form, change):
+        """Save through record_vote, which keeps the choice tallies in step (VoteAdminForm checked the choice)."""
+        record_vote(obj.user, obj.choice)
+        obj.pk = Vote.objects.only('pk').get(user=obj.user, question_id=obj.question_id).pk
+
+    def delete_model(self, request, obj):
+        """Delete the vote and take it off its choice's tally."""
+        delete_votes(Vote.objects.filter(pk=obj.pk))
+
+    def delete_queryset(self, request, queryset):
+        """Delete the selected votes and take them off the tallies with one grouped UPDATE."""
+        delete_votes(queryset)
 
 
 admin.site.register(Question, QuestionAdmin)
-admin.site.register(Choice)
+admin.site.register(Choice, ChoiceAdmin)
+admin.site.register(Vote, VoteAdmin)
@@ -7,3 +7,7 @@ class PollsConfig(AppConfig):
 
     default_auto_field = "django.db.models.BigAutoField"
     name = "polls"
+
+    def ready(self):
+        """Connect the signal receivers and register the system checks."""
+        from . import checks, signals  # noqa: F401
@@ -0,0 +1,37 @@
+"""Authentication backend that keeps logged-in users in the cache.
+
+Django's AuthenticationMiddleware already loads the user only once per
+request. CachedModelBackend also keeps the user in the cache for
+``POLLS_USER_CACHE_TIMEOUT`` seconds, so that later requests of the same user
+do not read ``auth_user`` at all. Saving or deleting a user drops the cached
+copy (see polls.signals), so a changed password or a deactivation takes effect
+on the next request.
+"""
+from django.conf import settings
+from django.contrib.auth.backends import ModelBackend
+from django.core.cache import cache
+
+USER_TIMEOUT = getattr(settings, 'POLLS_USER_CACHE_TIMEOUT', 60)
+
+
+def _user_key(user_id):
+    return f'polls:user:{user_id}'
+
+
+def forget_user(user_id):
+    """Drop the cached copy of a user."""
+    cache.delete(_user_key(user_id))
+
+
+class CachedModelBackend(ModelBackend):
+    """ModelBackend whose get_user serves users from the cache."""
+
+    def get_user(self, user_id):
+        """Return the active user with this id, from the cache when possible."""
+        key = _user_key(user_id)
+        user = cache.get(key)
+        if user is None:
+            user = super().get_user(user_id)
+            if user is not None:
+                cache.set(key, user, USER_TIMEOUT)
+        return user
@@ -0,0 +1,208 @@
+"""Cached index list and results payloads for polls app.
+
+Each question has a results version stored in the cache. Computed results are
+stored under a key that includes that version, so bumping the version after a
+vote, or after one of the question's choices is saved or deleted, is enough
+to make every process sharing the cache stop serving the old payload. With a
+per-process cache (LocMem, the default) a bump only reaches the process that
+made it; the others keep their version until it expires, after
+VERSION_TIMEOUT seconds, so they can serve stale results (and ETags) for that
+long. Run several processes with a shared cache (``check --deploy`` warns).
+
+The choice list markup of the detail page and the results table are cached
+as template fragments (see templates/polls/) keyed on a choices version of
+the question (the table on its results version too), which is bumped whenever one of its choices is saved or deleted
+(incl. admin edits); votes do not change it.
+
+The index list only changes when a question is edited or when a publication
+or end date passes, so it is cached until the next such date.
+
+Cache misses are filled from the primary database, never a read replica
+(see polls.routers): a lagging replica could otherwise be cached under the
+version that was bumped for a vote it has not received yet.
+"""
+import time
+from django.conf import settings
+from django.core.cache import cache
+from django.db.models import Min, Q
+from django.utils import timezone
+from .metrics import record_cache_lookup
+from .models import Choice, Question
+from .routers import primary
+
+RESULTS_TIMEOUT = getattr(settings, 'POLLS_RESULTS_CACHE_TIMEOUT', 300)
+INDEX_TIMEOUT = getattr(settings, 'POLLS_INDEX_CACHE_TIMEOUT', 3600)
+INDEX_KEY = 'polls:index'
+# a version that expires is replaced by a new one, so nothing cached under it is served again
+VERSION_TIMEOUT = getattr(settings, 'POLLS_VERSION_CACHE_TIMEOUT', RESULTS_TIMEOUT)
+
+
+def _version_key(question_id, kind='results'):
+    return f'polls:{kind}-version:{question_id}'
+
+
+def _current_version(key):
+    """Return the version stored under key.
+
+    A missing version (never set, expired or evicted) starts at the current
+    time in nanoseconds, so it can never match anything cached before.
+    """
+    version = cache.get(key)
+    if version is None:
+        version = time.time_ns()
+        if not cache.add(key, version, VERSION_TIMEOUT):
+            version = cache.get(key, version)
+    return version
+
+
+async def _acurrent_version(key):
+    """Async version of _current_version."""
+    version = await cache.aget(key)
+    if version is None:
+        version = time.time_ns()
+        if not await cache.aadd(key, version, VERSION_TIMEOUT):
+            version = await cache.aget(key, version)
+    return version
+
+
+def results_version(question_id):
+    """Return the current results version of a question."""
+    return _current_version(_version_key(question_id))
+
+
+async def aresults_version(question_id):
+    """Async version of results_version."""
+    return await _acurrent_version(_version_key(question_id))
+
+
+def results_versions(question_ids):
+    """Return the current results version of each question, fetched with one cache read."""
+    keys = {_version_key(question_id): question_id for question_id in question_ids}
+    versions = {keys[key]: version for key, version in cache.get_many(keys).items()}
+    for question_id in question_ids:
+        if question_id not in versions:
+            versions[question_id] = results_version(question_id)
+    return versions
+
+
+def bump_results_version(question_id):
+    """Invalidate the cached results of a question after its votes or choices changed."""
+    cache.set(_version_key(question_id), time.time_ns(), VERSION_TIMEOUT)
+
+
+async def achoices_version(question_id):
+    """Return the current choices version of a question, for the detail and results fragment keys."""
+    return await _acurrent_version(_version_key(question_id, 'choices'))
+
+
+def bump_choices_version(question_id):
+    """Invalidate the cached choice list markup of a question after a choice changed."""
+    cache.set(_version_key(question_id, 'choices'), time.time_ns(), VERSION_TIMEOUT)
+
+
+def _choice_rows(question_id):
+    return Choice.objects.filter(question_id=question_id).order_by('pk').values('id', 'choice_text', 'votes')
+
+
+def results_payload(question_id, choices):
+    """Return the results payload of a question from its choices' ``id``, ``choice_text`` and ``votes``."""
+    total = sum(choice['votes'] for choice in choices)
+    for choice in choices:
+        choice['percent'] = round(100 * choice['votes'] / total, 1) if total else 0
+    return {'question_id': question_id, 'total': total, 'choices': choices}
+
+
+def _results_key(question_id, version):
+    return f'polls:results:{question_id}:{version}'
+
+
+def compute_results(question_id):
+    """Build the results payload of a question from its stored tallies in one query.
+
+    Returns:
+        dict: ``total`` votes and a ``choices`` list with each choice's
+        ``id``, ``choice_text``, ``votes`` and ``percent`` of the total.
+    """
+    return results_payload(question_id, list(_choice_rows(question_id)))
+
+
+def get_results(question_id):
+    """Return the results payload of a question, computing it only on a cache miss."""
+    key = _results_key(question_id, results_version(question_id))
+    payload = cache.get(key)
+    record_cache_lookup(payload is not None)
+    if payload is None:
+        with primary():
+            payload = compute_results(question_id)
+        cache.set(key, payload, RESULTS_TIMEOUT)
+    return payload
+
+
+async def aget_results(question_id):
+    """Async version of get_results."""
+    key = _results_key(question_id, await aresults_version(question_id))
+    payload = await cache.aget(key)
+    record_cache_lookup(payload is not None)
+    if payload is None:
+        with primary():
+            payload = results_payload(question_id, [choice async for choice in _choice_rows(question_id)])
+        await cache.aset(key, payload, RESULTS_TIMEOUT)
+    return payload
+
+
+def _latest_published(now):
+    return Question.objects.published(now).filter(available=True).order_by('-pub_date')[:5]
+
+
+def _upcoming_dates(now):
+    return {
+        'next_pub': Min('pub_date', filter=Q(pub_date__gt=now)),
+        'next_end': Min('end_date', filter=Q(end_date__gt=now)),
+    }
+
+
+def _index_timeout(now, upcoming):
+    """Return how long the index list computed at now stays valid.
+
+    That is until the next publication or end date (rounded down, so the
+    entry never outlives it), and at most INDEX_TIMEOUT seconds.
+    """
+    boundary = min((date for date in upcoming.values() if date), default=None)
+    if boundary is None:
+        return INDEX_TIMEOUT
+    return min(INDEX_TIMEOUT, int((boundary - now).total_seconds()))
+
+
+def latest_questions():
+    """Return the last five published, available questions for the index page.
+
+    The list is cached until the next question is published or closes (at most
+    INDEX_TIMEOUT seconds), and dropped when a question or choice is saved.
+    """
+    questions = cache.get(INDEX_KEY)
+    record_cache_lookup(questions is not None)
+    if questions is None:
+        now = timezone.now()
+        with primary():
+            questions = list(_latest_published(now))
+            upcoming = Question.objects.aggregate(**_upcoming_dates(now))
+        cache.set(INDEX_KEY, questions, _index_timeout(now, upcoming))
+    return questions
+
+
+async def alatest_questions():
+    """Async version of latest_questions."""
+    questions = await cache.aget(INDEX_KEY)
+    record_cache_lookup(questions is not None)
+    if questions is None:
+        now = timezone.now()
+        with primary():
+            questions = [question async for question in _latest_published(now)]
+            upcoming = await Question.objects.aaggregate(**_upcoming_dates(now))
+        await cache.aset(INDEX_KEY, questions, _index_timeout(now, upcoming))
+    return questions
+
+
+def clear_latest_questions():
+    """Drop the cached index list."""
+    cache.delete(INDEX_KEY)
@@ -0,0 +1,45 @@
+"""System checks for polls app."""
+from django.conf import settings
+from django.core.checks import Tags, Warning, register
+
+PER_PROCESS_CACHES = ('django.core.cache.backends.locmem.LocMemCache', 'django.core.cache.backends.dummy.DummyCache')
+CACHED_SESSION_ENGINES = ('django.contrib.sessions.backends.cache', 'django.contrib.sessions.backends.cached_db')
+
+
+@register(Tags.caches)
+def check_shared_cache(app_configs, **kwargs):
+    """Warn when sessions or logged-in users are cached in a per-process cache.
+
+    A logout, session flush or deactivation would then only be forgotten by
+    the process that handled it, while the others keep serving their copy.
+    """
+    warnings = []
+    session_cache = settings.CACHES.get(getattr(settings, 'SESSION_CACHE_ALIAS', 'default'), {})
+    if settings.SESSION_ENGINE in CACHED_SESSION_ENGINES and session_cache.get('BACKEND') in PER_PROCESS_CACHES:
+        warnings.append(Warning(
+            f"SESSION_ENGINE {settings.SESSION_ENGINE} keeps sessions in a per-process cache.",
+            hint="Use a shared CACHE_BACKEND (e.g. Redis or Memcached), or the db session engine.",
+            id='polls.W001'))
+    if ('polls.auth.CachedModelBackend' in settings.AUTHENTICATION_BACKENDS
+            and settings.CACHES['default']['BACKEND'] in PER_PROCESS_CACHES):
+        warnings.append(Warning(
+            "CachedModelBackend keeps logged-in users in a per-process cache.",
+            hint="Use a shared CACHE_BACKEND (e.g. Redis or Memcached), or django.contrib.auth.backends.ModelBackend.",
+            id='polls.W002'))
+    return warnings
+
+
+@register(Tags.caches, deploy=True)
+def check_shared_results_cache(app_configs, **kwargs):
+    """Warn a deployment whose results versions live in a per-process cache.
+
+    A vote then only invalidates the results (and their ETags) of the process
+    that handled it, the others serve stale ones until their version expires.
+    """
+    if settings.CACHES['default']['BACKEND'] not in PER_PROCESS_CACHES:
+        return []
+    return [Warning(
+        f"CACHES['default'] ({settings.CACHES['default']['BACKEND']}) is not shared between processes, so a vote "
+        "only invalidates the cached results of the process that handled it.",
+        hint="Use a shared CACHE_BACKEND (e.g. Redis or Memcached) when running more than one process.",
+        id='polls.W003')]
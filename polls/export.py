@@ -0,0 +1,146 @@
+"""Streamed CSV and JSON lines exports of votes and per-choice tallies.
+
+Rows are read with one joined query (no per-row lookups of the voter,
+question or choice) and fetched in chunks of CHUNK_SIZE through
+QuerySet.iterator(), which uses a server-side cursor where the database has
+them, and each row is formatted and handed on as soon as it is read. Memory
+use therefore depends on the chunk size, not on the number of votes.
+
+Votes have no timestamp of their own, so a date range selects the votes of
+the questions published in it.
+
+The tallies of closed polls come from their result snapshots (see
+polls.snapshots; polls closed since the last export are frozen first) and
+follow the tallies of the open polls.
+
+Under ASGI, Django reads a plain iterator given to StreamingHttpResponse into
+memory in one go, so the export view passes aexport_lines there instead.
+"""
+import csv
+import datetime
+from itertools import chain, islice
+from asgiref.sync import sync_to_async
+from django.core.serializers.json import DjangoJSONEncoder
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+from .models import Choice, Question, ResultSnapshot, Vote
+from .snapshots import finalize_closed
+
+CHUNK_SIZE = 2000
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/jsonl'}
+COLUMNS = {
+    'votes': {
+        'user': 'user__username',
+        'question_id': 'question_id',
+        'question': 'question__question_text',
+        'choice_id': 'choice_id',
+        'choice': 'choice__choice_text',
+    },
+    'tallies': {
+        'question_id': 'question_id',
+        'question': 'question__question_text',
+        'choice_id': 'pk',
+        'choice': 'choice_text',
+        'votes': 'votes',
+    },
+}
+
+
+def export_filters(question=None, since=None, until=None):
+    """Return export_rows filters parsed from strings, leaving out empty ones.
+
+    Raises:
+        ValueError: if the question is not a number or a date is not YYYY-MM-DD.
+    """
+    filters = {}
+    if question:
+        filters['question'] = int(question)
+    for name, value in (('since', since), ('until', until)):
+        if value:
+            filters[name] = parse_date(value)
+            if filters[name] is None:
+                raise ValueError(f'{name} must be a date like 2023-08-25, not {value!r}')
+    return filters
+
+
+def _day_start(day):
+    return timezone.make_aware(datetime.datetime.combine(day, datetime.time.min))
+
+
+def _filter(queryset, question, since, until):
+    if question is not None:
+        queryset = queryset.filter(question_id=question)
+    if since is not None:
+        queryset = queryset.filter(question__pub_date__gte=_day_start(since))
+    if until is not None:
+        queryset = queryset.filter(question__pub_date__lt=_day_start(until + datetime.timedelta(days=1)))
+    return queryset
+
+
+def _snapshot_rows(snapshots):
+    for question_id, question_text, counts in snapshots:
+        for choice_id, choice_text, votes in counts:
+            yield question_id, question_text, choice_id, choice_text, votes
+
+
+def export_rows(kind, question=None, since=None, until=None, chunk_size=CHUNK_SIZE):
+    """Return an iterator over the rows of an export, as tuples in COLUMNS[kind] order.
+
+    Arguments:
+        kind {str} -- 'votes' (one row per vote) or 'tallies' (one row per choice)
+        question {int} -- only this question's rows
+        since {date} -- only questions published on or after this day
+        until {date} -- only questions published on or before this day
+        chunk_size {int} -- rows fetched from the database at a time
+    """
+    if kind == 'votes':
+        return _filter(Vote.objects.all(), question, since, until).order_by('pk').values_list(
+            *COLUMNS[kind].values()).iterator(chunk_size=chunk_size)
+    finalize_closed(Question.objects.filter(
+        pk__in=_filter(Choice.objects.all(), question, since, until).values('question_id')))
+    choices = _filter(Choice.objects.filter(question__snapshot__isnull=True), question, since, until)
+    snapshots = _filter(ResultSnapshot.objects.all(), question, since, until)
+    return chain(
+        choices.order_by('pk').values_list(*COLUMNS[kind].values()).iterator(chunk_size=chunk_size),
+        _snapshot_rows(snapshots.order_by('pk').values_list(
+            'question_id', 'question__question_text', 'counts').iterator(chunk_size=chunk_size)))
+
+
+class _Line:
+    """File-like object whose write returns what was written, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+def export_lines(kind, fmt, **filters):
+    """Yield an export line by line, a header first for CSV.
+
+    Arguments:
+        kind {str} -- 'votes' or 'tallies'
+        fmt {str} -- 'csv' or 'jsonl'
+        filters -- question, since, until and chunk_size, as for export_rows
+    """
+    columns = list(COLUMNS[kind])
+    rows = export_rows(kind, **filters)
+    if fmt == 'csv':
+        writer = csv.writer(_Line())
+        yield writer.writerow(columns)
+        for row in rows:
+            yield writer.writerow(row)
+    else:
+        encoder = DjangoJSONEncoder(ensure_ascii=False)
+        for row in rows:
+            yield encoder.encode(dict(zip(columns, row))) + '\n'
+
+
+async def aexport_lines(kind, fmt, **filters):
+    """Async version of export_lines, reading chunks of lines in a worker thread."""
+    lines = export_lines(kind, fmt, **filters)
+    chunk_size = filters.get('chunk_size', CHUNK_SIZE)
+    while True:
+        chunk = await sync_to_async(lambda: list(islice(lines, chunk_size)))()
+        if not chunk:
+            return
+        for line in chunk:
+            yield line
@@ -0,0 +1,201 @@
+"""Streaming bulk import of fixtures, for ``manage.py import_polls``.
+
+Unlike ``loaddata``, a fixture is never held in memory: objects are decoded
+one at a time from the file (a JSON array as written by ``dumpdata``, or one
+object per line), turned into model instances by Django's fixture
+deserializer, so foreign keys are taken as primary keys, and written with
+bulk_create in batches, one transaction per batch and without model signals.
+
+After each batch the byte offset reached is saved to a state file next to
+the fixture. Importing the same file again continues from there; rows of a
+batch that committed before its offset was saved are skipped as conflicts,
+as are rows whose primary key is already taken. The state file is removed
+once the whole file is in.
+
+Only rows actually inserted count as imported: the rows of each batch are
+counted by primary key before and after the insert (with one indexed query
+per PK_CHUNK keys), and skipped rows are reported separately.
+"""
+import codecs
+import json
+import os
+from django.core.management.color import no_style
+from django.core.serializers.base import DeserializationError
+from django.core.serializers.python import Deserializer
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from .cache import clear_latest_questions
+from .models import Choice, Vote
+from .voting import rebuild_tallies
+
+CHUNK_SIZE = 1024 * 1024
+BATCH_SIZE = 5000
+# primary keys per IN (...) when counting the rows of a batch, within SQLite's parameter limit
+PK_CHUNK = 900
+# between top-level objects: whitespace, the array brackets and commas
+SEPARATORS = frozenset(' \t\r\n,[]')
+
+_decoder = json.JSONDecoder()
+
+
+def read_objects(path, offset=0, chunk_size=CHUNK_SIZE):
+    """Yield each fixture object of a file with the byte offset just after it.
+
+    Arguments:
+        path {str} -- JSON array or JSON lines fixture
+        offset {int} -- byte offset to start at, one returned earlier
+        chunk_size {int} -- bytes read at a time
+
+    Raises:
+        DeserializationError: if the file is not valid JSON.
+    """
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with open(path, 'rb') as file:
+        file.seek(offset)
+        buffer, pos, eof = '', 0, False
+        while True:
+            start = pos
+            while pos < len(buffer) and buffer[pos] in SEPARATORS:
+                pos += 1
+            offset += len(buffer[start:pos].encode())
+            if pos < len(buffer):
+                try:
+                    obj, end = _decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError as error:
+                    if eof:
+                        raise DeserializationError(f"{path}: invalid JSON at byte {offset}: {error.msg}")
+                else:
+                    offset += len(buffer[pos:end].encode())
+                    pos = end
+                    yield obj, offset
+                    continue
+            elif eof:
+                return
+            # the next object is incomplete, read on
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buffer, pos = buffer[pos:] + decoder.decode(chunk, final=eof), 0
+
+
+def _count_present(manager, instances):
+    """Return how many rows of instances are in the table (every row of it if some have no pk)."""
+    pks = [instance.pk for instance in instances]
+    if None in pks:
+        return manager.count()
+    return sum(manager.filter(pk__in=pks[start:start + PK_CHUNK]).count() for start in range(0, len(pks), PK_CHUNK))
+
+
+def _save_batch(batch, using):
+    """Insert a batch of deserialized objects, model by model in file order, in one transaction.
+
+    Returns:
+        dict: (inserted, skipped) row counts per model.
+    """
+    models = {}
+    for deserialized in batch:
+        models.setdefault(type(deserialized.object), []).append(deserialized)
+    counts = {}
+    with transaction.atomic(using=using):
+        for model, objects in models.items():
+            manager = model._base_manager.using(using)
+            instances = [deserialized.object for deserialized in objects]
+            before = _count_present(manager, instances)
+            manager.bulk_create(instances, ignore_conflicts=True)
+            inserted = _count_present(manager, instances) - before
+            counts[model] = (inserted, len(instances) - inserted)
+            for deserialized in objects:
+                for field_name, values in (deserialized.m2m_data or {}).items():
+                    field = model._meta.get_field(field_name)
+                    through = field.remote_field.through
+                    through._base_manager.using(using).bulk_create([
+                        through(**{field.m2m_column_name(): deserialized.object.pk,
+                                   field.m2m_reverse_name(): value})
+                        for value in values], ignore_conflicts=True)
+    return counts
+
+
+def state_path(path):
+    """Return where the import progress of a fixture is kept."""
+    return f'{path}.import-state'
+
+
+def forget_progress(path):
+    """Drop the saved progress of a fixture, so its next import starts from the beginning."""
+    try:
+        os.remove(state_path(path))
+    except FileNotFoundError:
+        pass
+
+
+def _saved_offset(path):
+    try:
+        with open(state_path(path)) as file:
+            return json.load(file)['offset']
+    except FileNotFoundError:
+        return 0
+
+
+def _save_offset(path, offset):
+    temporary = f'{state_path(path)}.tmp'
+    with open(temporary, 'w') as file:
+        json.dump({'offset': offset}, file)
+    os.replace(temporary, state_path(path))
+
+
+def import_fixture(path, batch_size=BATCH_SIZE, using=DEFAULT_DB_ALIAS, progress=None):
+    """Import a fixture file in batches, continuing where an earlier import of it stopped.
+
+    Arguments:
+        path {str} -- JSON array or JSON lines fixture
+        batch_size {int} -- objects per transaction
+        using {str} -- database alias
+        progress {callable} -- called with the number of objects imported so far after each batch
+
+    Returns:
+        tuple: the number of rows inserted and the number skipped (already
+        there, or conflicting) per model.
+    """
+    counts = {}
+    skipped = {}
+    batch = []
+
+    def flush(offset):
+        for model, (inserted, conflicts) in _save_batch(batch, using).items():
+            counts[model] = counts.get(model, 0) + inserted
+            skipped[model] = skipped.get(model, 0) + conflicts
+        _save_offset(path, offset)
+        batch.clear()
+        if progress:
+            progress(sum(counts.values()))
+
+    end = _saved_offset(path)
+
+    def fixture_objects(start):
+        nonlocal end
+        for obj, end in read_objects(path, start):
+            yield obj
+
+    # the deserializer takes one object at a time, so end is the offset just after the one it returns
+    for deserialized in Deserializer(fixture_objects(end), using=using):
+        batch.append(deserialized)
+        if len(batch) >= batch_size:
+            flush(end)
+    if batch:
+        flush(end)
+    forget_progress(path)
+    return counts, skipped
+
+
+def finish_import(models, using=DEFAULT_DB_ALIAS):
+    """Check the foreign keys of imported models, reset their sequences and recount the tallies.
+
+    Raises:
+        IntegrityError: if an imported row points at a missing row.
+    """
+    connection = connections[using]
+    connection.check_constraints(table_names=[model._meta.db_table for model in models])
+    with connection.cursor() as cursor:
+        for sql in connection.ops.sequence_reset_sql(no_style(), models):
+            cursor.execute(sql)
+    if Choice in models or Vote in models:
+        rebuild_tallies(using)
+    clear_latest_questions()
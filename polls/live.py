@@ -0,0 +1,129 @@
+"""Live results pushed to browsers over Server-Sent Events.
+
+One ResultsFeed per process watches the results versions (see polls.cache) of
+the questions that somebody is streaming, at most POLLS_STREAM_MAX_RATE times
+a second, and wakes the connections waiting on a question when its version
+changes. Votes landing between two checks are coalesced into one update, the
+new payload is computed once per change for all of its listeners, and an idle
+connection is only a coroutine waiting on an asyncio.Event, not a thread.
+
+Streaming needs the ASGI entry point (mysite.asgi.application). Under WSGI
+the results page does not subscribe at all, and a client that does gets one
+event asking it to come back only an hour later (FALLBACK_RECONNECT_MS), so
+an open tab never polls the app.
+"""
+import asyncio
+import json
+from contextlib import asynccontextmanager
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from .cache import get_results, results_versions
+
+MAX_RATE = getattr(settings, 'POLLS_STREAM_MAX_RATE', 2)
+HEARTBEAT = getattr(settings, 'POLLS_STREAM_HEARTBEAT', 15)
+MAX_AGE = getattr(settings, 'POLLS_STREAM_MAX_AGE', 300)
+RECONNECT_MS = 1000
+FALLBACK_RECONNECT_MS = 60 * 60 * 1000
+
+
+class ResultsFeed:
+    """Shared change feed of results versions for every stream in this process."""
+
+    def __init__(self, interval):
+        """Check for changes every interval seconds while anyone listens."""
+        self.interval = interval
+        self._reset(None)
+
+    def _reset(self, loop):
+        self._loop = loop
+        self._task = None
+        self._listeners = {}
+        self._versions = {}
+        self._changed = {}
+        self._payloads = {}
+
+    @asynccontextmanager
+    async def _listening(self, question_id):
+        loop = asyncio.get_running_loop()
+        if loop is not self._loop:
+            self._reset(loop)
+        self._listeners[question_id] = self._listeners.get(question_id, 0) + 1
+        self._changed.setdefault(question_id, asyncio.Event())
+        if self._task is None or self._task.done():
+            self._task = loop.create_task(self._watch())
+        try:
+            yield
+        finally:
+            self._listeners[question_id] -= 1
+
+    async def _watch(self):
+        while True:
+            # forget questions nobody waited on since the last check
+            for question_id in [key for key, count in self._listeners.items() if not count]:
+                for state in (self._listeners, self._versions, self._changed, self._payloads):
+                    state.pop(question_id, None)
+            if not self._listeners:
+                self._task = None
+                return
+            versions = await sync_to_async(results_versions)(list(self._listeners))
+            for question_id, version in versions.items():
+                if question_id in self._changed and self._versions.get(question_id) != version:
+                    self._versions[question_id] = version
+                    # wake everybody waiting on the old event, later waiters get a new one
+                    self._changed[question_id].set()
+                    self._changed[question_id] = asyncio.Event()
+            await asyncio.sleep(self.interval)
+
+    async def next_version(self, question_id, seen, timeout):
+        """Return the question's results version once it differs from seen, or None after timeout seconds.
+
+        A stream only counts as a listener while it waits here, so a stream
+        that is dropped between two events never keeps the watcher running.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + timeout
+        async with self._listening(question_id):
+            while True:
+                version = self._versions.get(question_id)
+                if version is not None and version != seen:
+                    return version
+                try:
+                    await asyncio.wait_for(self._changed[question_id].wait(), deadline - loop.time())
+                except asyncio.TimeoutError:
+                    return None
+
+    async def payload(self, question_id, version):
+        """Return the results payload for a version, computed once for all listeners."""
+        cached = self._payloads.get(question_id)
+        if cached is None or cached[0] != version:
+            cached = (version, asyncio.ensure_future(sync_to_async(get_results)(question_id)))
+            self._payloads[question_id] = cached
+        return await asyncio.shield(cached[1])
+
+
+feed = ResultsFeed(1 / MAX_RATE)
+
+
+def results_event(payload, version, retry=RECONNECT_MS):
+    """Format a results payload as one Server-Sent Event, asking for a reconnect after retry ms."""
+    data = json.dumps(payload, cls=DjangoJSONEncoder)
+    return f"retry: {retry}\nid: {version}\nevent: results\ndata: {data}\n\n"
+
+
+async def results_events(question_id):
+    """Yield a results event now and after every change, with keep-alive comments in between.
+
+    The stream ends after MAX_AGE seconds; the browser's EventSource then
+    reconnects, so connections of clients that went away do not pile up.
+    """
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + MAX_AGE
+    seen = None
+    while loop.time() < deadline:
+        version = await feed.next_version(question_id, seen, min(HEARTBEAT, deadline - loop.time()))
+        if version is None:
+            yield ": keep-alive\n\n"
+            continue
+        seen = version
+        yield results_event(await feed.payload(question_id, version), version)
@@ -0,0 +1,216 @@
+"""Simulated voters for ``manage.py loadtest``.
+
+Each voter logs in once and then, for every round, opens the index, the
+detail page of a random question, votes for a random choice and opens the
+results, like a student answering a poll in class. Voters run in a pool of
+threads, either in-process through Django's test client (which can also count
+the queries of each request) or over HTTP against a running server.
+
+The seeded users and questions are copies of the shapes in data/*.json, with
+names starting with PREFIX and a token of their own run. Afterwards exactly
+the rows seeded by the run are deleted again, by primary key, never other
+rows that happen to share the prefix.
+"""
+import json
+import math
+import random
+import secrets
+import time
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from http.cookiejar import CookieJar
+from pathlib import Path
+from urllib.error import HTTPError
+from urllib.parse import urlencode, urljoin
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from django.utils import timezone
+from .cache import clear_latest_questions
+from .models import Choice, Question
+
+PREFIX = 'loadtest-'
+FIXTURE = Path(settings.BASE_DIR) / 'data' / 'polls-v1.json'
+ENDPOINTS = ('index', 'detail', 'vote', 'results')
+
+Sample = namedtuple('Sample', 'endpoint seconds status queries locked')
+Seed = namedtuple('Seed', 'usernames polls user_ids question_ids')
+
+
+def seed(users, questions, password):
+    """Create voters and open questions shaped like the fixture polls.
+
+    Returns:
+        Seed: the usernames, a list of (question id, choice ids) pairs, and
+        the primary keys of the created users and questions.
+    """
+    prefix = f'{PREFIX}{secrets.token_hex(4)}-'
+    fixture = json.loads(FIXTURE.read_text())
+    shapes = [obj for obj in fixture if obj['model'] == 'polls.question']
+    choices_of = {}
+    for obj in fixture:
+        if obj['model'] == 'polls.choice':
+            choices_of.setdefault(obj['fields']['question'], []).append(obj['fields']['choice_text'])
+    password = make_password(password)
+    usernames = [f'{prefix}{number}' for number in range(users)]
+    User.objects.bulk_create([User(username=username, password=password) for username in usernames])
+    pub_date = timezone.now() - timezone.timedelta(days=1)
+    created = Question.objects.bulk_create([
+        Question(question_text=f"{prefix}{number} {shapes[number % len(shapes)]['fields']['question_text']}",
+                 pub_date=pub_date)
+        for number in range(questions)])
+    if not all(question.pk for question in created):
+        created = Question.objects.filter(question_text__startswith=prefix).order_by('pk')
+    Choice.objects.bulk_create([
+        Choice(question=question, choice_text=text)
+        for number, question in enumerate(created)
+        for text in choices_of[shapes[number % len(shapes)]['pk']]])
+    clear_latest_questions()
+    polls = {}
+    for question_id, choice_id in Choice.objects.filter(
+            question__in=created).order_by('pk').values_list('question_id', 'pk'):
+        polls.setdefault(question_id, []).append(choice_id)
+    user_ids = list(User.objects.filter(username__in=usernames).values_list('pk', flat=True))
+    return Seed(usernames, list(polls.items()), user_ids, [question.pk for question in created])
+
+
+def clear(seeded):
+    """Delete the users and questions of a seed, with their votes."""
+    Question.objects.filter(pk__in=seeded.question_ids).delete()
+    User.objects.filter(pk__in=seeded.user_ids).delete()
+    clear_latest_questions()
+
+
+class InProcessClient:
+    """Voter talking to the app through Django's test client."""
+
+    def __init__(self, username, password):
+        """Log the voter in without going through the login form."""
+        self.client = Client()
+        self.client.force_login(User.objects.get(username=username))
+
+    def request(self, method, path, data=None):
+        """Send a request and return its status, query count and whether it hit a locked database."""
+        queries = 0
+
+        def count(execute, sql, params, many, context):
+            nonlocal queries
+            queries += 1
+            return execute(sql, params, many, context)
+
+        with connection.execute_wrapper(count):
+            try:
+                status = getattr(self.client, method)(path, data).status_code
+            except Exception as error:
+                return 500, queries, 'database is locked' in str(error)
+        return status, queries, False
+
+
+class _NoRedirect(HTTPRedirectHandler):
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class HttpClient:
+    """Voter talking to a running server over HTTP, with its own cookies."""
+
+    def __init__(self, base_url, username, password):
+        """Log the voter in through the login form."""
+        self.base_url = base_url
+        self.cookies = CookieJar()
+        self.opener = build_opener(HTTPCookieProcessor(self.cookies), _NoRedirect)
+        self.request('get', reverse('login'))
+        self.request('post', reverse('login'), {'username': username, 'password': password})
+        if 'sessionid' not in self._cookies():
+            raise RuntimeError(f"could not log {username} in at {base_url}")
+
+    def _cookies(self):
+        return {cookie.name: cookie.value for cookie in self.cookies}
+
+    def request(self, method, path, data=None):
+        """Send a request and return its status; queries and lock errors are unknown over HTTP."""
+        url = urljoin(self.base_url, path)
+        headers = {'Referer': url}
+        body = None
+        if method == 'post':
+            body = urlencode({**data, 'csrfmiddlewaretoken': self._cookies().get('csrftoken', '')}).encode()
+        try:
+            with self.opener.open(Request(url, body, headers), timeout=30) as response:
+                response.read()
+                return response.status, None, None
+        except HTTPError as error:
+            # redirects are not followed and end up here too
+            return error.code, None, None
+        except OSError:
+            return 0, None, None
+
+
+def run(make_client, usernames, polls, rounds, concurrency, password):
+    """Let every voter vote for rounds rounds, concurrency voters at a time.
+
+    Returns:
+        tuple: the list of Samples and the wall-clock seconds it took.
+    """
+    samples = []
+
+    def vote(number):
+        rng = random.Random(number)
+        client = make_client(usernames[number], password)
+        for _ in range(rounds):
+            question_id, choice_ids = rng.choice(polls)
+            for endpoint, method, path, data in (
+                    ('index', 'get', reverse('polls:index'), None),
+                    ('detail', 'get', reverse('polls:detail', args=(question_id,)), None),
+                    ('vote', 'post', reverse('polls:vote', args=(question_id,)), {'choice': rng.choice(choice_ids)}),
+                    ('results', 'get', reverse('polls:results', args=(question_id,)), None)):
+                started = time.perf_counter()
+                status, queries, locked = client.request(method, path, data)
+                samples.append(Sample(endpoint, time.perf_counter() - started, status, queries, locked))
+
+    started = time.perf_counter()
+    if concurrency == 1:
+        # in the calling thread, e.g. inside a test's transaction
+        for number in range(len(usernames)):
+            vote(number)
+    else:
+        with ThreadPoolExecutor(concurrency) as pool:
+            list(pool.map(vote, range(len(usernames))))
+    return samples, time.perf_counter() - started
+
+
+def percentile(values, percent):
+    """Return the nearest-rank percentile of a list of numbers."""
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(percent / 100 * len(ordered)) - 1)]
+
+
+def summarize(samples, seconds):
+    """Return throughput, latency percentiles, error and lock rates and queries per request of each endpoint.
+
+    Votes turned away by the rate limits (429) or load shedding (503) are
+    reported as their own rates, not as errors.
+    """
+    summary = {}
+    for endpoint in (*ENDPOINTS, 'all'):
+        chosen = [sample for sample in samples if endpoint in ('all', sample.endpoint)]
+        if not chosen:
+            continue
+        latencies = [sample.seconds * 1000 for sample in chosen]
+        queries = [sample.queries for sample in chosen if sample.queries is not None]
+        locks = [sample.locked for sample in chosen if sample.locked is not None]
+        summary[endpoint] = {
+            'requests': len(chosen),
+            'throughput_rps': round(len(chosen) / seconds, 1),
+            'latency_ms': {f'p{p}': round(percentile(latencies, p), 2) for p in (50, 95, 99)},
+            'error_rate': round(sum(not 0 < sample.status < 400 and sample.status not in (429, 503)
+                                    for sample in chosen) / len(chosen), 4),
+            'rate_limited_rate': round(sum(sample.status == 429 for sample in chosen) / len(chosen), 4),
+            'overloaded_rate': round(sum(sample.status == 503 for sample in chosen) / len(chosen), 4),
+            'lock_rate': round(sum(locks) / len(locks), 4) if locks else None,
+            'queries_per_request': round(sum(queries) / len(queries), 2) if queries else None,
+        }
+    return summary
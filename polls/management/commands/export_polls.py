@@ -0,0 +1,33 @@
+"""Export votes or per-choice tallies as CSV or JSON lines."""
+from django.core.management.base import BaseCommand, CommandError
+from polls.export import COLUMNS, FORMATS, export_filters, export_lines
+
+
+class Command(BaseCommand):
+    """Stream an export to standard output or a file."""
+
+    help = ("Write every vote (user, question, choice) or every choice tally as CSV or JSON lines, "
+            "optionally for one question or the questions published in a date range.")
+
+    def add_arguments(self, parser):
+        """Add the kind, format, filter and output options."""
+        parser.add_argument('kind', choices=list(COLUMNS), help='What to export.')
+        parser.add_argument('--format', choices=list(FORMATS), default='csv', help='Output format.')
+        parser.add_argument('--question', help='Only this question id.')
+        parser.add_argument('--since', help='Only questions published on or after this day (YYYY-MM-DD).')
+        parser.add_argument('--until', help='Only questions published on or before this day (YYYY-MM-DD).')
+        parser.add_argument('--output', help='File to write instead of standard output.')
+
+    def handle(self, *args, **options):
+        """Write the export line by line."""
+        try:
+            filters = export_filters(options['question'], options['since'], options['until'])
+        except ValueError as error:
+            raise CommandError(error)
+        lines = export_lines(options['kind'], options['format'], **filters)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8', newline='') as file:
+                file.writelines(lines)
+        else:
+            for line in lines:
+                self.stdout.write(line, ending='')
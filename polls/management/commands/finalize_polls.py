@@ -0,0 +1,14 @@
+"""Freeze the results of closed polls."""
+from django.core.management.base import BaseCommand
+from polls.snapshots import finalize_closed
+
+
+class Command(BaseCommand):
+    """Store a result snapshot for every closed poll that has none yet."""
+
+    help = "Count the votes of every poll whose end date has passed one last time and store its final results."
+
+    def handle(self, *args, **options):
+        """Freeze the closed polls."""
+        frozen = finalize_closed()
+        self.stdout.write(self.style.SUCCESS(f"Froze the results of {frozen} closed polls."))
@@ -0,0 +1,40 @@
+"""Apply votes buffered by the write-behind vote buffer."""
+import time
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from polls.voting import flush_pending_votes
+
+
+class Command(BaseCommand):
+    """Flush PendingVote rows into Vote in batches."""
+
+    help = ("Apply buffered votes (POLLS_VOTE_BUFFER) in batches. A full batch is flushed "
+            "straight away, otherwise the flusher waits --interval seconds.")
+
+    def add_arguments(self, parser):
+        """Add batch size, interval and --once options."""
+        parser.add_argument('--batch-size', type=int,
+                            default=getattr(settings, 'POLLS_VOTE_BUFFER_BATCH', 500),
+                            help='Most buffered votes applied per transaction.')
+        parser.add_argument('--interval', type=float,
+                            default=getattr(settings, 'POLLS_VOTE_BUFFER_INTERVAL', 1.0),
+                            help='Seconds to wait when the buffer holds less than a batch.')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the buffer once and exit instead of running forever.')
+
+    def handle(self, *args, **options):
+        """Flush until the buffer is empty, then wait or exit."""
+        batch_size = options['batch_size']
+        while True:
+            started = time.monotonic()
+            total = 0
+            flushed = batch_size
+            while flushed == batch_size:
+                flushed = flush_pending_votes(batch_size, skip_locked=True)
+                total += flushed
+            if total:
+                elapsed = time.monotonic() - started
+                self.stdout.write(f"Applied {total} buffered votes in {elapsed:.3f}s.")
+            if options['once']:
+                return
+            time.sleep(options['interval'])
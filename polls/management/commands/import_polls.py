@@ -0,0 +1,60 @@
+"""Import large polls fixtures in streaming bulk batches."""
+import time
+from django.core.management.base import BaseCommand, CommandError
+from django.core.serializers.base import DeserializationError
+from django.db import DEFAULT_DB_ALIAS, IntegrityError, connections
+from polls.importer import BATCH_SIZE, finish_import, forget_progress, import_fixture
+
+
+class Command(BaseCommand):
+    """Bulk-load fixtures without reading them into memory or saving objects one by one."""
+
+    help = ("Import fixtures (dumpdata JSON arrays or JSON lines) in bulk batches, one transaction each. "
+            "An interrupted import continues where it stopped when run again. Stored tallies are "
+            "rebuilt afterwards.")
+
+    def add_arguments(self, parser):
+        """Add fixture paths, batch size, --restart and --database options."""
+        parser.add_argument('fixtures', nargs='+', help='Fixture files, referenced objects first.')
+        parser.add_argument('--batch-size', type=int, default=BATCH_SIZE, help='Objects per transaction.')
+        parser.add_argument('--restart', action='store_true',
+                            help='Ignore the progress saved by an interrupted import and start over.')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS, help='Database to import into.')
+
+    def handle(self, *args, **options):
+        """Import every fixture, then check and finish the imported tables."""
+        using = options['database']
+        started = time.monotonic()
+        counts = {}
+        skipped = {}
+
+        def progress(path, imported):
+            elapsed = time.monotonic() - started
+            if options['verbosity'] >= 2:
+                self.stdout.write(f"{path}: {imported} objects, {imported / elapsed:.0f} rows/s")
+
+        # with SQLite, foreign keys are checked once at the end, so fixtures may come in any order
+        with connections[using].constraint_checks_disabled():
+            for path in options['fixtures']:
+                if options['restart']:
+                    forget_progress(path)
+                try:
+                    imported, conflicts = import_fixture(path, options['batch_size'], using,
+                                                         progress=lambda count, path=path: progress(path, count))
+                except (OSError, DeserializationError) as error:
+                    raise CommandError(error)
+                for model, count in imported.items():
+                    counts[model] = counts.get(model, 0) + count
+                    skipped[model] = skipped.get(model, 0) + conflicts[model]
+        try:
+            finish_import(list(counts), using)
+        except IntegrityError as error:
+            raise CommandError(f"Imported rows point at missing rows, import the fixtures they need: {error}")
+        elapsed = time.monotonic() - started
+        total = sum(counts.values())
+        for model, count in counts.items():
+            self.stdout.write(f"{model._meta.label}: {count}"
+                              + (f" ({skipped[model]} skipped, already there)" if skipped[model] else ""))
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {total} objects in {elapsed:.2f}s ({total / elapsed if elapsed else 0:.0f} rows/s), "
+            f"skipped {sum(skipped.values())}."))
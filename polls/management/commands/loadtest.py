@@ -0,0 +1,62 @@
+"""Measure how the polls app copes with a burst of concurrent voters."""
+import json
+from contextlib import nullcontext
+from functools import partial
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from polls import loadtest
+from polls.ratelimit import limits_off
+
+
+class Command(BaseCommand):
+    """Seed voters and polls, drive index, detail, vote and results, and report per endpoint as JSON."""
+
+    help = ("Seed --users voters and --questions polls, let them vote concurrently through the real URLs "
+            "(in-process, or against --url sharing this database), and print throughput, latency "
+            "percentiles, error and lock rates and queries per request as JSON.")
+
+    def add_arguments(self, parser):
+        """Add the size, concurrency and target options."""
+        parser.add_argument('--users', type=int, default=50, help='Number of voters.')
+        parser.add_argument('--questions', type=int, default=5, help='Number of polls to vote on.')
+        parser.add_argument('--rounds', type=int, default=3, help='Index, detail, vote, results rounds per voter.')
+        parser.add_argument('--concurrency', type=int, default=20, help='Voters active at the same time.')
+        parser.add_argument('--url', help='Base URL of a running server, e.g. http://127.0.0.1:8000/. '
+                                          'Without it requests are made in-process.')
+        parser.add_argument('--password', default='loadtest-password', help='Password of the seeded voters.')
+        parser.add_argument('--keep', action='store_true', help='Keep the voters, polls and votes seeded by this run.')
+        parser.add_argument('--rate-limit', action='store_true',
+                            help='Keep the vote rate limits and load shedding on for in-process runs '
+                                 '(off by default, so votes measure throughput, not 429/503 answers).')
+
+    def handle(self, *args, **options):
+        """Seed, run, report and clean up."""
+        if min(options['users'], options['questions'], options['rounds'], options['concurrency']) < 1:
+            raise CommandError("--users, --questions, --rounds and --concurrency must be at least 1.")
+        seeded = loadtest.seed(options['users'], options['questions'], options['password'])
+        usernames, polls = seeded.usernames, seeded.polls
+        try:
+            if options['url']:
+                make_client = partial(loadtest.HttpClient, options['url'])
+                samples, seconds = loadtest.run(make_client, usernames, polls, options['rounds'],
+                                                options['concurrency'], options['password'])
+            else:
+                limits = nullcontext() if options['rate_limit'] else limits_off()
+                with override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver']), limits:
+                    samples, seconds = loadtest.run(loadtest.InProcessClient, usernames, polls, options['rounds'],
+                                                    options['concurrency'], options['password'])
+        except RuntimeError as error:
+            raise CommandError(error)
+        finally:
+            if not options['keep']:
+                loadtest.clear(seeded)
+        self.stdout.write(json.dumps({
+            'target': options['url'] or 'in-process',
+            'users': options['users'],
+            'questions': options['questions'],
+            'rounds': options['rounds'],
+            'concurrency': options['concurrency'],
+            'seconds': round(seconds, 3),
+            'endpoints': loadtest.summarize(samples, seconds),
+        }, indent=2))
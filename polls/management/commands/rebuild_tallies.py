@@ -0,0 +1,29 @@
+"""Rebuild or check the stored per-choice vote tallies."""
+from django.core.management.base import BaseCommand, CommandError
+from polls.voting import rebuild_tallies, stale_tallies
+
+
+class Command(BaseCommand):
+    """Recompute Choice.votes from the raw Vote rows."""
+
+    help = "Rebuild every stored choice tally from the Vote rows, or only check them with --check."
+
+    def add_arguments(self, parser):
+        """Add the --check option."""
+        parser.add_argument(
+            '--check', action='store_true',
+            help='Report choices whose tally is wrong and exit with an error instead of fixing them.')
+
+    def handle(self, *args, **options):
+        """Check or rebuild the tallies."""
+        stale = list(stale_tallies())
+        for choice in stale:
+            self.stdout.write(f"choice {choice.pk} ({choice.choice_text}): "
+                              f"stored {choice.votes}, counted {choice.counted}")
+        if options['check']:
+            if stale:
+                raise CommandError(f"{len(stale)} choice tallies are out of date.")
+            self.stdout.write(self.style.SUCCESS("All choice tallies match the votes."))
+            return
+        rebuild_tallies()
+        self.stdout.write(self.style.SUCCESS(f"Rebuilt tallies, {len(stale)} corrected."))
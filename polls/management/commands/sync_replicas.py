@@ -0,0 +1,25 @@
+"""Copy the primary SQLite database over its read replicas."""
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from polls.routers import copy_database
+
+
+class Command(BaseCommand):
+    """Bring every replica listed in POLLS_REPLICAS up to date with the primary."""
+
+    help = "Copy the primary SQLite database over each replica in POLLS_REPLICAS."
+
+    def handle(self, *args, **options):
+        """Copy the primary to each replica."""
+        replicas = getattr(settings, 'POLLS_REPLICAS', {})
+        if not replicas:
+            raise CommandError("No replicas configured, set DATABASE_REPLICAS.")
+        aliases = [DEFAULT_DB_ALIAS, *replicas]
+        if any(connections[alias].vendor != 'sqlite' for alias in aliases):
+            raise CommandError("sync_replicas only copies SQLite databases, use the database's own replication.")
+        source = connections[DEFAULT_DB_ALIAS].settings_dict['NAME']
+        for alias in replicas:
+            copy_database(source, connections[alias].settings_dict['NAME'])
+            self.stdout.write(f"{alias}: copied from {source}")
+        self.stdout.write(self.style.SUCCESS(f"{len(replicas)} replicas in sync."))
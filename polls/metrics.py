@@ -0,0 +1,207 @@
+"""Per-request timing, query and cache counts, exposed as Server-Timing and Prometheus metrics.
+
+MetricsMiddleware measures each request's wall time and records it under the
+resolved URL name (e.g. ``polls:detail``), together with the time spent in
+and number of database queries (timed by time_queries, which polls.signals
+installs on every new database connection) and the hits and misses of the
+polls caches (record_cache_lookup, called from polls.cache). The numbers of
+one request go out in its ``Server-Timing`` header; all requests are
+aggregated into in-process histograms served by metrics_view in Prometheus
+text format. Each server process keeps and serves its own numbers.
+"""
+import threading
+import time
+from bisect import bisect_left
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+from django.utils.decorators import sync_and_async_middleware
+
+# upper bounds in seconds, as Prometheus client libraries use by default
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+
+class RequestStats:
+    """Database and cache numbers of the request being served."""
+
+    __slots__ = ('db_seconds', 'queries', 'cache_hits', 'cache_misses')
+
+    def __init__(self):
+        """Start from zero."""
+        self.db_seconds = 0.0
+        self.queries = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+
+_current = ContextVar('polls_request_stats', default=None)
+
+
+def time_queries(execute, sql, params, many, context):
+    """Database execute wrapper adding each query's time to the current request's stats."""
+    stats = _current.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.db_seconds += time.perf_counter() - started
+        stats.queries += 1
+
+
+def record_cache_lookup(hit):
+    """Count a hit or miss of a polls cache for the current request."""
+    stats = _current.get()
+    if stats is not None:
+        if hit:
+            stats.cache_hits += 1
+        else:
+            stats.cache_misses += 1
+
+
+class Histogram:
+    """Cumulative-bucket histogram of observed seconds."""
+
+    __slots__ = ('counts', 'sum', 'count')
+
+    def __init__(self):
+        """Start empty."""
+        self.counts = [0] * len(BUCKETS)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, seconds):
+        """Add one observation."""
+        index = bisect_left(BUCKETS, seconds)
+        if index < len(BUCKETS):
+            self.counts[index] += 1
+        self.sum += seconds
+        self.count += 1
+
+    def buckets(self):
+        """Yield (upper bound, observations at or below it), ending with +Inf."""
+        total = 0
+        for bound, count in zip(BUCKETS, self.counts):
+            total += count
+            yield str(bound), total
+        yield '+Inf', self.count
+
+
+class Registry:
+    """Metrics of every request served by this process, per URL name."""
+
+    def __init__(self):
+        """Start with no requests."""
+        self._lock = threading.Lock()
+        self._views = {}
+
+    def observe(self, view, seconds, stats):
+        """Record one request."""
+        with self._lock:
+            metrics = self._views.get(view)
+            if metrics is None:
+                metrics = self._views[view] = {
+                    'request': Histogram(), 'db': Histogram(), 'queries': 0, 'cache_hits': 0, 'cache_misses': 0}
+            metrics['request'].observe(seconds)
+            metrics['db'].observe(stats.db_seconds)
+            metrics['queries'] += stats.queries
+            metrics['cache_hits'] += stats.cache_hits
+            metrics['cache_misses'] += stats.cache_misses
+
+    def clear(self):
+        """Forget every recorded request."""
+        with self._lock:
+            self._views.clear()
+
+    def render(self):
+        """Return the metrics in Prometheus text exposition format."""
+        lines = []
+        with self._lock:
+            views = sorted(self._views.items())
+            for name, key, help_text in (
+                    ('polls_request_duration_seconds', 'request', 'Wall time of requests.'),
+                    ('polls_db_duration_seconds', 'db', 'Time per request spent in database queries.')):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} histogram']
+                for view, metrics in views:
+                    histogram = metrics[key]
+                    lines += [f'{name}_bucket{{view="{view}",le="{bound}"}} {count}'
+                              for bound, count in histogram.buckets()]
+                    lines.append(f'{name}_sum{{view="{view}"}} {histogram.sum:.6f}')
+                    lines.append(f'{name}_count{{view="{view}"}} {histogram.count}')
+            for name, key, help_text in (
+                    ('polls_db_queries_total', 'queries', 'Database queries run.'),
+                    ('polls_cache_hits_total', 'cache_hits', 'Lookups answered by the polls caches.'),
+                    ('polls_cache_misses_total', 'cache_misses', 'Lookups the polls caches had to compute.')):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                lines += [f'{name}{{view="{view}"}} {metrics[key]}' for view, metrics in views]
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+
+def _server_timing(seconds, stats):
+    return (f'total;dur={seconds * 1000:.1f}, '
+            f'db;dur={stats.db_seconds * 1000:.1f};desc="{stats.queries} queries", '
+            f'cache;desc="{stats.cache_hits} hits {stats.cache_misses} misses"')
+
+
+def _finish(request, response, started, stats):
+    seconds = time.perf_counter() - started
+    registry.observe(_view_name(request), seconds, stats)
+    response['Server-Timing'] = _server_timing(seconds, stats)
+    return response
+
+
+@sync_and_async_middleware
+def MetricsMiddleware(get_response):
+    """Time each request and record its numbers under the resolved URL name."""
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            stats = RequestStats()
+            token = _current.set(stats)
+            started = time.perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                _current.reset(token)
+            return _finish(request, response, started, stats)
+    else:
+        def middleware(request):
+            stats = RequestStats()
+            token = _current.set(stats)
+            started = time.perf_counter()
+            try:
+                response = get_response(request)
+            finally:
+                _current.reset(token)
+            return _finish(request, response, started, stats)
+    return middleware
+
+
+def metrics_view(request):
+    """Serve the metrics of this process in Prometheus text format, to staff or scrapers with the token.
+
+    With the ``POLLS_METRICS_TOKEN`` setting, scrapers must send it as
+    ``Authorization: Bearer <token>``. Without it, only logged-in staff can
+    read the metrics, and everybody else gets a 404.
+
+    Raises:
+        Http404: if no token is set and the user is not staff.
+    """
+    if request.user.is_staff:
+        return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
+    token = getattr(settings, 'POLLS_METRICS_TOKEN', '')
+    if not token:
+        raise Http404('No metrics here.')
+    if request.headers.get('Authorization') != f'Bearer {token}':
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render(), content_type=CONTENT_TYPE)
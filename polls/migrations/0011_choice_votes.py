@@ -0,0 +1,35 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:51
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def fill_tallies(apps, schema_editor):
+    """Count the existing votes into the new tally column."""
+    Choice = apps.get_model("polls", "Choice")
+    Vote = apps.get_model("polls", "Vote")
+    counts = (
+        Vote.objects.filter(choice=OuterRef("pk"))
+        .order_by()
+        .values("choice")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    Choice.objects.update(votes=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0010_alter_question_pub_date"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="choice",
+            name="votes",
+            field=models.IntegerField(default=0, verbose_name="vote tally"),
+        ),
+        migrations.RunPython(fill_tallies, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 4.2.30 on 2026-10-18 17:53
+
+from django.db import migrations, models
+from django.db.models import Count, Max, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def drop_duplicate_votes(apps, schema_editor):
+    """Keep only the latest vote of each user on each question, then recount tallies."""
+    Choice = apps.get_model("polls", "Choice")
+    Vote = apps.get_model("polls", "Vote")
+    duplicated = (
+        Vote.objects.filter(user__isnull=False, question__isnull=False)
+        .values("user", "question")
+        .annotate(latest=Max("pk"), total=Count("pk"))
+        .filter(total__gt=1)
+    )
+    for row in duplicated:
+        Vote.objects.filter(user=row["user"], question=row["question"]).exclude(
+            pk=row["latest"]
+        ).delete()
+    counts = (
+        Vote.objects.filter(choice=OuterRef("pk"))
+        .order_by()
+        .values("choice")
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    Choice.objects.update(votes=Coalesce(Subquery(counts), Value(0)))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0011_choice_votes"),
+    ]
+
+    operations = [
+        migrations.RunPython(drop_duplicate_votes, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name="vote",
+            constraint=models.UniqueConstraint(
+                fields=("user", "question"), name="unique_vote_per_user_question"
+            ),
+        ),
+    ]
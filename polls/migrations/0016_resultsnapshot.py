@@ -0,0 +1,33 @@
+# Generated by Django 4.2.30 on 2026-10-18 18:39
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("polls", "0015_question_keyset_index"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="ResultSnapshot",
+            fields=[
+                (
+                    "question",
+                    models.OneToOneField(
+                        on_delete=django.db.models.deletion.CASCADE,
+                        primary_key=True,
+                        related_name="snapshot",
+                        serialize=False,
+                        to="polls.question",
+                    ),
+                ),
+                ("closed_at", models.DateTimeField(verbose_name="date closed")),
+                ("total", models.IntegerField(verbose_name="total votes")),
+                ("counts", models.JSONField()),
+                ("frozen_at", models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
@@ -1,11 +1,37 @@
 """Polls models."""
 import datetime
 from django.db import models
+from django.db.models import Q
 from django.utils import timezone
 from django.contrib import admin
 from django.contrib.auth.models import User
 
 
+class QuestionQuerySet(models.QuerySet):
+    """Voting-state filters done in SQL, matching the Question methods of the same rules.
+
+    Each takes the current time as ``now``, by default timezone.now().
+    """
+
+    def published(self, now=None):
+        """Questions whose pub_date has come (is_published)."""
+        return self.filter(pub_date__lte=now or timezone.now())
+
+    def open_for_voting(self, now=None):
+        """Published questions without an end_date or whose end_date has not passed (can_vote)."""
+        now = now or timezone.now()
+        return self.published(now).filter(Q(end_date__isnull=True) | Q(end_date__gte=now))
+
+    def closed(self, now=None):
+        """Questions whose end_date has passed (is_closed)."""
+        return self.filter(end_date__lt=now or timezone.now())
+
+    def recent(self, now=None):
+        """Available questions published within the last day (was_published_recently)."""
+        now = now or timezone.now()
+        return self.filter(available=True, pub_date__lte=now, pub_date__gte=now - datetime.timedelta(days=1))
+
+
 class Question(models.Model):
     """Question model."""
 
@@ -15,15 +41,30 @@ class Question(models.Model):
     end_date = models.DateTimeField('date ended', null=True, blank=True)
     available = models.BooleanField("poll available", default=True)
 
-    @admin.display(
-        boolean=True,
-        ordering=['pub_date', 'end_date'],
-        description='Published recently?',
-    )
+    objects = QuestionQuerySet.as_manager()
+
+    class Meta:
+        """Indexes for listing published questions newest first.
+
+        (pub_date, id) is also the keyset that polls.pagination seeks on, and
+        end_date finds the closed questions (QuestionQuerySet.closed).
+        """
+
+        indexes = [
+            models.Index(fields=['pub_date', 'id'], name='polls_question_pub_id_idx'),
+            models.Index(fields=['available', 'pub_date'], name='polls_question_avail_pub_idx'),
+            models.Index(fields=['end_date'], name='polls_question_end_date_idx'),
+        ]
+
     def __str__(self) -> str:
         """Return question text."""
         return self.question_text
 
+    @admin.display(
+        boolean=True,
+        ordering='pub_date',
+        description='Published recently?',
+    )
     def was_published_recently(self):
         """Check that question was published less than 1 day or not.
 
@@ -44,6 +85,14 @@ class Question(models.Model):
         now = timezone.now()
         return now >= self.pub_date
 
+    def is_closed(self):
+        """Check that voting on the question has ended for good.
+
+        Returns:
+            True if the question has an end_date and it has passed.
+        """
+        return self.end_date is not None and self.end_date < timezone.now()
+
     def can_vote(self):
         """Check that voting is during pub_date and end_date, they can vote.
 
@@ -53,7 +102,7 @@ class Question(models.Model):
         # check end_date is not null
         if self.end_date:
             now = timezone.localtime()
-            return self.end_date >= now and self.is_published
+            return self.end_date >= now and self.is_published()
         return self.is_published()
 
 
@@ -62,11 +111,9 @@ class Choice(models.Model):
 
     question = models.ForeignKey(Question, on_delete=models.CASCADE)
     choice_text = models.CharField(max_length=200)
-
-    @property
-    def votes(self):
-        """Total vote for each choice."""
-        return self.vote_set.count()
+    # stored tally kept in step with Vote rows by polls.voting.record_vote,
+    # so results never count votes at request time.
+    votes = models.IntegerField("vote tally", default=0)
 
     def __str__(self) -> str:
         """Return choice text."""
@@ -80,6 +127,56 @@ class Vote(models.Model):
     choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
     question = models.ForeignKey(Question, on_delete=models.CASCADE, null=True)
 
+    class Meta:
+        """One vote per user for each question.
+
+        The unique constraint also indexes the (user, question) lookup of a
+        user's vote; the (question, choice) index serves per-question counting.
+        """
+
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'question'],
+                                    name='unique_vote_per_user_question'),
+        ]
+        indexes = [
+            models.Index(fields=['question', 'choice'], name='polls_vote_question_choice_idx'),
+        ]
+
     def __str__(self) -> str:
         """Return user, question, choice."""
         return f"{self.user.username} --> {self.question.question_text}: {self.choice.choice_text}"
+
+
+class PendingVote(models.Model):
+    """Vote accepted by the write-behind buffer and not yet applied to Vote."""
+
+    user = models.ForeignKey(User, on_delete=models.CASCADE)
+    question = models.ForeignKey(Question, on_delete=models.CASCADE)
+    choice = models.ForeignKey(Choice, on_delete=models.CASCADE)
+    received = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        """Flushing one voter's buffered votes looks them up by (user, question)."""
+
+        indexes = [
+            models.Index(fields=['user', 'question'], name='polls_pendingvote_user_q_idx'),
+        ]
+
+    def __str__(self) -> str:
+        """Return ids of user, question, choice."""
+        return f"user {self.user_id} --> question {self.question_id}: choice {self.choice_id}"
+
+
+class ResultSnapshot(models.Model):
+    """Final results of a closed question, frozen by polls.snapshots so its votes are never counted again."""
+
+    question = models.OneToOneField(Question, on_delete=models.CASCADE, primary_key=True, related_name='snapshot')
+    closed_at = models.DateTimeField('date closed')
+    total = models.IntegerField('total votes')
+    # [[choice id, choice text, votes], ...] in choice order
+    counts = models.JSONField()
+    frozen_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self) -> str:
+        """Return the question id and total."""
+        return f"question {self.question_id}: {self.total} votes"
@@ -0,0 +1,104 @@
+"""Keyset pagination of questions, newest first.
+
+A page is fetched by seeking past the (pub_date, id) of the last question of
+the previous page instead of skipping an OFFSET, so every page costs the same
+index range scan however deep it is, and pages stay stable while new
+questions are published.
+
+ApproximateCountPaginator serves the admin changelists of tables too large to
+COUNT(*) on every page view, estimating the size of an unfiltered table
+instead.
+"""
+import base64
+import binascii
+from django.core.paginator import Paginator
+from django.db import connections
+from django.db.models import Max
+from django.utils.dateparse import parse_datetime
+from django.utils.functional import cached_property
+
+PAGE_SIZE = 20
+# below this many rows an exact COUNT(*) is cheap enough to keep
+EXACT_COUNT_LIMIT = 10000
+
+
+def encode_cursor(question):
+    """Return the opaque cursor pointing just after a question."""
+    raw = f'{question.pub_date.isoformat()}|{question.pk}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return the (pub_date, id) encoded in a cursor.
+
+    Raises:
+        ValueError: if the cursor was not made by encode_cursor.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        pub_date, pk = raw.split('|')
+        pub_date = parse_datetime(pub_date)
+        pk = int(pk)
+    except (binascii.Error, UnicodeDecodeError, ValueError) as error:
+        raise ValueError(f'invalid cursor {cursor!r}') from error
+    if pub_date is None:
+        raise ValueError(f'invalid cursor {cursor!r}')
+    return pub_date, pk
+
+
+def question_page(queryset, cursor=None, size=PAGE_SIZE):
+    """Return one page of questions, newest first, and the cursor of the next page.
+
+    Arguments:
+        queryset {QuerySet} -- the questions to page through
+        cursor {str} -- cursor returned with the previous page, None for the first page
+        size {int} -- questions per page
+
+    Returns:
+        tuple: list of questions and the next page's cursor (None on the last page).
+    """
+    queryset = queryset.order_by('-pub_date', '-pk')
+    if cursor:
+        pub_date, pk = decode_cursor(cursor)
+        # (pub_date, id) < (cursor pub_date, cursor id), as an index range on pub_date
+        queryset = queryset.filter(pub_date__lte=pub_date).exclude(pub_date=pub_date, pk__gte=pk)
+    questions = list(queryset[:size + 1])
+    next_cursor = encode_cursor(questions[size - 1]) if len(questions) > size else None
+    return questions[:size], next_cursor
+
+
+def estimated_rows(model, using):
+    """Return a cheap estimate of the number of rows of a model's table.
+
+    PostgreSQL keeps one in its statistics; elsewhere the highest primary key
+    is used, found at the end of the primary key index, which counts deleted
+    rows as well.
+    """
+    connection = connections[using]
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT reltuples FROM pg_class WHERE oid = %s::regclass', [model._meta.db_table])
+            row = cursor.fetchone()
+        if row and row[0] > 0:
+            return int(row[0])
+    return model._base_manager.using(using).aggregate(highest=Max('pk'))['highest'] or 0
+
+
+class ApproximateCountPaginator(Paginator):
+    """Paginator that estimates the size of a large unfiltered table instead of counting it.
+
+    Filtered lists (searches, list filters, date drill-downs) are still
+    counted exactly, since their count is what the filter is for and it is
+    usually narrowed by an index.
+    """
+
+    @cached_property
+    def count(self):
+        """Return the estimated number of objects when unfiltered and large, else the exact one."""
+        queryset = self.object_list
+        if getattr(queryset, 'query', None) is None or queryset.query.where or queryset.query.distinct:
+            return super().count
+        estimate = estimated_rows(queryset.model, queryset.db)
+        if estimate < EXACT_COUNT_LIMIT:
+            return super().count
+        return estimate
@@ -0,0 +1,229 @@
+"""Rate limits and load shedding in front of the vote view.
+
+Votes are limited per user and per question, each with a rate such as
+``10/60`` (ten votes every sixty seconds; empty turns the limit off). The
+buckets live either in this process (MemoryBuckets, token buckets refilled
+continuously) or in the Django cache (CacheBuckets, a counter per fixed
+window, shared by every process using the same cache). A vote over a limit
+is answered with 429 Too Many Requests.
+
+Independently, WriteQueue counts the votes of this process that are waiting
+for or holding the database. Under ASGI those writes run one at a time in the
+sync thread, so once ``POLLS_MAX_PENDING_WRITES`` are queued, more votes
+would only wait longer; they are answered with 503 Service Unavailable
+straight away instead. Both answers carry a Retry-After header.
+"""
+import math
+import threading
+import time
+from contextlib import contextmanager
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.http import HttpResponse
+
+# a process keeps at most this many memory buckets before dropping full ones
+MAX_BUCKETS = 10000
+# seconds an overloaded server asks voters to wait
+OVERLOAD_RETRY_AFTER = getattr(settings, 'POLLS_OVERLOAD_RETRY_AFTER', 1)
+
+
+def parse_rate(rate):
+    """Return (count, seconds) of a rate like '10/60', or None for an empty rate.
+
+    Raises:
+        ImproperlyConfigured: if the rate is not two positive numbers.
+    """
+    if not rate:
+        return None
+    try:
+        count, seconds = rate.split('/')
+        count, seconds = int(count), float(seconds)
+    except ValueError:
+        raise ImproperlyConfigured(f"rate must look like '10/60' (votes/seconds), not {rate!r}")
+    if count <= 0 or seconds <= 0:
+        raise ImproperlyConfigured(f"rate must allow some votes over some time, not {rate!r}")
+    return count, seconds
+
+
+class MemoryBuckets:
+    """Token buckets kept in this process."""
+
+    def __init__(self, clock=time.monotonic):
+        """Start with every bucket full."""
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._buckets = {}
+
+    def take(self, key, count, seconds):
+        """Take a token from a bucket holding count tokens refilled over seconds.
+
+        Returns:
+            float: 0 if a token was taken, else the seconds until one is available.
+        """
+        now = self.clock()
+        with self._lock:
+            tokens, updated, _ = self._buckets.get(key, (count, now, seconds))
+            tokens = min(count, tokens + (now - updated) * count / seconds)
+            if tokens < 1:
+                self._buckets[key] = (tokens, now, seconds)
+                return (1 - tokens) * seconds / count
+            if len(self._buckets) >= MAX_BUCKETS and key not in self._buckets:
+                self._prune(now)
+            self._buckets[key] = (tokens - 1, now, seconds)
+            return 0
+
+    async def atake(self, key, count, seconds):
+        """Async version of take (it never waits)."""
+        return self.take(key, count, seconds)
+
+    def _prune(self, now):
+        # a bucket untouched for its whole period is full again, as good as absent
+        self._buckets = {key: (tokens, updated, seconds) for key, (tokens, updated, seconds) in self._buckets.items()
+                         if now - updated < seconds}
+
+    def clear(self):
+        """Refill every bucket."""
+        with self._lock:
+            self._buckets.clear()
+
+
+class CacheBuckets:
+    """Vote counters per fixed window in the Django cache, shared by all processes."""
+
+    def __init__(self, clock=time.time):
+        """Use the default cache."""
+        self.clock = clock
+
+    def _window(self, key, seconds):
+        now = self.clock()
+        window = int(now // seconds)
+        return f'polls:rate:{key}:{window}', (window + 1) * seconds - now
+
+    def take(self, key, count, seconds):
+        """Count a vote in the current window of seconds, allowing count per window.
+
+        Returns:
+            float: 0 if the vote is allowed, else the seconds until the next window.
+        """
+        key, remaining = self._window(key, seconds)
+        cache.add(key, 0, math.ceil(seconds))
+        try:
+            taken = cache.incr(key)
+        except ValueError:
+            # evicted between add and incr
+            cache.set(key, 1, math.ceil(seconds))
+            taken = 1
+        return remaining if taken > count else 0
+
+    async def atake(self, key, count, seconds):
+        """Async version of take."""
+        key, remaining = self._window(key, seconds)
+        await cache.aadd(key, 0, math.ceil(seconds))
+        try:
+            taken = await cache.aincr(key)
+        except ValueError:
+            await cache.aset(key, 1, math.ceil(seconds))
+            taken = 1
+        return remaining if taken > count else 0
+
+
+BACKENDS = {'memory': MemoryBuckets, 'cache': CacheBuckets}
+
+
+class VoteLimiter:
+    """Per-user and per-question vote rates."""
+
+    def __init__(self, user_rate, question_rate, buckets):
+        """Limit votes to user_rate per user and question_rate per question (None for no limit)."""
+        self.limits = [(prefix, rate) for prefix, rate in (('user', user_rate), ('question', question_rate)) if rate]
+        self.buckets = buckets
+
+    @classmethod
+    def from_settings(cls):
+        """Build the limiter from the ``POLLS_VOTE_RATE_*`` and ``POLLS_RATE_LIMIT_BACKEND`` settings.
+
+        Raises:
+            ImproperlyConfigured: if a rate or the backend is invalid.
+        """
+        backend = getattr(settings, 'POLLS_RATE_LIMIT_BACKEND', 'memory')
+        if backend not in BACKENDS:
+            raise ImproperlyConfigured(f"POLLS_RATE_LIMIT_BACKEND must be one of {', '.join(BACKENDS)}")
+        return cls(parse_rate(getattr(settings, 'POLLS_VOTE_RATE_USER', '10/60')),
+                   parse_rate(getattr(settings, 'POLLS_VOTE_RATE_QUESTION', '')),
+                   BACKENDS[backend]())
+
+    def check(self, user_id, question_id):
+        """Count a vote of a user on a question.
+
+        Returns:
+            float: 0 if the vote is within the limits, else the seconds to wait.
+        """
+        ids = {'user': user_id, 'question': question_id}
+        for prefix, (count, seconds) in self.limits:
+            wait = self.buckets.take(f'{prefix}:{ids[prefix]}', count, seconds)
+            if wait:
+                return wait
+        return 0
+
+    async def acheck(self, user_id, question_id):
+        """Async version of check."""
+        ids = {'user': user_id, 'question': question_id}
+        for prefix, (count, seconds) in self.limits:
+            wait = await self.buckets.atake(f'{prefix}:{ids[prefix]}', count, seconds)
+            if wait:
+                return wait
+        return 0
+
+
+class Overloaded(Exception):
+    """Too many database writes are pending already."""
+
+
+class WriteQueue:
+    """Number of writes of this process waiting for or holding the database."""
+
+    def __init__(self, limit):
+        """Admit at most limit writes at a time (0 for no limit)."""
+        self.limit = limit
+        self.pending = 0
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self):
+        """Hold a place in the queue while writing.
+
+        Raises:
+            Overloaded: if limit writes are pending already.
+        """
+        with self._lock:
+            if self.limit and self.pending >= self.limit:
+                raise Overloaded
+            self.pending += 1
+        try:
+            yield
+        finally:
+            with self._lock:
+                self.pending -= 1
+
+
+def retry_later(status, seconds, message):
+    """Return a 429 or 503 response asking the client to retry after seconds (rounded up)."""
+    response = HttpResponse(message, status=status, content_type='text/plain; charset=utf-8')
+    response.headers['Retry-After'] = str(max(1, math.ceil(seconds)))
+    return response
+
+
+vote_limiter = VoteLimiter.from_settings()
+pending_writes = WriteQueue(getattr(settings, 'POLLS_MAX_PENDING_WRITES', 50))
+
+
+@contextmanager
+def limits_off():
+    """Turn the vote rate limits and load shedding off for a block, e.g. while benchmarking vote throughput."""
+    limits, limit = vote_limiter.limits, pending_writes.limit
+    vote_limiter.limits, pending_writes.limit = [], 0
+    try:
+        yield
+    finally:
+        vote_limiter.limits, pending_writes.limit = limits, limit
@@ -0,0 +1,121 @@
+"""Send reads of polls models to read-only replicas of the database.
+
+Replicas are extra database aliases listed in the ``POLLS_REPLICAS`` setting
+with a weight each; a read picks one at random in proportion to the weights.
+Reads only go to a replica inside a request let through by
+ReplicaReadMiddleware, i.e. a GET or HEAD request of a browser that has not
+written anything in the last ``POLLS_REPLICA_PIN_SECONDS``. Everything else
+reads the primary (``default``):
+
+- writes, and reads inside a transaction on the primary,
+- the request that votes and, through a short-lived cookie, the voter's next
+  requests, so they see their own vote however far the replicas lag,
+- cache fills (see polls.cache), so a stale replica is never cached under a
+  fresh results version,
+- management commands and the shell.
+
+With SQLite, ``manage.py sync_replicas`` brings the replica files up to date.
+"""
+import random
+import sqlite3
+from contextlib import closing, contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.utils.decorators import sync_and_async_middleware
+
+PIN_COOKIE = 'polls_primary'
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+
+_replica_reads = ContextVar('polls_replica_reads', default=False)
+
+
+@contextmanager
+def _reading_from(replicas):
+    token = _replica_reads.set(replicas)
+    try:
+        yield
+    finally:
+        _replica_reads.reset(token)
+
+
+def replica_reads():
+    """Return a context manager letting reads of polls models go to the replicas."""
+    return _reading_from(True)
+
+
+def primary():
+    """Return a context manager sending every read to the primary."""
+    return _reading_from(False)
+
+
+class ReplicaRouter:
+    """Route polls reads to a weighted random replica when replica reads are allowed."""
+
+    def __init__(self):
+        """Use a random generator of our own, so it can be seeded."""
+        self.random = random.Random()
+
+    @staticmethod
+    def replicas():
+        """Return the replica aliases and their weights."""
+        return getattr(settings, 'POLLS_REPLICAS', {})
+
+    def db_for_read(self, model, **hints):
+        """Return a replica for polls models, None (the primary) otherwise."""
+        replicas = self.replicas()
+        if (not replicas or not _replica_reads.get() or model._meta.app_label != 'polls'
+                or connections[DEFAULT_DB_ALIAS].in_atomic_block):
+            return None
+        return self.random.choices(list(replicas), weights=list(replicas.values()))[0]
+
+    def db_for_write(self, model, **hints):
+        """Write to the primary."""
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        """Allow relations between objects read from the primary or any replica."""
+        aliases = {DEFAULT_DB_ALIAS, *self.replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        """Migrate the primary only, replicas are copies of it."""
+        if db in self.replicas():
+            return False
+        return None
+
+
+@sync_and_async_middleware
+def ReplicaReadMiddleware(get_response):
+    """Allow replica reads for read-only requests and pin writers to the primary for a while."""
+    def allows_replicas(request):
+        return request.method in SAFE_METHODS and PIN_COOKIE not in request.COOKIES
+
+    def pin(request, response):
+        if request.method not in SAFE_METHODS:
+            response.set_cookie(PIN_COOKIE, '1', max_age=getattr(settings, 'POLLS_REPLICA_PIN_SECONDS', 5),
+                                httponly=True, samesite='Lax')
+        return response
+
+    if iscoroutinefunction(get_response):
+        async def middleware(request):
+            with _reading_from(allows_replicas(request)):
+                return pin(request, await get_response(request))
+    else:
+        def middleware(request):
+            with _reading_from(allows_replicas(request)):
+                return pin(request, get_response(request))
+    return middleware
+
+
+def copy_database(source, target):
+    """Copy the SQLite database file at source over the one at target, consistently.
+
+    Uses SQLite's online backup, so the source stays usable meanwhile and
+    readers of the target see either the old or the new copy.
+    """
+    with closing(sqlite3.connect(source)) as source_db, closing(sqlite3.connect(target)) as target_db:
+        source_db.backup(target_db)
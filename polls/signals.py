@@ -0,0 +1,56 @@
+"""Signal receivers for polls app."""
+from django.contrib.auth import get_user_model
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_delete, post_save, pre_delete
+from django.dispatch import receiver
+from .auth import forget_user
+from .cache import bump_choices_version, bump_results_version, clear_latest_questions
+from .metrics import time_queries
+from .models import Choice, Question, Vote
+from .snapshots import discard
+from .voting import release_votes
+
+
+@receiver(pre_delete, sender=get_user_model())
+def release_user_votes(sender, instance, **kwargs):
+    """Take a deleted user's votes off the tallies in one UPDATE, before the cascade deletes them.
+
+    Vote itself has no delete receivers, so cascades delete its rows with
+    one query instead of loading them (choices and questions take their
+    tallies with them).
+    """
+    release_votes(Vote.objects.filter(user=instance))
+
+
+@receiver([post_save, post_delete], sender=Question)
+@receiver([post_save, post_delete], sender=Choice)
+def question_changed(sender, **kwargs):
+    """Drop the cached index list when a question or its choices change (incl. admin edits)."""
+    clear_latest_questions()
+
+
+@receiver(post_save, sender=Question)
+def question_reopened(sender, instance, **kwargs):
+    """Discard the frozen results of a question that is open again (e.g. end date moved in the admin)."""
+    if not instance.is_closed():
+        discard(instance.pk)
+
+
+@receiver([post_save, post_delete], sender=Choice)
+def choice_changed(sender, instance, **kwargs):
+    """Drop the cached choice list and results of the choice's question (incl. ChoiceInline edits)."""
+    bump_choices_version(instance.question_id)
+    bump_results_version(instance.question_id)
+
+
+@receiver([post_save, post_delete], sender=get_user_model())
+def user_changed(sender, instance, **kwargs):
+    """Drop the cached copy of a user when it is saved (incl. last_login, password) or deleted."""
+    forget_user(instance.pk)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    """Time the queries of every new database connection for the request metrics."""
+    if time_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(time_queries)
@@ -0,0 +1,103 @@
+"""Frozen results of closed polls.
+
+Once a question's end date has passed its votes can no longer change, so its
+results are counted from the Vote rows one last time (after applying any
+votes still in the write-behind buffer) and stored as a ResultSnapshot. This
+happens on the first request for the results after the close, or for every
+closed poll at once with ``manage.py finalize_polls``. From then on the
+results JSON, the live stream and the tallies export of the question read
+the snapshot only (through the cache).
+
+Moving the end date back into the future, e.g. in the admin, reopens the
+poll: the snapshot is deleted in the same transaction, and the cached copy
+once it has committed. Freezing re-reads the question inside its own
+transaction, so a poll reopened meanwhile is never frozen.
+"""
+from django.core.cache import cache
+from django.db import transaction
+from .cache import bump_results_version, get_results, results_payload
+from .metrics import record_cache_lookup
+from .models import Choice, Question, ResultSnapshot
+from .routers import primary
+from .voting import counted_votes, flush_pending_votes
+
+
+def _final_key(question_id):
+    return f'polls:final-results:{question_id}'
+
+
+def freeze(question_id):
+    """Store the final results of a closed question, unless they are stored already.
+
+    Returns:
+        ResultSnapshot or None: the snapshot, or None if the question is open after all.
+    """
+    while flush_pending_votes(question_id=question_id):
+        pass
+    with transaction.atomic():
+        question = Question.objects.select_for_update().get(pk=question_id)
+        if not question.is_closed():
+            return None
+        counts = [list(row) for row in Choice.objects.filter(question=question).order_by('pk').annotate(
+            counted=counted_votes()).values_list('pk', 'choice_text', 'counted')]
+        snapshot, _ = ResultSnapshot.objects.get_or_create(question=question, defaults={
+            'closed_at': question.end_date,
+            'total': sum(votes for _, _, votes in counts),
+            'counts': counts,
+        })
+    return snapshot
+
+
+def snapshot_payload(snapshot):
+    """Return the results payload of a snapshot, shaped like polls.cache.compute_results."""
+    return results_payload(snapshot.question_id, [
+        {'id': choice_id, 'choice_text': text, 'votes': votes} for choice_id, text, votes in snapshot.counts])
+
+
+def final_results(question):
+    """Return the results payload of a closed question from its snapshot, freezing the results first if needed.
+
+    Returns:
+        dict or None: the payload, or None if the question is open after all.
+    """
+    key = _final_key(question.pk)
+    payload = cache.get(key)
+    record_cache_lookup(payload is not None)
+    if payload is None:
+        with primary():
+            snapshot = ResultSnapshot.objects.filter(pk=question.pk).first() or freeze(question.pk)
+        if snapshot is None:
+            return None
+        payload = snapshot_payload(snapshot)
+        cache.set(key, payload, None)
+    return payload
+
+
+def question_results(question):
+    """Return the results payload of a question: from its snapshot once closed, else from the tallies."""
+    payload = final_results(question) if question.is_closed() else None
+    return payload if payload is not None else get_results(question.pk)
+
+
+def finalize_closed(questions=None):
+    """Freeze the results of every closed question that has no snapshot yet.
+
+    Arguments:
+        questions {QuerySet} -- only these questions (default: all)
+
+    Returns:
+        int: the number of snapshots stored.
+    """
+    if questions is None:
+        questions = Question.objects.all()
+    pending = questions.closed().filter(snapshot__isnull=True).values_list('pk', flat=True)
+    return sum(freeze(question_id) is not None for question_id in list(pending))
+
+
+def discard(question_id):
+    """Delete the snapshot of a reopened question, and its cached results once that has committed."""
+    if ResultSnapshot.objects.filter(pk=question_id).delete()[0]:
+        def forget():
+            cache.delete(_final_key(question_id))
+            bump_results_version(question_id)
+        transaction.on_commit(forget)
@@ -0,0 +1,153 @@
+"""Test for the admin of polls app."""
+from unittest import mock
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from polls import pagination
+from polls.models import Choice, Question, Vote
+from polls.pagination import ApproximateCountPaginator, estimated_rows
+from polls.voting import record_vote
+from .test_base import create_question
+
+
+class AdminTest(TestCase):
+    """Changelists run a fixed number of queries however many votes there are."""
+
+    def setUp(self) -> None:
+        """Create a question with choices and log a superuser in."""
+        self.admin = User.objects.create_superuser(username="admin", password="admin123")
+        # every request loads the session and the admin again (no cached users without a shared cache),
+        # so those queries are the same on each page and the counts below compare the changelist queries
+        self.client.force_login(self.admin)
+        self.question = create_question("test", days=-1)
+        self.apple = self.question.choice_set.create(choice_text="apple")
+        self.banana = self.question.choice_set.create(choice_text="banana")
+
+    def add_votes(self, count):
+        """Create count voters voting for apple."""
+        users = User.objects.bulk_create([User(username=f"voter-{len(Vote.objects.all())}-{number}")
+                                          for number in range(count)])
+        Vote.objects.bulk_create([Vote(user=user, question=self.question, choice=self.apple) for user in users])
+        Choice.objects.filter(pk=self.apple.pk).update(votes=Vote.objects.count())
+
+    def changelist_queries(self, model):
+        """Return the SQL run by a changelist page."""
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse(f'admin:polls_{model}_changelist'))
+        self.assertEqual(response.status_code, 200)
+        return [query['sql'] for query in queries]
+
+    def test_vote_changelist_queries(self):
+        """The vote changelist joins voters, questions and choices instead of a query per row."""
+        self.add_votes(5)
+        few = len(self.changelist_queries('vote'))
+        self.add_votes(50)
+        self.assertEqual(len(self.changelist_queries('vote')), few)
+
+    @override_settings(AUTHENTICATION_BACKENDS=['polls.auth.CachedModelBackend'],
+                       SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_cached_user_profile(self):
+        """With the shared-cache profile, a warm changelist reads neither the session nor the admin user."""
+        self.add_votes(5)
+        self.client.force_login(self.admin)
+        cold = self.changelist_queries('vote')
+        warm = self.changelist_queries('vote')
+        self.assertEqual([sql for sql in warm if 'django_session' in sql or 'FROM "auth_user" WHERE' in sql], [])
+        # the login stored the session in the cache, the first page read the user once
+        self.assertEqual(len(cold) - len(warm), 1)
+
+    def test_vote_changelist_skips_count(self):
+        """Past EXACT_COUNT_LIMIT, the vote changelist estimates its size instead of counting every row."""
+        self.add_votes(30)
+        with mock.patch.object(pagination, 'EXACT_COUNT_LIMIT', 10):
+            queries = self.changelist_queries('vote')
+        self.assertFalse([sql for sql in queries if 'COUNT(' in sql and 'polls_vote' in sql], queries)
+
+    def test_question_changelist_totals(self):
+        """Question totals come from the changelist query, one query for any number of questions."""
+        self.add_votes(3)
+        few = len(self.changelist_queries('question'))
+        for number in range(10):
+            create_question(f"more {number}", days=-1).choice_set.create(choice_text="cherry", votes=2)
+        self.assertEqual(len(self.changelist_queries('question')), few)
+        response = self.client.get(reverse('admin:polls_question_changelist'))
+        self.assertEqual(response.context['cl'].result_list.get(pk=self.question.pk).total_votes, 3)
+
+    def test_question_date_filters(self):
+        """The question changelist filters by voting state and dates."""
+        url = reverse('admin:polls_question_changelist')
+        for query in ('voting=open', 'voting=closed', 'voting=recent', f'pub_date__year={self.question.pub_date.year}'):
+            self.assertEqual(self.client.get(f'{url}?{query}').status_code, 200, query)
+
+    def test_vote_change_moves_tally(self):
+        """Changing a vote's choice in the admin moves the tally with it."""
+        voter = User.objects.create_user(username="voter")
+        self.client.post(reverse('admin:polls_vote_add'),
+                         {'user': voter.pk, 'question': self.question.pk, 'choice': self.apple.pk})
+        vote = Vote.objects.get(user=voter)
+        self.client.post(reverse('admin:polls_vote_change', args=(vote.pk,)), {'choice': self.banana.pk})
+        self.assertEqual(Vote.objects.get(user=voter).choice, self.banana)
+        self.assertEqual(list(Choice.objects.order_by('pk').values_list('votes', flat=True)), [0, 1])
+
+    def test_vote_choice_of_other_question(self):
+        """A choice of another question is rejected, on add and on change, without writing a vote."""
+        voter = User.objects.create_user(username="voter")
+        other = create_question("other", days=-1).choice_set.create(choice_text="cherry")
+        response = self.client.post(reverse('admin:polls_vote_add'),
+                                    {'user': voter.pk, 'question': self.question.pk, 'choice': other.pk})
+        self.assertFormError(response.context['adminform'].form, 'choice', "Pick a choice of the vote's question.")
+        self.assertFalse(Vote.objects.exists())
+        record_vote(voter, self.apple)
+        vote = Vote.objects.get(user=voter)
+        response = self.client.post(reverse('admin:polls_vote_change', args=(vote.pk,)), {'choice': other.pk})
+        self.assertFormError(response.context['adminform'].form, 'choice', "Pick a choice of the vote's question.")
+        self.assertEqual(list(Vote.objects.values_list('pk', 'choice')), [(vote.pk, self.apple.pk)])
+        self.assertEqual(Choice.objects.get(pk=other.pk).votes, 0)
+
+    def test_vote_delete_releases_tally(self):
+        """Deleting votes in the admin, one or a selection, takes them off the tallies."""
+        self.add_votes(3)
+        votes = list(Vote.objects.order_by('pk').values_list('pk', flat=True))
+        self.client.post(reverse('admin:polls_vote_delete', args=(votes[0],)), {'post': 'yes'})
+        self.assertEqual(Choice.objects.get(pk=self.apple.pk).votes, 2)
+        self.client.post(reverse('admin:polls_vote_changelist'),
+                         {'action': 'delete_selected', '_selected_action': votes[1:], 'post': 'yes'})
+        self.assertFalse(Vote.objects.exists())
+        self.assertEqual(Choice.objects.get(pk=self.apple.pk).votes, 0)
+
+    def test_tally_not_editable(self):
+        """Neither the choice form nor the question's choice inline can overwrite a stored tally."""
+        self.add_votes(2)
+        response = self.client.get(reverse('admin:polls_question_change', args=(self.question.pk,)))
+        self.assertNotContains(response, 'name="choice_set-0-votes"')
+        self.client.post(reverse('admin:polls_choice_change', args=(self.apple.pk,)),
+                         {'question': self.question.pk, 'choice_text': 'apricot', 'votes': 100})
+        self.apple.refresh_from_db()
+        self.assertEqual((self.apple.choice_text, self.apple.votes), ('apricot', 2))
+
+    def test_was_published_recently_display(self):
+        """The admin display options are on was_published_recently, not __str__."""
+        self.assertTrue(Question.was_published_recently.boolean)
+        self.assertFalse(hasattr(Question.__str__, 'boolean'))
+
+
+class ApproximateCountPaginatorTest(TestCase):
+    """Test for the approximate count paginator."""
+
+    def setUp(self) -> None:
+        """Create a few questions."""
+        for number in range(5):
+            create_question(f"question {number}", days=-1)
+
+    def test_estimate(self):
+        """A large unfiltered table is estimated, a small or filtered one counted."""
+        Question.objects.filter(pk=Question.objects.order_by('pk').first().pk).delete()
+        estimate = estimated_rows(Question, 'default')
+        self.assertGreaterEqual(estimate, 4)
+        self.assertEqual(ApproximateCountPaginator(Question.objects.all(), 2).count, 4)
+        with mock.patch.object(pagination, 'EXACT_COUNT_LIMIT', 1):
+            self.assertEqual(ApproximateCountPaginator(Question.objects.all(), 2).count, estimate)
+            self.assertEqual(ApproximateCountPaginator(Question.objects.filter(question_text="question 1"), 2).count,
+                             1)
@@ -0,0 +1,79 @@
+"""Test for cached sessions and cached user lookups."""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import SimpleTestCase, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from polls.checks import check_shared_cache, check_shared_results_cache
+from polls.voting import record_vote
+from .test_base import create_question
+
+
+@override_settings(AUTHENTICATION_BACKENDS=['polls.auth.CachedModelBackend'],
+                   SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+class CachedSessionAndUserTest(TestCase):
+    """A logged-in voter's requests do not read sessions or users from the database once warm (shared cache)."""
+
+    def setUp(self) -> None:
+        """Log a voter in and create a question they voted on."""
+        cache.clear()
+        self.user = User.objects.create_user(username="demo_test", password="test123")
+        self.client.login(username="demo_test", password="test123")
+        self.question = create_question("test", days=-1)
+        record_vote(self.user, self.question.choice_set.create(choice_text="apple"))
+        self.url = reverse('polls:detail', args=(self.question.id,))
+
+    def session_and_auth_queries(self):
+        """Request the detail page and return the SQL it ran against the session and user tables."""
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(self.url).status_code, 200)
+        return [query['sql'] for query in queries
+                if 'django_session' in query['sql'] or 'auth_user' in query['sql']]
+
+    def test_steady_state(self):
+        """After the first request, sessions and users come from the cache."""
+        self.session_and_auth_queries()
+        self.assertEqual(self.session_and_auth_queries(), [])
+
+    def test_user_save_invalidates(self):
+        """A saved user is read again, so deactivating a user logs them out at once."""
+        self.session_and_auth_queries()
+        self.user.is_active = False
+        self.user.save()
+        response = self.client.get(self.url)
+        self.assertRedirects(response, f"/accounts/login/?next={self.url}", fetch_redirect_response=False)
+
+    def test_password_change_ends_session(self):
+        """Changing the password ends the cached user's other sessions."""
+        self.session_and_auth_queries()
+        self.user.set_password("changed456")
+        self.user.save()
+        self.assertEqual(self.client.get(self.url).status_code, 302)
+
+
+class SharedCacheCheckTest(SimpleTestCase):
+    """Test for the system check of cached sessions and users."""
+
+    @override_settings(AUTHENTICATION_BACKENDS=['polls.auth.CachedModelBackend'],
+                       SESSION_ENGINE='django.contrib.sessions.backends.cached_db')
+    def test_per_process_cache(self):
+        """Cached sessions and users in a LocMem cache are reported."""
+        self.assertEqual([warning.id for warning in check_shared_cache(None)], ['polls.W001', 'polls.W002'])
+
+    @override_settings(AUTHENTICATION_BACKENDS=['polls.auth.CachedModelBackend'],
+                       SESSION_ENGINE='django.contrib.sessions.backends.cached_db',
+                       CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}})
+    def test_shared_cache(self):
+        """Cached sessions and users in a shared cache are fine."""
+        self.assertEqual(check_shared_cache(None), [])
+
+    def test_results_cache(self):
+        """A deployment with a per-process results cache is warned, one with a shared cache is not."""
+        self.assertEqual([warning.id for warning in check_shared_results_cache(None)], ['polls.W003'])
+        with self.settings(CACHES={'default': {'BACKEND': 'django.core.cache.backends.redis.RedisCache'}}):
+            self.assertEqual(check_shared_results_cache(None), [])
+
+    def test_default_profile(self):
+        """Without a shared cache the settings fall back to database sessions and the plain backend."""
+        self.assertEqual(check_shared_cache(None), [])
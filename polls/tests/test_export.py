@@ -0,0 +1,124 @@
+"""Test for the streamed exports of votes and tallies."""
+import csv
+import datetime
+import json
+import tracemalloc
+from io import StringIO
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from django.urls import reverse
+from polls.export import export_lines
+from polls.models import Choice, Vote
+from polls.voting import rebuild_tallies, record_vote
+from .test_base import create_question
+
+
+class ExportTest(TestCase):
+    """Test for export_lines."""
+
+    def setUp(self) -> None:
+        """Create an old and a recent question with votes."""
+        self.users = [User.objects.create_user(username=f"voter{number}") for number in range(2)]
+        self.old = create_question("old", days=-30)
+        self.recent = create_question("recent", days=-1)
+        self.apple = self.old.choice_set.create(choice_text="apple")
+        self.banana = self.recent.choice_set.create(choice_text="banana, ripe")
+        for user in self.users:
+            record_vote(user, self.apple)
+        record_vote(self.users[0], self.banana)
+
+    def test_votes_csv(self):
+        """Votes CSV has a header and one (user, question, choice) row per vote."""
+        rows = list(csv.reader(export_lines('votes', 'csv')))
+        self.assertEqual(rows[0], ['user', 'question_id', 'question', 'choice_id', 'choice'])
+        self.assertEqual(rows[1:], [
+            ['voter0', str(self.old.id), 'old', str(self.apple.id), 'apple'],
+            ['voter1', str(self.old.id), 'old', str(self.apple.id), 'apple'],
+            ['voter0', str(self.recent.id), 'recent', str(self.banana.id), 'banana, ripe'],
+        ])
+
+    def test_tallies_jsonl(self):
+        """Tallies JSON lines have one object per choice with its vote count."""
+        rows = [json.loads(line) for line in export_lines('tallies', 'jsonl', question=self.old.id)]
+        self.assertEqual(rows, [{'question_id': self.old.id, 'question': 'old', 'choice_id': self.apple.id,
+                                 'choice': 'apple', 'votes': 2}])
+
+    def test_date_range(self):
+        """A date range selects the votes of the questions published in it."""
+        today = datetime.date.today()
+        lines = list(export_lines('votes', 'jsonl', since=today - datetime.timedelta(days=7), until=today))
+        self.assertEqual([json.loads(line)['question'] for line in lines], ['recent'])
+
+    def test_one_query(self):
+        """The whole export is read with one joined query."""
+        with self.assertNumQueries(1):
+            list(export_lines('votes', 'csv'))
+
+    def test_memory_flat(self):
+        """Exporting ten times the votes does not take noticeably more memory."""
+        def peak_memory():
+            tracemalloc.start()
+            for _ in export_lines('votes', 'jsonl', chunk_size=100):
+                pass
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            return peak
+
+        users = User.objects.bulk_create([User(username=f"crowd{number}") for number in range(100)])
+        questions = [create_question(f"question {number}", days=-2) for number in range(50)]
+        choices = Choice.objects.bulk_create([Choice(question=question, choice_text="yes") for question in questions])
+        Vote.objects.bulk_create([Vote(user=user, question=choice.question, choice=choice)
+                                  for choice in choices[:5] for user in users])
+        small = peak_memory()
+        Vote.objects.bulk_create([Vote(user=user, question=choice.question, choice=choice)
+                                  for choice in choices[5:] for user in users])
+        rebuild_tallies()
+        self.assertLess(peak_memory(), small * 1.5)
+
+
+class ExportViewTest(TestCase):
+    """Test for the export view and command."""
+
+    def setUp(self) -> None:
+        """Create a question with a vote and a staff member."""
+        self.staff = User.objects.create_user(username="staff", is_staff=True)
+        self.question = create_question("test", days=-1)
+        record_vote(self.staff, self.question.choice_set.create(choice_text="apple"))
+        self.url = reverse('polls:export', args=('votes', 'csv'))
+
+    def test_staff_only(self):
+        """Visitors who are not staff are sent to the admin login."""
+        self.client.force_login(User.objects.create_user(username="voter"))
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, 302)
+        self.assertIn(reverse('admin:login'), response.url)
+
+    def test_streamed_download(self):
+        """Staff get the export as a streamed attachment."""
+        self.client.force_login(self.staff)
+        response = self.client.get(self.url, {'question': self.question.id})
+        self.assertTrue(response.streaming)
+        self.assertEqual(response['Content-Disposition'], 'attachment; filename="votes.csv"')
+        self.assertEqual(len(b''.join(response.streaming_content).decode().splitlines()), 2)
+
+    async def test_async_stream(self):
+        """Under ASGI the lines come from an async iterator."""
+        await sync_to_async(self.async_client.force_login)(self.staff)
+        response = await self.async_client.get(reverse('polls:export', args=('tallies', 'jsonl')))
+        lines = [line async for line in response.streaming_content]
+        self.assertEqual(json.loads(lines[0])['votes'], 1)
+
+    def test_bad_date(self):
+        """A date that is not YYYY-MM-DD is a bad request."""
+        self.client.force_login(self.staff)
+        self.assertEqual(self.client.get(self.url, {'since': 'last week'}).status_code, 400)
+
+    def test_command(self):
+        """The command writes the same export to standard output."""
+        out = StringIO()
+        call_command('export_polls', 'tallies', '--format', 'jsonl', stdout=out)
+        self.assertEqual(json.loads(out.getvalue())['choice'], 'apple')
+        with self.assertRaises(CommandError):
+            call_command('export_polls', 'votes', '--since', '2023-02-30')
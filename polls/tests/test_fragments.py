@@ -0,0 +1,90 @@
+"""Test for the cached choice list and results table fragments."""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase
+from django.urls import reverse
+from polls.voting import record_vote
+from .test_base import create_question
+
+
+class ChoiceFragmentTest(TestCase):
+    """The detail page's choice list is cached per question, choices version and voted choice."""
+
+    def setUp(self) -> None:
+        """Create a question with choices and log a voter in."""
+        cache.clear()
+        self.user = User.objects.create_user(username="demo_test", password="test123")
+        self.client.login(username="demo_test", password="test123")
+        self.question = create_question("test", days=-1)
+        self.apple = self.question.choice_set.create(choice_text="apple")
+        self.banana = self.question.choice_set.create(choice_text="banana")
+        self.url = reverse('polls:detail', args=(self.question.id,))
+
+    def test_warm_detail_skips_choices(self):
+        """Once the fragment is cached, the page only queries the question and vote besides session and user."""
+        self.client.get(self.url)
+        with self.assertNumQueries(3):
+            response = self.client.get(self.url)
+        self.assertContains(response, "banana")
+
+    def test_voters_see_their_own_choice(self):
+        """Voters who picked different choices each get their own choice checked."""
+        other = User.objects.create_user(username="other")
+        record_vote(self.user, self.apple)
+        record_vote(other, self.banana)
+        self.assertContains(self.client.get(self.url), f'value="{self.apple.id}" checked')
+        self.client.force_login(other)
+        response = self.client.get(self.url)
+        self.assertContains(response, f'value="{self.banana.id}" checked')
+        self.assertNotContains(response, f'value="{self.apple.id}" checked')
+
+    def test_choice_edit_invalidates(self):
+        """Saving, adding or deleting a choice (as ChoiceInline does) shows up on the next request."""
+        self.client.get(self.url)
+        self.apple.choice_text = "green apple"
+        self.apple.save()
+        self.question.choice_set.create(choice_text="cherry")
+        self.banana.delete()
+        response = self.client.get(self.url)
+        self.assertContains(response, "green apple")
+        self.assertContains(response, "cherry")
+        self.assertNotContains(response, "banana")
+
+
+class ResultsFragmentTest(TestCase):
+    """The results table is cached per results and choices version."""
+
+    def setUp(self) -> None:
+        """Create a question with a choice and log a voter in."""
+        cache.clear()
+        self.user = User.objects.create_user(username="demo_test", password="test123")
+        self.client.login(username="demo_test", password="test123")
+        self.question = create_question("test", days=-1)
+        self.apple = self.question.choice_set.create(choice_text="apple")
+        self.url = reverse('polls:results', args=(self.question.id,))
+
+    def test_warm_results_skip_counts(self):
+        """Once the table is cached, the page only queries the question."""
+        self.client.get(self.url)
+        with self.assertNumQueries(1):
+            self.client.get(self.url)
+
+    def test_vote_invalidates(self):
+        """A vote shows up in the table on the next request."""
+        self.client.get(self.url)
+        with self.captureOnCommitCallbacks(execute=True):
+            record_vote(self.user, self.apple)
+        self.assertContains(self.client.get(self.url), f'<td id="votes-{self.apple.id}">1</td>', html=False)
+
+    def test_choice_edit_invalidates(self):
+        """Saving, adding or deleting a choice (as ChoiceInline does) shows up in the table on the next request."""
+        banana = self.question.choice_set.create(choice_text="banana")
+        self.client.get(self.url)
+        self.apple.choice_text = "green apple"
+        self.apple.save()
+        self.question.choice_set.create(choice_text="cherry")
+        banana.delete()
+        response = self.client.get(self.url)
+        self.assertContains(response, "green apple")
+        self.assertContains(response, "cherry")
+        self.assertNotContains(response, "banana")
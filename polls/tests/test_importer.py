@@ -0,0 +1,130 @@
+"""Test for the streaming fixture importer."""
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+from unittest import mock
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.db.models import Sum
+from django.test import SimpleTestCase, TestCase
+from polls import importer
+from polls.models import Choice, Question, Vote
+
+DATA = os.path.join(settings.BASE_DIR, 'data')
+
+
+class TempFilesMixin:
+    """Give each test a temporary directory to write fixtures into."""
+
+    def write(self, name, text):
+        """Write a file in the test's temporary directory and return its path."""
+        if not hasattr(self, 'directory'):
+            self.directory = tempfile.mkdtemp()
+            self.addCleanup(shutil.rmtree, self.directory)
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(text)
+        return path
+
+
+class ReadObjectsTest(TempFilesMixin, SimpleTestCase):
+    """Test for read_objects."""
+
+    def test_json_array_in_small_chunks(self):
+        """Objects of a dumpdata file come out one by one, whatever the chunk size."""
+        path = os.path.join(DATA, 'polls-v1.json')
+        with open(path, encoding='utf-8') as file:
+            expected = json.load(file)
+        self.assertEqual([obj for obj, _ in importer.read_objects(path, chunk_size=7)], expected)
+
+    def test_json_lines(self):
+        """One object per line is read as well."""
+        path = self.write('votes.jsonl', '{"pk": 1}\n{"pk": 2}\n\n{"pk": 3}\n')
+        self.assertEqual([obj['pk'] for obj, _ in importer.read_objects(path)], [1, 2, 3])
+
+    def test_restart_from_offset(self):
+        """Reading from an offset returned with an object continues after that object."""
+        path = self.write('choices.json', '[{"choice_text": "50 - 150 ฿"},\n {"choice_text": "฿฿"}, {"pk": 3}]')
+        _, offset = next(importer.read_objects(path, chunk_size=5))
+        self.assertEqual([obj for obj, _ in importer.read_objects(path, offset, chunk_size=5)],
+                         [{"choice_text": "฿฿"}, {"pk": 3}])
+
+    def test_invalid_json(self):
+        """A truncated file is an error."""
+        path = self.write('broken.json', '[{"pk": 1}, {"pk": ')
+        with self.assertRaises(importer.DeserializationError):
+            list(importer.read_objects(path))
+
+
+class ImportPollsCommandTest(TempFilesMixin, TestCase):
+    """Test for manage.py import_polls."""
+
+    def import_polls(self, *paths, **options):
+        """Run the command quietly."""
+        call_command('import_polls', *paths, stdout=StringIO(), **options)
+
+    def test_import_fixtures(self):
+        """The repo's fixtures import in any order, with tallies matching the votes."""
+        self.import_polls(*(os.path.join(DATA, name) for name in ('all.json', 'polls-v1.json', 'users-v1.json')),
+                          batch_size=10)
+        self.assertEqual((Question.objects.count(), Choice.objects.count(), User.objects.count()), (5, 26, 5))
+        self.assertEqual(Choice.objects.aggregate(total=Sum('votes'))['total'], Vote.objects.count())
+        self.assertEqual(Choice.objects.get(pk=14).votes, Vote.objects.filter(choice=14).count())
+
+    def test_resume_after_interruption(self):
+        """An import that died half-way continues where it stopped, without duplicates."""
+        path = self.write('polls.json', open(os.path.join(DATA, 'polls-v1.json'), encoding='utf-8').read())
+        save_batch = importer._save_batch
+        calls = []
+
+        def counted(batch, using):
+            calls.append(len(batch))
+            return save_batch(batch, using)
+
+        def dies_on_third_batch(batch, using):
+            if len(calls) == 2:
+                raise KeyboardInterrupt
+            return counted(batch, using)
+
+        with mock.patch.object(importer, '_save_batch', dies_on_third_batch), self.assertRaises(KeyboardInterrupt):
+            self.import_polls(path, batch_size=5)
+        self.assertEqual(Question.objects.count() + Choice.objects.count(), 10)
+        self.assertTrue(os.path.exists(importer.state_path(path)))
+        calls.clear()
+        with mock.patch.object(importer, '_save_batch', counted):
+            self.import_polls(path, batch_size=5)
+        self.assertEqual(sum(calls), 21)
+        self.assertEqual(Question.objects.count() + Choice.objects.count(), 31)
+        self.assertFalse(os.path.exists(importer.state_path(path)))
+
+    def test_rerun_reports_skipped_rows(self):
+        """Importing a file again inserts nothing, and says so."""
+        path = os.path.join(DATA, 'polls-v1.json')
+        self.import_polls(path, batch_size=7)
+        out = StringIO()
+        call_command('import_polls', path, batch_size=7, stdout=out)
+        self.assertIn("polls.Question: 0 (5 skipped, already there)", out.getvalue())
+        self.assertIn("Imported 0 objects", out.getvalue())
+        self.assertIn("skipped 31.", out.getvalue())
+
+    def test_tallies_rebuilt_on_target_database(self):
+        """The tallies are recounted on the database the rows were imported into."""
+        with mock.patch.object(importer, 'rebuild_tallies') as rebuild:
+            self.import_polls(os.path.join(DATA, 'polls-v1.json'), database='default')
+        rebuild.assert_called_once_with('default')
+
+    def test_missing_reference(self):
+        """A vote of a user who does not exist is reported."""
+        path = self.write('votes.jsonl', json.dumps(
+            {"model": "polls.vote", "pk": 1, "fields": {"user": 999, "question": 1, "choice": 1}}))
+        with self.assertRaises(CommandError):
+            self.import_polls(path)
+        Vote.objects.filter(user_id=999).delete()
+
+    def test_invalid_file(self):
+        """A file that is not JSON is reported."""
+        with self.assertRaises(CommandError):
+            self.import_polls(self.write('broken.json', '[{"model": '))
@@ -0,0 +1,68 @@
+"""Test that the hot queries of polls app are served by indexes."""
+import unittest
+from django.contrib.auth.models import User
+from django.db import connection
+from django.test import TestCase
+from django.utils import timezone
+from polls.models import PendingVote, Question, Vote
+from polls.voting import stale_tallies
+from .test_base import create_question
+
+
+@unittest.skipUnless(connection.vendor == 'sqlite', 'EXPLAIN QUERY PLAN output is SQLite specific.')
+class QueryPlanTest(TestCase):
+    """Check EXPLAIN QUERY PLAN of each hot query for table scans."""
+
+    def setUp(self) -> None:
+        """Create a question, a choice and a voter to build the queries with."""
+        self.user = User.objects.create_user(username="demo_test")
+        self.question = create_question("test")
+        self.choice = self.question.choice_set.create(choice_text="apple")
+
+    def assertUsesIndex(self, queryset):
+        """Fail if the plan of the queryset scans a table instead of searching an index."""
+        plan = queryset.explain()
+        for line in plan.splitlines():
+            if 'SCAN' in line and 'USING' not in line:
+                self.fail(f"table scan in plan of\n{queryset.query}\n{plan}")
+
+    def test_index_page_query(self):
+        """Latest published questions come from the (pub_date, id) index."""
+        self.assertUsesIndex(Question.objects.filter(
+            pub_date__lte=timezone.now()).order_by('-pub_date')[:5])
+
+    def test_keyset_page_query(self):
+        """A later page of the question list is an index range, not a scan."""
+        pub_date, pk = self.question.pub_date, self.question.pk
+        self.assertUsesIndex(Question.objects.filter(pub_date__lte=pub_date).exclude(
+            pub_date=pub_date, pk__gte=pk).order_by('-pub_date', '-pk')[:21])
+
+    def test_available_questions_query(self):
+        """Available published questions come from an index, not a scan."""
+        self.assertUsesIndex(Question.objects.published().filter(available=True).order_by('-pub_date')[:5])
+
+    def test_voting_state_queries(self):
+        """Open, closed and recent questions are index searches too."""
+        for queryset in (Question.objects.open_for_voting(), Question.objects.closed(), Question.objects.recent()):
+            self.assertUsesIndex(queryset)
+
+    def test_user_vote_query(self):
+        """A user's vote on a question is found through the unique index."""
+        self.assertUsesIndex(self.question.vote_set.filter(user=self.user))
+
+    def test_choices_of_question_query(self):
+        """Choices of a question are found through the question index."""
+        self.assertUsesIndex(self.question.choice_set.all())
+
+    def test_votes_per_choice_query(self):
+        """Votes are counted per choice of a question from an index."""
+        self.assertUsesIndex(Vote.objects.filter(question=self.question).values('choice'))
+        self.assertUsesIndex(Vote.objects.filter(choice=self.choice))
+
+    def test_tally_check_query(self):
+        """Counting the votes of every choice looks the votes up by index."""
+        self.assertNotRegex(stale_tallies().explain(), r'SCAN polls_vote(?! USING)')
+
+    def test_pending_votes_of_user_query(self):
+        """A voter's buffered votes are found through the (user, question) index."""
+        self.assertUsesIndex(PendingVote.objects.filter(user=self.user, question=self.question))
@@ -0,0 +1,74 @@
+"""Test for the loadtest command."""
+import json
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+from polls.loadtest import PREFIX, percentile
+from polls.models import Question, Vote
+from polls.ratelimit import vote_limiter
+from .test_base import create_question
+
+
+class LoadTestCommandTest(TestCase):
+    """Test for manage.py loadtest run in-process."""
+
+    def setUp(self) -> None:
+        """Start with no votes counted against the seeded voters' rates."""
+        vote_limiter.buckets.clear()
+
+    def run_loadtest(self, **options):
+        """Run the command with a single voter thread and return its parsed report."""
+        out = StringIO()
+        options = {'users': 3, 'questions': 2, 'rounds': 2, 'concurrency': 1, **options}
+        call_command('loadtest', stdout=out, **options)
+        return json.loads(out.getvalue())
+
+    def test_report_per_endpoint(self):
+        """Every endpoint is reported with its latencies, error rate and queries per request."""
+        report = self.run_loadtest()
+        self.assertEqual(set(report['endpoints']), {'index', 'detail', 'vote', 'results', 'all'})
+        for endpoint in ('index', 'detail', 'vote', 'results'):
+            stats = report['endpoints'][endpoint]
+            self.assertEqual(stats['requests'], 6)
+            self.assertEqual(stats['error_rate'], 0)
+            self.assertEqual(stats['lock_rate'], 0)
+            self.assertGreater(stats['queries_per_request'], 0)
+            self.assertLessEqual(stats['latency_ms']['p50'], stats['latency_ms']['p99'])
+
+    def test_rate_limits_off(self):
+        """More votes per voter than the rate limit allows still measure votes, unless --rate-limit is given."""
+        report = self.run_loadtest(rounds=12)
+        self.assertEqual((report['endpoints']['vote']['error_rate'], report['endpoints']['vote']['rate_limited_rate']),
+                         (0, 0))
+        vote_limiter.buckets.clear()
+        report = self.run_loadtest(rounds=12, rate_limit=True)
+        self.assertEqual(report['endpoints']['vote']['error_rate'], 0)
+        self.assertGreater(report['endpoints']['vote']['rate_limited_rate'], 0)
+
+    def test_seeded_data_removed(self):
+        """Seeded voters, polls and votes are deleted afterwards unless --keep is given."""
+        self.run_loadtest()
+        self.assertFalse(User.objects.filter(username__startswith=PREFIX).exists())
+        self.assertFalse(Question.objects.filter(question_text__startswith=PREFIX).exists())
+        self.run_loadtest(keep=True)
+        self.assertEqual(Vote.objects.filter(user__username__startswith=PREFIX).values('user').distinct().count(), 3)
+
+    def test_other_rows_kept(self):
+        """Only the run's own rows are deleted, not others that share the prefix."""
+        User.objects.create_user(username=f"{PREFIX}someone")
+        create_question(f"{PREFIX}someone's poll", days=-1)
+        self.run_loadtest()
+        self.assertEqual(User.objects.filter(username__startswith=PREFIX).count(), 1)
+        self.assertEqual(Question.objects.filter(question_text__startswith=PREFIX).count(), 1)
+
+    def test_invalid_size(self):
+        """A load test without voters is refused."""
+        with self.assertRaises(CommandError):
+            call_command('loadtest', users=0)
+
+    def test_percentile(self):
+        """Percentiles use the nearest rank."""
+        values = list(range(1, 101))
+        self.assertEqual([percentile(values, p) for p in (50, 95, 99)], [50, 95, 99])
+        self.assertEqual(percentile([7], 99), 7)
@@ -0,0 +1,75 @@
+"""Test for the request metrics middleware and endpoint."""
+import re
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.test import TestCase, override_settings
+from django.urls import reverse
+from polls.metrics import Histogram, registry
+from .test_base import create_question
+
+
+class MetricsMiddlewareTest(TestCase):
+    """Test for Server-Timing headers and the aggregated metrics."""
+
+    def setUp(self) -> None:
+        """Start with cold caches and no recorded requests."""
+        cache.clear()
+        registry.clear()
+        self.question = create_question("test", days=-1)
+        self.question.choice_set.create(choice_text="apple")
+
+    @staticmethod
+    def server_timing(response):
+        """Return the db time, query count, cache hits and misses of a Server-Timing header."""
+        match = re.search(r'db;dur=([\d.]+);desc="(\d+) queries", cache;desc="(\d+) hits (\d+) misses"',
+                          response['Server-Timing'])
+        return float(match[1]), int(match[2]), int(match[3]), int(match[4])
+
+    def test_server_timing(self):
+        """A cold index request misses the cache and queries, a warm one hits it without querying."""
+        url = reverse('polls:index')
+        _, queries, hits, misses = self.server_timing(self.client.get(url))
+        self.assertEqual((queries, hits, misses), (2, 0, 1))
+        self.assertEqual(self.server_timing(self.client.get(url))[1:], (0, 1, 0))
+
+    def test_metrics_per_url_name(self):
+        """The metrics endpoint reports requests, queries and cache lookups per URL name."""
+        url = reverse('polls:results', args=(self.question.id,))
+        for _ in range(3):
+            self.client.get(url)
+        self.client.force_login(User.objects.create_user(username="staff", is_staff=True))
+        metrics = self.client.get(reverse('metrics'))
+        self.assertTrue(metrics['Content-Type'].startswith('text/plain; version=0.0.4'))
+        self.assertContains(metrics, 'polls_request_duration_seconds_count{view="polls:results"} 3')
+        self.assertContains(metrics, 'polls_request_duration_seconds_bucket{view="polls:results",le="+Inf"} 3')
+        self.assertContains(metrics, 'polls_db_queries_total{view="polls:results"} 4')
+        # later requests reuse the cached results table without looking the results up
+        self.assertContains(metrics, 'polls_cache_hits_total{view="polls:results"} 0')
+        self.assertContains(metrics, 'polls_cache_misses_total{view="polls:results"} 1')
+
+    async def test_async_request(self):
+        """Requests served by async views are measured too."""
+        response = await self.async_client.get(reverse('polls:index'))
+        self.assertEqual(self.server_timing(response)[1:], (2, 0, 1))
+
+    def test_metrics_closed_by_default(self):
+        """Without a token, only staff can read the metrics, others get a 404."""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+        self.client.force_login(User.objects.create_user(username="voter"))
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 404)
+
+    @override_settings(POLLS_METRICS_TOKEN='s3cret')
+    def test_metrics_token(self):
+        """With a token set, the metrics need it as a bearer token."""
+        self.assertEqual(self.client.get(reverse('metrics')).status_code, 403)
+        response = self.client.get(reverse('metrics'), HTTP_AUTHORIZATION='Bearer s3cret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_histogram_buckets(self):
+        """Histogram buckets are cumulative and end with +Inf."""
+        histogram = Histogram()
+        for seconds in (0.001, 0.02, 0.02, 30):
+            histogram.observe(seconds)
+        buckets = dict(histogram.buckets())
+        self.assertEqual((buckets['0.005'], buckets['0.025'], buckets['10'], buckets['+Inf']), (1, 3, 3, 4))
+        self.assertAlmostEqual(histogram.sum, 30.041)
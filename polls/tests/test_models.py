@@ -1,5 +1,7 @@
 """Test for models in polls app."""
 import datetime
+import random
+from unittest import mock
 from django.test import TestCase
 from django.utils import timezone
 from polls.models import Question
@@ -68,3 +70,59 @@ class QuestionModelTest(TestCase):
         time = timezone.localtime()
         expired_question.end_date = time - datetime.timedelta(days=1)
         self.assertIs(expired_question.can_vote(), False)
+
+    def test_cannot_vote_before_publication_with_end_date(self):
+        """Return False, for question that is not published yet even though its end_date is ahead."""
+        time = timezone.localtime()
+        future_question = Question(pub_date=time + datetime.timedelta(days=1),
+                                   end_date=time + datetime.timedelta(days=2))
+        self.assertIs(future_question.can_vote(), False)
+
+
+class QuestionQuerySetTest(TestCase):
+    """The SQL voting-state filters select exactly the questions the Python methods accept."""
+
+    # around now, on both sides of every boundary the rules compare with
+    OFFSETS = [datetime.timedelta(days=days, microseconds=micro)
+               for days in (-30, -1, 0, 1, 30) for micro in (-1, 0, 1)] + [datetime.timedelta(hours=-12)]
+    FILTERS = [('published', 'is_published'), ('open_for_voting', 'can_vote'),
+               ('closed', 'is_closed'), ('recent', 'was_published_recently')]
+
+    def setUp(self) -> None:
+        """Fix the current time."""
+        self.now = timezone.now()
+        patcher = mock.patch('django.utils.timezone.now', return_value=self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def create_random_questions(self, rng, count=200):
+        """Create questions with random dates (some without end_date) and availability."""
+        Question.objects.bulk_create([Question(
+            question_text=f"random {number}",
+            pub_date=self.now + rng.choice(self.OFFSETS),
+            end_date=None if rng.random() < 0.3 else self.now + rng.choice(self.OFFSETS),
+            available=rng.random() < 0.8,
+        ) for number in range(count)])
+
+    def test_filters_match_methods(self):
+        """For random questions, each filter returns the questions whose method is True."""
+        for seed in range(5):
+            with self.subTest(seed=seed):
+                Question.objects.all().delete()
+                self.create_random_questions(random.Random(seed))
+                questions = list(Question.objects.all())
+                for name, method in self.FILTERS:
+                    expected = {question.pk for question in questions if getattr(question, method)()}
+                    selected = set(getattr(Question.objects, name)().values_list('pk', flat=True))
+                    self.assertEqual(selected, expected, f"{name}() disagrees with {method}()")
+
+    def test_open_and_closed_are_disjoint(self):
+        """No question is both open for voting and closed."""
+        self.create_random_questions(random.Random(42))
+        self.assertFalse(Question.objects.open_for_voting() & Question.objects.closed())
+
+    def test_one_query(self):
+        """Listing open questions is a single query, however many there are."""
+        self.create_random_questions(random.Random(7), count=500)
+        with self.assertNumQueries(1):
+            list(Question.objects.open_for_voting())
@@ -0,0 +1,78 @@
+"""Test for keyset pagination of questions."""
+import datetime
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from polls.models import Question
+from polls.pagination import decode_cursor, encode_cursor, question_page
+from .test_base import create_question
+
+
+class QuestionPageTest(TestCase):
+    """Test for question_page."""
+
+    def setUp(self) -> None:
+        """Create seven past questions, three of them published at the same time."""
+        same_time = timezone.now() - datetime.timedelta(days=2)
+        self.questions = [create_question(f"question {days}", days=-days) for days in (1, 3, 4, 5)]
+        self.questions[1:1] = reversed([Question.objects.create(question_text=f"tie {number}", pub_date=same_time)
+                                        for number in range(3)])
+
+    def test_pages_cover_every_question_once(self):
+        """Walking the cursors returns every question once, newest first."""
+        seen = []
+        cursor = None
+        while True:
+            questions, cursor = question_page(Question.objects.all(), cursor, size=2)
+            seen.extend(questions)
+            if cursor is None:
+                break
+        self.assertEqual(seen, self.questions)
+
+    def test_page_is_stable_after_new_question(self):
+        """A question published after the first page does not shift the second."""
+        first, cursor = question_page(Question.objects.all(), size=3)
+        create_question("newest")
+        second, _ = question_page(Question.objects.all(), cursor, size=3)
+        self.assertEqual(first + second, self.questions[:6])
+
+    def test_each_page_is_one_query(self):
+        """A deep page costs a single query."""
+        _, cursor = question_page(Question.objects.all(), size=5)
+        with self.assertNumQueries(1):
+            question_page(Question.objects.all(), cursor, size=5)
+
+    def test_cursor_round_trip(self):
+        """A cursor decodes to the pub_date and id it was made from."""
+        question = self.questions[0]
+        self.assertEqual(decode_cursor(encode_cursor(question)), (question.pub_date, question.pk))
+        with self.assertRaises(ValueError):
+            decode_cursor("not-a-cursor")
+
+
+class QuestionListViewTest(TestCase):
+    """Test for the paginated list page and JSON listing."""
+
+    def test_list_page(self):
+        """List page shows published questions only."""
+        past = create_question("past", days=-1)
+        create_question("future", days=1)
+        response = self.client.get(reverse('polls:list'))
+        self.assertEqual(list(response.context['question_list']), [past])
+        self.assertIsNone(response.context['next_cursor'])
+
+    def test_invalid_cursor(self):
+        """A made up cursor is a 404 page and a 400 JSON response."""
+        self.assertEqual(self.client.get(reverse('polls:list'), {'cursor': 'bad'}).status_code, 404)
+        self.assertEqual(self.client.get(reverse('polls:list_json'), {'cursor': 'bad'}).status_code, 400)
+
+    def test_json_listing_links_next_page(self):
+        """JSON listing gives the URL of the next page when there is one."""
+        for days in range(1, 23):
+            create_question(f"question {days}", days=-days)
+        data = self.client.get(reverse('polls:list_json')).json()
+        self.assertEqual(len(data['questions']), 20)
+        self.assertEqual(data['questions'][0]['question_text'], "question 1")
+        data = self.client.get(data['next']).json()
+        self.assertEqual([q['question_text'] for q in data['questions']], ["question 21", "question 22"])
+        self.assertIsNone(data['next'])
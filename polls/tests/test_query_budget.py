@@ -0,0 +1,98 @@
+"""Query budgets of every polls view, independent of how many choices, votes and polls there are."""
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import connection
+from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from polls.models import Choice, Vote
+from polls.ratelimit import vote_limiter
+from polls.voting import rebuild_tallies
+from .test_base import create_question
+
+
+class QueryBudgetTest(TestCase):
+    """Each view runs at most a fixed number of queries with cold caches, as many for a large poll as a small one."""
+
+    @classmethod
+    def setUpTestData(cls):
+        """Create a small poll and a large one with many choices and votes."""
+        cls.voter = User.objects.create_user(username="voter")
+        cls.crowd = User.objects.bulk_create([User(username=f"crowd-{number}") for number in range(200)])
+        cls.small = cls.create_poll("small", choices=2, voters=[cls.voter])
+        cls.large = cls.create_poll("large", choices=40, voters=[cls.voter, *cls.crowd])
+        rebuild_tallies()
+
+    @staticmethod
+    def create_poll(text, choices, voters):
+        """Create a published question whose choices get the given voters' votes round-robin."""
+        question = create_question(text, days=-1)
+        created = Choice.objects.bulk_create([Choice(question=question, choice_text=f"choice {number}")
+                                              for number in range(choices)])
+        Vote.objects.bulk_create([Vote(user=user, question=question, choice=created[number % choices])
+                                  for number, user in enumerate(voters)])
+        return question
+
+    def add_polls(self, count=30):
+        """Publish many more polls, each with choices and votes."""
+        for number in range(count):
+            self.create_poll(f"extra {number}", choices=10, voters=self.crowd[:20])
+        rebuild_tallies()
+
+    def assertQueryBudget(self, budget, *requests):
+        """Fail, listing the SQL, if a request runs more than budget queries or the requests run different counts.
+
+        Every request is made with a cold cache.
+        """
+        counts = []
+        for request in requests:
+            cache.clear()
+            with CaptureQueriesContext(connection) as queries:
+                response = request()
+            self.assertLess(response.status_code, 400)
+            sql = "\n".join(f"  {query['sql']}" for query in queries.captured_queries)
+            self.assertLessEqual(len(queries), budget, f"{len(queries)} queries, budget {budget}:\n{sql}")
+            counts.append((len(queries), sql))
+        self.assertEqual(len({count for count, _ in counts}), 1,
+                         "query count grows with the poll size:\n" + "\n\n".join(sql for _, sql in counts))
+
+    def get(self, name, *args):
+        """Return a function requesting a polls URL."""
+        return lambda: self.client.get(reverse(f'polls:{name}', args=args))
+
+    def test_index(self):
+        """Index page, however many polls, choices and votes there are."""
+        self.assertQueryBudget(2, self.get('index'))
+        self.add_polls()
+        self.assertQueryBudget(2, self.get('index'))
+
+    def test_question_list(self):
+        """Paginated list page and JSON listing of a full page of polls."""
+        self.assertQueryBudget(1, self.get('list'), self.get('list_json'))
+        self.add_polls()
+        self.assertQueryBudget(1, self.get('list'), self.get('list_json'))
+
+    def test_detail_anonymous(self):
+        """Detail page of an anonymous visitor is a redirect to login."""
+        self.assertQueryBudget(0, self.get('detail', self.small.id), self.get('detail', self.large.id))
+
+    def test_detail_voted(self):
+        """Detail page of a voter who already voted, with their choice selected."""
+        self.client.force_login(self.voter)
+        self.assertQueryBudget(4, self.get('detail', self.small.id), self.get('detail', self.large.id))
+
+    def test_results(self):
+        """Results page and JSON results."""
+        self.assertQueryBudget(2, self.get('results', self.small.id), self.get('results', self.large.id))
+        self.assertQueryBudget(2, self.get('results_json', self.small.id), self.get('results_json', self.large.id))
+
+    def test_vote(self):
+        """Vote POST changing the voter's earlier vote."""
+        self.client.force_login(self.voter)
+        vote_limiter.buckets.clear()
+        requests = []
+        for question in (self.small, self.large):
+            url = reverse('polls:vote', args=(question.id,))
+            data = {'choice': question.choice_set.order_by('pk').last().id}
+            requests.append(lambda url=url, data=data: self.client.post(url, data))
+        self.assertQueryBudget(9, *requests)
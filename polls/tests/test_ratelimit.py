@@ -0,0 +1,143 @@
+"""Test for vote rate limits and load shedding."""
+from unittest import mock
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.test import SimpleTestCase, TestCase
+from django.urls import reverse
+from polls import ratelimit
+from polls.models import Vote
+from polls.ratelimit import CacheBuckets, MemoryBuckets, Overloaded, VoteLimiter, WriteQueue, parse_rate
+from .test_base import create_question
+
+
+class Clock:
+    """Clock the tests move forward by hand."""
+
+    def __init__(self):
+        """Start at some point in time."""
+        self.now = 1000.0
+
+    def __call__(self):
+        """Return the current time."""
+        return self.now
+
+
+class BucketsTest(SimpleTestCase):
+    """Test for the memory and cache buckets."""
+
+    def setUp(self) -> None:
+        """Start with empty buckets."""
+        cache.clear()
+        self.clock = Clock()
+
+    def test_memory_refills(self):
+        """Memory buckets allow count votes at once and then one per seconds/count."""
+        buckets = MemoryBuckets(self.clock)
+        self.assertEqual([buckets.take('user:1', 3, 60) for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(buckets.take('user:1', 3, 60), 20)
+        self.assertEqual(buckets.take('user:2', 3, 60), 0)
+        self.clock.now += 20
+        self.assertEqual(buckets.take('user:1', 3, 60), 0)
+        self.assertGreater(buckets.take('user:1', 3, 60), 0)
+
+    def test_memory_prunes_full_buckets(self):
+        """Past MAX_BUCKETS, buckets that have refilled are dropped."""
+        buckets = MemoryBuckets(self.clock)
+        with mock.patch.object(ratelimit, 'MAX_BUCKETS', 2):
+            buckets.take('user:1', 3, 60)
+            self.clock.now += 30
+            buckets.take('user:2', 3, 60)
+            self.clock.now += 30
+            buckets.take('user:3', 3, 60)
+        self.assertEqual(set(buckets._buckets), {'user:2', 'user:3'})
+
+    def test_cache_window(self):
+        """Cache buckets allow count votes per window and say when the next one starts."""
+        buckets = CacheBuckets(self.clock)
+        self.assertEqual([buckets.take('user:1', 2, 60) for _ in range(2)], [0, 0])
+        self.assertAlmostEqual(buckets.take('user:1', 2, 60), 20)
+        self.clock.now += 20
+        self.assertEqual(buckets.take('user:1', 2, 60), 0)
+
+    async def test_cache_window_async(self):
+        """The async cache buckets count in the same windows."""
+        buckets = CacheBuckets(self.clock)
+        self.assertEqual(buckets.take('user:1', 2, 60), 0)
+        self.assertEqual(await buckets.atake('user:1', 2, 60), 0)
+        self.assertGreater(await buckets.atake('user:1', 2, 60), 0)
+
+    def test_parse_rate(self):
+        """Rates are votes/seconds, empty for no limit."""
+        self.assertEqual(parse_rate('10/60'), (10, 60.0))
+        self.assertIsNone(parse_rate(''))
+        for rate in ('10', '0/60', 'ten/60'):
+            with self.assertRaises(ImproperlyConfigured):
+                parse_rate(rate)
+
+    def test_write_queue(self):
+        """The queue admits limit writes at a time and frees a place even when the write fails."""
+        queue = WriteQueue(1)
+        with queue.slot():
+            with self.assertRaises(Overloaded):
+                with queue.slot():
+                    pass
+        with self.assertRaises(ValueError):
+            with queue.slot():
+                raise ValueError
+        self.assertEqual(queue.pending, 0)
+
+
+class VoteLimitTest(TestCase):
+    """Test for the limits in front of the vote view."""
+
+    def setUp(self) -> None:
+        """Create a question and a logged in voter, with two votes a minute per user and three per question."""
+        cache.clear()
+        self.user = User.objects.create_user(username="demo_test", password="test123")
+        self.client.login(username="demo_test", password="test123")
+        self.async_client.force_login(self.user)
+        self.question = create_question("test")
+        self.apple = self.question.choice_set.create(choice_text="apple")
+        self.banana = self.question.choice_set.create(choice_text="banana")
+        self.url = reverse("polls:vote", args=(self.question.id,))
+        patcher = mock.patch('polls.views.vote_limiter', VoteLimiter((2, 60), (3, 60), MemoryBuckets()))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def vote(self, choice):
+        """Post a vote for a choice."""
+        return self.client.post(self.url, {"choice": choice.id})
+
+    def test_user_rate(self):
+        """A voter's third vote within a minute is answered with 429 and not recorded."""
+        self.assertEqual(self.vote(self.apple).status_code, 302)
+        self.assertEqual(self.vote(self.banana).status_code, 302)
+        response = self.vote(self.apple)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.assertEqual(Vote.objects.get(user=self.user).choice, self.banana)
+
+    def test_question_rate(self):
+        """Votes on a question past its rate are refused whoever sends them."""
+        for number in range(3):
+            self.client.force_login(User.objects.create_user(username=f"voter-{number}"))
+            self.assertEqual(self.vote(self.apple).status_code, 302)
+        self.client.force_login(self.user)
+        self.assertEqual(self.vote(self.apple).status_code, 429)
+
+    async def test_async_user_rate(self):
+        """The limits apply to votes served by the ASGI handler too."""
+        for status in (302, 302, 429):
+            response = await self.async_client.post(self.url, {"choice": self.apple.id})
+            self.assertEqual(response.status_code, status)
+        self.assertIn('Retry-After', response)
+
+    def test_load_shedding(self):
+        """With the write queue full, a vote is answered with 503 straight away."""
+        queue = WriteQueue(1)
+        with mock.patch('polls.views.pending_writes', queue), queue.slot():
+            response = self.vote(self.apple)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], str(ratelimit.OVERLOAD_RETRY_AFTER))
+        self.assertFalse(Vote.objects.exists())
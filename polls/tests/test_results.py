@@ -0,0 +1,221 @@
+"""Test for results page and cached results."""
+import asyncio
+import datetime
+import json
+from asgiref.sync import async_to_sync, sync_to_async
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.db import transaction
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from polls import live
+from polls.cache import get_results
+from polls.voting import record_vote
+from .test_base import create_question
+
+
+class ResultsCacheTest(TestCase):
+    """Test for the cached results payload."""
+
+    def setUp(self) -> None:
+        """Create a question with two choices and a voter."""
+        cache.clear()
+        self.user = User.objects.create_user(username="demo_test")
+        self.question = create_question("test")
+        self.apple = self.question.choice_set.create(choice_text="apple")
+        self.banana = self.question.choice_set.create(choice_text="banana")
+
+    def test_results_payload(self):
+        """Payload has counts, total and percentage of each choice."""
+        record_vote(self.user, self.apple)
+        results = get_results(self.question.id)
+        self.assertEqual(results['total'], 1)
+        self.assertEqual([(c['choice_text'], c['votes'], c['percent']) for c in results['choices']],
+                         [('apple', 1, 100.0), ('banana', 0, 0)])
+
+    def test_results_are_cached(self):
+        """The payload is computed with one query and then served from the cache."""
+        with self.assertNumQueries(1):
+            get_results(self.question.id)
+        with self.assertNumQueries(0):
+            get_results(self.question.id)
+
+    def test_vote_invalidates_results(self):
+        """A vote makes the next results read see the new tally."""
+        self.assertEqual(get_results(self.question.id)['total'], 0)
+        with self.captureOnCommitCallbacks(execute=True):
+            record_vote(self.user, self.banana)
+        self.assertEqual(get_results(self.question.id)['total'], 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            record_vote(self.user, self.apple)
+        votes = {c['choice_text']: c['votes'] for c in get_results(self.question.id)['choices']}
+        self.assertEqual(votes, {'apple': 1, 'banana': 0})
+
+    def test_invalidated_after_commit(self):
+        """A vote inside a transaction (e.g. the admin's) invalidates the results once it commits."""
+        get_results(self.question.id)
+        with self.captureOnCommitCallbacks(execute=True):
+            with transaction.atomic():
+                record_vote(self.user, self.apple)
+                # until the commit, readers keep the old version and its payload
+                self.assertEqual(get_results(self.question.id)['total'], 0)
+        self.assertEqual(get_results(self.question.id)['total'], 1)
+
+    def test_choice_edit_invalidates_results(self):
+        """Adding or renaming a choice (e.g. in the admin) makes the next results read see it."""
+        get_results(self.question.id)
+        self.banana.choice_text = "blueberry"
+        self.banana.save()
+        self.question.choice_set.create(choice_text="cherry")
+        texts = [c['choice_text'] for c in get_results(self.question.id)['choices']]
+        self.assertEqual(texts, ['apple', 'blueberry', 'cherry'])
+        response = self.client.get(reverse('polls:results_json', args=(self.question.id,)))
+        self.assertEqual([c['choice_text'] for c in response.json()['choices']], texts)
+
+    def test_results_page(self):
+        """Results page shows each choice's votes and the total."""
+        record_vote(self.user, self.apple)
+        response = self.client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertContains(response, f'<td id="percent-{self.apple.id}">100.0%</td>', html=True)
+        self.assertEqual(response.context['results']['total'], 1)
+
+
+class ResultsJsonTest(TestCase):
+    """Test for the JSON results endpoint."""
+
+    def setUp(self) -> None:
+        """Create a question with a choice and a voter."""
+        cache.clear()
+        self.user = User.objects.create_user(username="demo_test")
+        self.question = create_question("test", days=-1)
+        self.apple = self.question.choice_set.create(choice_text="apple")
+        self.url = reverse('polls:results_json', args=(self.question.id,))
+
+    def test_counts_and_validators(self):
+        """Response has the counts, an ETag and Last-Modified."""
+        record_vote(self.user, self.apple)
+        response = self.client.get(self.url)
+        self.assertEqual(response.json()['choices'][0]['votes'], 1)
+        self.assertTrue(response.has_header('ETag'))
+        self.assertTrue(response.has_header('Last-Modified'))
+        self.assertIn('no-cache', response['Cache-Control'])
+
+    def test_not_modified(self):
+        """A matching If-None-Match gets a 304 with no counting query."""
+        etag = self.client.get(self.url)['ETag']
+        with self.assertNumQueries(1):
+            response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['ETag'], etag)
+        self.assertTrue(response.has_header('Last-Modified'))
+
+    def test_choice_edit_changes_etag(self):
+        """Renaming a choice changes the ETag, so a client never keeps a stale choice list."""
+        etag = self.client.get(self.url)['ETag']
+        self.apple.choice_text = "apricot"
+        self.apple.save()
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['choices'][0]['choice_text'], "apricot")
+
+    def test_vote_changes_etag(self):
+        """A vote changes the ETag, so the next request gets the new counts."""
+        etag = self.client.get(self.url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            record_vote(self.user, self.apple)
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total'], 1)
+
+    def test_if_modified_since(self):
+        """An If-Modified-Since at Last-Modified gets a 304."""
+        last_modified = self.client.get(self.url)['Last-Modified']
+        response = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=last_modified)
+        self.assertEqual(response.status_code, 304)
+
+    def test_closed_poll_cached_for_good(self):
+        """Results of a closed poll are publicly cacheable and immutable."""
+        self.question.end_date = timezone.now() - datetime.timedelta(hours=1)
+        self.question.save()
+        response = self.client.get(self.url)
+        self.assertIn('immutable', response['Cache-Control'])
+        self.assertIn('public', response['Cache-Control'])
+
+    def test_future_question(self):
+        """Unpublished question has no results."""
+        future = create_question("future", days=1)
+        response = self.client.get(reverse('polls:results_json', args=(future.id,)))
+        self.assertEqual(response.status_code, 404)
+
+
+class ResultsStreamTest(TestCase):
+    """Test for the live results stream."""
+
+    def setUp(self) -> None:
+        """Create a question with a choice and a voter."""
+        cache.clear()
+        self.user = User.objects.create_user(username="demo_test")
+        self.question = create_question("test", days=-1)
+        self.apple = self.question.choice_set.create(choice_text="apple")
+        self.url = reverse('polls:results_stream', args=(self.question.id,))
+
+    def vote(self, choice):
+        """Vote for a choice and run the on-commit invalidation, as a committed vote would."""
+        with self.captureOnCommitCallbacks(execute=True):
+            record_vote(self.user, choice)
+
+    @staticmethod
+    def event_data(chunk):
+        """Return the decoded data of a results event."""
+        if isinstance(chunk, bytes):
+            chunk = chunk.decode()
+        data = [line[len('data: '):] for line in chunk.splitlines() if line.startswith('data: ')]
+        return json.loads(data[0])
+
+    async def test_stream_pushes_votes(self):
+        """The stream sends the current counts, then new counts after a vote."""
+        response = await self.async_client.get(self.url)
+        self.assertEqual(response['Content-Type'], 'text/event-stream')
+        stream = response.streaming_content
+        try:
+            first = await asyncio.wait_for(stream.__anext__(), 5)
+            self.assertEqual(self.event_data(first)['total'], 0)
+            await sync_to_async(self.vote)(self.apple)
+            second = await asyncio.wait_for(stream.__anext__(), 5)
+            self.assertEqual(self.event_data(second)['total'], 1)
+        finally:
+            await stream.aclose()
+
+    async def test_listeners_share_one_feed(self):
+        """Streams of the same poll wait on one watcher, which stops once they are gone."""
+        streams = [(await self.async_client.get(self.url)).streaming_content for _ in range(2)]
+        for stream in streams:
+            await asyncio.wait_for(stream.__anext__(), 5)
+        waiting = [asyncio.ensure_future(stream.__anext__()) for stream in streams]
+        await asyncio.sleep(0)
+        self.assertEqual(live.feed._listeners, {self.question.id: 2})
+        watcher = live.feed._task
+        for task in waiting:
+            task.cancel()
+        await asyncio.wait_for(watcher, 5)
+        self.assertEqual(live.feed._listeners, {})
+
+    def test_wsgi_sends_one_event(self):
+        """Without ASGI the current counts are sent once, with a reconnect delay of an hour."""
+        response = self.client.get(self.url)
+        self.assertEqual(self.event_data(response.content)['total'], 0)
+        self.assertContains(response, f'retry: {live.FALLBACK_RECONNECT_MS}\n')
+
+    def test_page_subscribes_under_asgi_only(self):
+        """The results page only opens the stream where the server can stream."""
+        page = reverse('polls:results', args=(self.question.id,))
+        self.assertNotContains(self.client.get(page), 'EventSource')
+        response = async_to_sync(self.async_client.get)(page)
+        self.assertContains(response, 'EventSource')
+
+    def test_future_question(self):
+        """Unpublished question has no stream."""
+        future = create_question("future", days=1)
+        response = self.client.get(reverse('polls:results_stream', args=(future.id,)))
+        self.assertEqual(response.status_code, 404)
@@ -0,0 +1,116 @@
+"""Test for routing polls reads to read replicas."""
+import os
+import sqlite3
+import tempfile
+from collections import Counter
+from contextlib import closing
+from django.contrib.auth.models import User
+from django.core.management import CommandError, call_command
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from polls.models import Question
+from polls.routers import PIN_COOKIE, ReplicaReadMiddleware, ReplicaRouter, _replica_reads, \
+    copy_database, primary, replica_reads
+
+
+@override_settings(POLLS_REPLICAS={'replica1': 3, 'replica2': 1})
+class ReplicaRouterTest(SimpleTestCase):
+    """Test for ReplicaRouter."""
+
+    def setUp(self) -> None:
+        """Create a router with a seeded random generator."""
+        self.router = ReplicaRouter()
+        self.router.random.seed(0)
+
+    def test_reads_go_to_primary_by_default(self):
+        """Outside a read-only request every read goes to the primary."""
+        self.assertIsNone(self.router.db_for_read(Question))
+
+    def test_replicas_chosen_by_weight(self):
+        """Replicas are picked in proportion to their weights."""
+        with replica_reads():
+            picks = Counter(self.router.db_for_read(Question) for _ in range(4000))
+        self.assertEqual(set(picks), {'replica1', 'replica2'})
+        self.assertAlmostEqual(picks['replica1'] / 4000, 0.75, delta=0.03)
+
+    def test_primary_overrides_replica_reads(self):
+        """Reads inside primary() go to the primary even in a read-only request."""
+        with replica_reads(), primary():
+            self.assertIsNone(self.router.db_for_read(Question))
+
+    def test_other_apps_stay_on_primary(self):
+        """Only polls models are read from replicas."""
+        with replica_reads():
+            self.assertIsNone(self.router.db_for_read(User))
+
+    def test_writes_and_migrations_on_primary(self):
+        """Writes go to the primary and replicas are never migrated."""
+        self.assertEqual(self.router.db_for_write(Question), 'default')
+        self.assertFalse(self.router.allow_migrate('replica1', 'polls'))
+        self.assertIsNone(self.router.allow_migrate('default', 'polls'))
+
+
+class ReplicaReadMiddlewareTest(SimpleTestCase):
+    """Test for ReplicaReadMiddleware."""
+
+    def setUp(self) -> None:
+        """Record whether the view was allowed to read from replicas."""
+        self.factory = RequestFactory()
+        self.response = HttpResponse()
+        self.allowed = []
+
+        def view(request):
+            self.allowed.append(_replica_reads.get())
+            return self.response
+
+        self.middleware = ReplicaReadMiddleware(view)
+
+    def test_get_reads_replicas(self):
+        """A GET request reads from the replicas."""
+        self.middleware(self.factory.get('/polls/'))
+        self.assertEqual(self.allowed, [True])
+        self.assertFalse(_replica_reads.get())
+
+    def test_vote_pins_voter_to_primary(self):
+        """A POST reads the primary and pins the voter's next requests to it."""
+        response = self.middleware(self.factory.post('/polls/1/vote/'))
+        self.assertIn(PIN_COOKIE, response.cookies)
+        self.factory.cookies[PIN_COOKIE] = '1'
+        self.middleware(self.factory.get('/polls/1/results/'))
+        self.assertEqual(self.allowed, [False, False])
+
+    async def test_async_view(self):
+        """The middleware also wraps async views."""
+        async def view(request):
+            self.allowed.append(_replica_reads.get())
+            return self.response
+
+        await ReplicaReadMiddleware(view)(self.factory.get('/polls/'))
+        self.assertEqual(self.allowed, [True])
+
+
+class SyncReplicasTest(SimpleTestCase):
+    """Test for copying the primary SQLite file over a replica."""
+
+    def test_copy_database(self):
+        """A copy brings the replica file up to date with the primary."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        source, target = (os.path.join(directory.name, name) for name in ('primary.sqlite3', 'replica.sqlite3'))
+        with closing(sqlite3.connect(source)) as db:
+            db.execute('CREATE TABLE vote (choice INTEGER)')
+            db.execute('INSERT INTO vote VALUES (1)')
+            db.commit()
+            copy_database(source, target)
+            db.execute('INSERT INTO vote VALUES (2)')
+            db.commit()
+        with closing(sqlite3.connect(target)) as replica:
+            self.assertEqual(replica.execute('SELECT count(*) FROM vote').fetchone(), (1,))
+            copy_database(source, target)
+            self.assertEqual(replica.execute('SELECT count(*) FROM vote').fetchone(), (2,))
+
+    @override_settings(POLLS_REPLICAS={})
+    def test_no_replicas(self):
+        """The command fails when no replica is configured."""
+        with self.assertRaises(CommandError):
+            call_command('sync_replicas')
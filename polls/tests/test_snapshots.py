@@ -0,0 +1,97 @@
+"""Test for the frozen results of closed polls."""
+import datetime
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from polls.export import export_rows
+from polls.models import Choice, PendingVote, ResultSnapshot, Vote
+from polls.snapshots import final_results, freeze
+from polls.voting import record_vote
+from .test_base import create_question
+
+
+class ResultSnapshotTest(TestCase):
+    """Closed polls' results are counted once and then read from their snapshot."""
+
+    def setUp(self) -> None:
+        """Create a poll that closed an hour ago with a vote for apple, and an open poll."""
+        cache.clear()
+        self.user = User.objects.create_user(username="demo_test")
+        self.closed = create_question("closed", days=-2)
+        self.apple = self.closed.choice_set.create(choice_text="apple")
+        self.banana = self.closed.choice_set.create(choice_text="banana")
+        record_vote(self.user, self.apple)
+        self.closed.end_date = timezone.now() - datetime.timedelta(hours=1)
+        self.closed.save()
+        self.open = create_question("open", days=-1)
+        self.open.choice_set.create(choice_text="cherry")
+
+    def results_json(self, question):
+        """Return the results JSON of a question."""
+        return self.client.get(reverse('polls:results_json', args=(question.id,))).json()
+
+    def test_is_closed(self):
+        """Only a question whose end date has passed is closed."""
+        self.assertTrue(self.closed.is_closed())
+        self.assertFalse(self.open.is_closed())
+
+    def test_frozen_on_first_request(self):
+        """The first results request after the close stores the snapshot, later ones read only the question."""
+        self.assertEqual(self.results_json(self.closed)['total'], 1)
+        snapshot = ResultSnapshot.objects.get(question=self.closed)
+        self.assertEqual(snapshot.counts, [[self.apple.id, "apple", 1], [self.banana.id, "banana", 0]])
+        self.assertEqual(snapshot.closed_at, self.closed.end_date)
+        with self.assertNumQueries(1):
+            self.client.get(reverse('polls:results_json', args=(self.closed.id,)))
+
+    def test_snapshot_is_final(self):
+        """Once frozen, the results no longer depend on the Vote rows or tallies."""
+        freeze(self.closed.id)
+        Vote.objects.all().delete()
+        Choice.objects.update(votes=7)
+        payload = self.results_json(self.closed)
+        self.assertEqual([(c['choice_text'], c['votes'], c['percent']) for c in payload['choices']],
+                         [('apple', 1, 100.0), ('banana', 0, 0)])
+
+    def test_buffered_votes_are_counted(self):
+        """Votes still in the write-behind buffer are applied before freezing."""
+        voter = User.objects.create_user(username="late")
+        PendingVote.objects.create(user=voter, question=self.closed, choice=self.banana)
+        self.assertEqual(freeze(self.closed.id).total, 2)
+
+    def test_open_question_is_not_frozen(self):
+        """Freezing an open question does nothing."""
+        self.assertIsNone(freeze(self.open.id))
+        self.assertIsNone(final_results(self.open))
+        self.assertFalse(ResultSnapshot.objects.exists())
+
+    def test_finalize_polls(self):
+        """finalize_polls freezes every closed poll once."""
+        out = StringIO()
+        call_command('finalize_polls', stdout=out)
+        call_command('finalize_polls', stdout=out)
+        self.assertEqual(out.getvalue().splitlines(),
+                         ["Froze the results of 1 closed polls.", "Froze the results of 0 closed polls."])
+        self.assertEqual(list(ResultSnapshot.objects.values_list('question_id', flat=True)), [self.closed.id])
+
+    def test_reopen_discards(self):
+        """Moving the end date into the future discards the snapshot and its cached results."""
+        self.results_json(self.closed)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.closed.end_date = timezone.now() + datetime.timedelta(days=1)
+            self.closed.save()
+        self.assertFalse(ResultSnapshot.objects.exists())
+        record_vote(User.objects.create_user(username="voter"), self.banana)
+        self.assertEqual(self.results_json(self.closed)['total'], 2)
+
+    def test_tallies_export(self):
+        """The tallies export freezes closed polls and reads them from their snapshot, after the open ones."""
+        rows = list(export_rows('tallies'))
+        Choice.objects.filter(question=self.closed).update(votes=7)
+        self.assertEqual(list(export_rows('tallies')), rows)
+        self.assertEqual([row[3] for row in rows], ["cherry", "apple", "banana"])
+        self.assertEqual(rows[1][4], 1)
@@ -0,0 +1,77 @@
+"""Test for the tuned SQLite backend under concurrent writers."""
+import os
+import tempfile
+import threading
+import unittest
+from django.db import OperationalError, connection
+from django.test import SimpleTestCase
+from mysite.sqlite3.base import DatabaseWrapper
+
+WRITERS = 16
+VOTES_PER_WRITER = 25
+
+
+@unittest.skipUnless(connection.settings_dict['ENGINE'] == 'mysite.sqlite3', 'Needs the mysite.sqlite3 backend.')
+class ConcurrentWritersTest(SimpleTestCase):
+    """Hammer one file database from many connections at once."""
+
+    def setUp(self) -> None:
+        """Create a tally table in a fresh database file."""
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.settings_dict = {**connection.settings_dict, 'NAME': os.path.join(directory.name, 'stress.sqlite3')}
+        db = self.connect()
+        with db.cursor() as cursor:
+            cursor.execute('CREATE TABLE tally (id INTEGER PRIMARY KEY, votes INTEGER NOT NULL)')
+            cursor.execute('INSERT INTO tally VALUES (1, 0)')
+        db.close()
+
+    def connect(self):
+        """Return a new connection to the stress database."""
+        return DatabaseWrapper(self.settings_dict, 'stress')
+
+    def test_pragmas_applied(self):
+        """A new connection runs in WAL mode with the configured pragmas."""
+        db = self.connect()
+        self.addCleanup(db.close)
+        pragmas = self.settings_dict['OPTIONS']['pragmas']
+        with db.cursor() as cursor:
+            cursor.execute('PRAGMA journal_mode')
+            self.assertEqual(cursor.fetchone()[0].upper(), pragmas['journal_mode'].upper())
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], pragmas['busy_timeout'])
+
+    def test_no_lock_errors(self):
+        """Read-then-write transactions from many threads all commit, none is locked out."""
+        errors = []
+        start = threading.Barrier(WRITERS)
+
+        def writer():
+            db = self.connect()
+            start.wait()
+            try:
+                for _ in range(VOTES_PER_WRITER):
+                    # what transaction.atomic() does, on a connection of our own
+                    db.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+                    with db.cursor() as cursor:
+                        cursor.execute('SELECT votes FROM tally WHERE id = 1')
+                        votes = cursor.fetchone()[0]
+                        cursor.execute('UPDATE tally SET votes = %s WHERE id = 1', [votes + 1])
+                    db.commit()
+                    db.set_autocommit(True)
+            except OperationalError as error:
+                errors.append(error)
+            finally:
+                db.close()
+
+        threads = [threading.Thread(target=writer) for _ in range(WRITERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        self.assertEqual(errors, [])
+        db = self.connect()
+        self.addCleanup(db.close)
+        with db.cursor() as cursor:
+            cursor.execute('SELECT votes FROM tally WHERE id = 1')
+            self.assertEqual(cursor.fetchone()[0], WRITERS * VOTES_PER_WRITER)
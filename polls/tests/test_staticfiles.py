@@ -0,0 +1,88 @@
+"""Test for the precompressed static files storage and the view serving them."""
+import gzip
+import os
+import shutil
+import tempfile
+from django.contrib.staticfiles.storage import staticfiles_storage
+from django.core.management import call_command
+from django.http import Http404
+from django.test import RequestFactory, SimpleTestCase, override_settings
+from mysite import staticfiles
+
+
+@override_settings(STORAGES={
+    'default': {'BACKEND': 'django.core.files.storage.FileSystemStorage'},
+    'staticfiles': {'BACKEND': 'mysite.staticfiles.CompressedManifestStaticFilesStorage'},
+})
+class CompressedStaticFilesTest(SimpleTestCase):
+    """collectstatic writes hashed and compressed copies, which serve() picks by Accept-Encoding."""
+
+    @classmethod
+    def setUpClass(cls):
+        """Collect the static files into a temporary STATIC_ROOT."""
+        super().setUpClass()
+        cls.root = tempfile.mkdtemp(prefix='ku-polls-static-')
+        cls.addClassCleanup(shutil.rmtree, cls.root)
+        cls.enterClassContext(override_settings(STATIC_ROOT=cls.root))
+        call_command('collectstatic', interactive=False, verbosity=0)
+        cls.hashed = staticfiles_storage.stored_name('polls/detail.css')
+
+    def serve(self, path, **headers):
+        """Call the view for a file of STATIC_ROOT."""
+        return staticfiles.serve(RequestFactory().get(f'/static/{path}', **headers), path)
+
+    def test_collected_copies(self):
+        """The hashed name has a gzip copy with the same content."""
+        self.assertRegex(self.hashed, staticfiles.HASHED_NAME)
+        with open(os.path.join(self.root, self.hashed), 'rb') as file:
+            original = file.read()
+        with gzip.open(os.path.join(self.root, self.hashed + '.gz')) as file:
+            self.assertEqual(file.read(), original)
+
+    def test_gzip(self):
+        """A client accepting gzip gets the gzip copy, cached for good."""
+        response = self.serve(self.hashed, HTTP_ACCEPT_ENCODING='gzip, deflate')
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertEqual(response['Content-Type'], 'text/css')
+        self.assertEqual(response['Cache-Control'], staticfiles.IMMUTABLE)
+        self.assertEqual(response['Vary'], 'Accept-Encoding')
+        self.assertNotIn('Content-Disposition', response)
+        self.assertEqual(b''.join(response.streaming_content)[:2], b'\x1f\x8b')
+
+    def test_identity(self):
+        """Without Accept-Encoding, or with gzip refused, the file is sent as it is."""
+        for headers in ({}, {'HTTP_ACCEPT_ENCODING': 'gzip;q=0'}):
+            response = self.serve(self.hashed, **headers)
+            self.assertNotIn('Content-Encoding', response)
+            self.assertEqual(response['Vary'], 'Accept-Encoding')
+
+    def test_brotli(self):
+        """A client accepting brotli gets the brotli copy, when brotli is installed."""
+        if staticfiles.brotli is None:
+            self.skipTest('brotli is not installed')
+        response = self.serve(self.hashed, HTTP_ACCEPT_ENCODING='gzip, br')
+        self.assertEqual(response['Content-Encoding'], 'br')
+
+    def test_not_modified(self):
+        """A matching If-None-Match gets a 304 with the same caching headers and validators."""
+        full = self.serve(self.hashed, HTTP_ACCEPT_ENCODING='gzip')
+        response = self.serve(self.hashed, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=full['ETag'])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response['Cache-Control'], staticfiles.IMMUTABLE)
+        self.assertEqual(response['ETag'], full['ETag'])
+        self.assertEqual(response['Last-Modified'], full['Last-Modified'])
+
+    def test_unhashed_name_revalidates(self):
+        """The original, unhashed name can change, so it is revalidated every time."""
+        self.assertEqual(self.serve('polls/detail.css')['Cache-Control'], 'no-cache')
+
+    def test_missing_files(self):
+        """Missing files, paths outside STATIC_ROOT and the compressed copies themselves are not found."""
+        for path in ('polls/missing.css', '../settings.py', self.hashed + '.gz'):
+            with self.assertRaises(Http404):
+                self.serve(path)
+
+    def test_accepted_encodings(self):
+        """Accept-Encoding codings with a quality of zero are left out, * allows all."""
+        self.assertEqual(staticfiles.accepted_encodings('gzip;q=0.5, br;q=0, identity'), {'gzip', 'identity'})
+        self.assertTrue({'gzip', 'br'} <= staticfiles.accepted_encodings('*'))
@@ -1,12 +1,25 @@
 """Test for views."""
+from unittest import mock
+from asgiref.sync import sync_to_async
+from django.contrib.auth.models import User
+from django.contrib.messages import get_messages
+from django.core.cache import cache
 from django.test import TestCase
 from django.urls import reverse
+from polls import cache as polls_cache
+from polls.models import Question
+from polls.ratelimit import vote_limiter
+from polls.voting import record_vote
 from .test_base import create_question
 
 
 class QuestionIndexViewTest(TestCase):
     """Test for question on index page."""
 
+    def setUp(self) -> None:
+        """Start without a cached index list."""
+        cache.clear()
+
     def test_no_question(self):
         """If no question exist, show the messages."""
         response = self.client.get(reverse('polls:index'))
@@ -30,6 +43,36 @@ class QuestionIndexViewTest(TestCase):
         self.assertQuerysetEqual(response.context['lastest_question_list'],
                                  [question2, question1],)
 
+    def test_unavailable_question(self):
+        """Questions marked unavailable are not listed."""
+        question = create_question(question_text='Past question.', days=-30)
+        Question.objects.create(question_text='Hidden question.', pub_date=question.pub_date, available=False)
+        response = self.client.get(reverse('polls:index'))
+        self.assertQuerysetEqual(response.context['lastest_question_list'], [question])
+
+    def test_index_is_cached(self):
+        """A second index view is served without queries."""
+        create_question(question_text='Past question.', days=-30)
+        self.client.get(reverse('polls:index'))
+        with self.assertNumQueries(0):
+            response = self.client.get(reverse('polls:index'))
+        self.assertEqual(len(response.context['lastest_question_list']), 1)
+
+    def test_saving_question_clears_index(self):
+        """A new question shows on the index page straight away."""
+        self.client.get(reverse('polls:index'))
+        question = create_question(question_text='Past question.', days=-30)
+        response = self.client.get(reverse('polls:index'))
+        self.assertQuerysetEqual(response.context['lastest_question_list'], [question])
+
+    def test_index_expires_at_next_publication(self):
+        """The cached index list expires when the next question is published."""
+        create_question(question_text='Future question.', seconds=30)
+        with mock.patch.object(polls_cache.cache, 'set', wraps=cache.set) as cache_set:
+            self.client.get(reverse('polls:index'))
+        timeout = cache_set.call_args.args[2]
+        self.assertTrue(28 <= timeout <= 30, timeout)
+
 
 class QuestionDetailViewTest(TestCase):
     """Test for question om detail page."""
@@ -49,3 +92,78 @@ class QuestionDetailViewTest(TestCase):
         url = reverse('polls:detail', args=(past_question.id,))
         response = self.client.get(url)
         self.assertEqual(response.status_code, 302)
+
+
+class VoterDetailViewTest(TestCase):
+    """Test for detail and results pages of a logged in voter."""
+
+    def setUp(self) -> None:
+        """Create a question with choices and log a voter in."""
+        cache.clear()
+        self.user = User.objects.create_user(username="demo_test", password="test123")
+        self.client.login(username="demo_test", password="test123")
+        self.question = create_question(question_text='Past Question.', days=-10)
+        self.apple = self.question.choice_set.create(choice_text="apple")
+        self.banana = self.question.choice_set.create(choice_text="banana")
+
+    def test_detail_shows_user_vote(self):
+        """Detail page checks the choice the user voted for."""
+        record_vote(self.user, self.banana)
+        response = self.client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['user_choice_id'], self.banana.id)
+        self.assertContains(response, f'value="{self.banana.id}" checked')
+
+    def test_detail_queries(self):
+        """Question, user's vote and choices take two queries besides session and user."""
+        record_vote(self.user, self.banana)
+        with self.assertNumQueries(4):
+            self.client.get(reverse('polls:detail', args=(self.question.id,)))
+
+    def test_detail_missing_question(self):
+        """A missing question redirects to the index page with a message."""
+        response = self.client.get(reverse('polls:detail', args=(self.question.id + 1,)), follow=True)
+        self.assertRedirects(response, reverse('polls:index'))
+        self.assertEqual([str(message) for message in get_messages(response.wsgi_request)],
+                         ['This question does not exist.'])
+
+    def test_results_queries(self):
+        """Results page fetches the question once and its results once."""
+        with self.assertNumQueries(2):
+            self.client.get(reverse('polls:results', args=(self.question.id,)))
+
+
+class AsyncViewsTest(TestCase):
+    """Test for the views served through the ASGI handler."""
+
+    def setUp(self) -> None:
+        """Create a question with a choice and a logged in voter."""
+        cache.clear()
+        vote_limiter.buckets.clear()
+        self.user = User.objects.create_user(username="demo_test")
+        self.async_client.force_login(self.user)
+        self.question = create_question(question_text='Past Question.', days=-10)
+        self.apple = self.question.choice_set.create(choice_text="apple")
+
+    async def test_index(self):
+        """Index page lists the question."""
+        response = await self.async_client.get(reverse('polls:index'))
+        self.assertContains(response, 'Past Question.')
+
+    async def test_vote_then_detail_and_results(self):
+        """A vote redirects to results, which count it, and detail checks it."""
+        response = await self.async_client.post(reverse('polls:vote', args=(self.question.id,)),
+                                                {'choice': self.apple.id})
+        self.assertRedirects(response, reverse('polls:results', args=(self.question.id,)),
+                             fetch_redirect_response=False)
+        response = await self.async_client.get(reverse('polls:results', args=(self.question.id,)))
+        self.assertEqual(response.context['results']['total'], 1)
+        response = await self.async_client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertEqual(response.context['user_choice_id'], self.apple.id)
+
+    async def test_anonymous_detail_redirects_to_login(self):
+        """Detail page asks anonymous users to log in."""
+        await sync_to_async(self.async_client.logout)()
+        response = await self.async_client.get(reverse('polls:detail', args=(self.question.id,)))
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.url.startswith('/accounts/login/'))
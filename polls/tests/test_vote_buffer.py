@@ -0,0 +1,101 @@
+"""Test for the write-behind vote buffer."""
+from io import StringIO
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from polls.models import PendingVote, Vote
+from polls.ratelimit import vote_limiter
+from polls.voting import enqueue_vote, flush_pending_votes
+from .test_base import create_question
+
+
+@override_settings(POLLS_VOTE_BUFFER=True)
+class VoteBufferTest(TestCase):
+    """Test for buffered votes."""
+
+    def setUp(self) -> None:
+        """Create a question, two choices and a logged in voter."""
+        cache.clear()
+        vote_limiter.buckets.clear()
+        self.user = User.objects.create_user(username="demo_test", password="test123")
+        self.client.login(username="demo_test", password="test123")
+        self.question = create_question("test")
+        self.apple = self.question.choice_set.create(choice_text="apple")
+        self.banana = self.question.choice_set.create(choice_text="banana")
+
+    def tallies(self):
+        """Return the stored tally of each choice by text."""
+        return dict(self.question.choice_set.values_list('choice_text', 'votes'))
+
+    def test_vote_is_buffered(self):
+        """Voting appends to the buffer without writing a Vote."""
+        self.client.post(reverse("polls:vote", args=(self.question.id,)), {"choice": self.apple.id})
+        self.assertEqual(PendingVote.objects.count(), 1)
+        self.assertFalse(Vote.objects.exists())
+
+    def test_flush_keeps_latest_choice(self):
+        """Buffered votes of one user are coalesced to the latest choice."""
+        other = User.objects.create_user(username="other")
+        enqueue_vote(self.user, self.apple)
+        enqueue_vote(other, self.apple)
+        enqueue_vote(self.user, self.banana)
+        self.assertEqual(flush_pending_votes(), 3)
+        self.assertEqual(Vote.objects.get(user=self.user).choice, self.banana)
+        self.assertEqual(self.tallies(), {'apple': 1, 'banana': 1})
+        self.assertFalse(PendingVote.objects.exists())
+
+    def test_flush_changes_existing_vote(self):
+        """A buffered vote replaces the user's applied vote and moves the tally."""
+        enqueue_vote(self.user, self.apple)
+        flush_pending_votes()
+        enqueue_vote(self.user, self.banana)
+        flush_pending_votes()
+        self.assertEqual(Vote.objects.get(user=self.user).choice, self.banana)
+        self.assertEqual(self.tallies(), {'apple': 0, 'banana': 1})
+
+    def test_flush_in_batches(self):
+        """Only batch_size buffered votes are applied per flush."""
+        for number in range(3):
+            enqueue_vote(User.objects.create_user(username=f"voter{number}"), self.apple)
+        self.assertEqual(flush_pending_votes(batch_size=2), 2)
+        self.assertEqual(flush_pending_votes(batch_size=2), 1)
+        self.assertEqual(self.tallies()['apple'], 3)
+
+    def test_voter_reads_own_vote(self):
+        """The voter's results page includes their buffered vote, without applying it."""
+        response = self.client.post(reverse("polls:vote", args=(self.question.id,)),
+                                    {"choice": self.banana.id}, follow=True)
+        self.assertEqual(response.context['results']['total'], 1)
+        self.assertContains(response, f'<td id="votes-{self.banana.id}">1</td>', html=True)
+        self.assertEqual(PendingVote.objects.count(), 1)
+        self.assertEqual(self.tallies(), {'apple': 0, 'banana': 0})
+
+    def test_voter_reads_changed_vote(self):
+        """A buffered change of vote moves the voter's vote in their results, and only theirs."""
+        enqueue_vote(self.user, self.apple)
+        flush_pending_votes()
+        enqueue_vote(self.user, self.banana)
+        url = reverse("polls:results", args=(self.question.id,))
+        votes = {c['choice_text']: c['votes'] for c in self.client.get(url).context['results']['choices']}
+        self.assertEqual(votes, {'apple': 0, 'banana': 1})
+        self.client.logout()
+        self.assertContains(self.client.get(url), f'<td id="votes-{self.apple.id}">1</td>', html=True)
+
+    def test_results_read_does_not_write(self):
+        """Reading the results runs no write, buffered votes or not."""
+        enqueue_vote(self.user, self.apple)
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(reverse("polls:results", args=(self.question.id,)))
+        self.assertFalse([query['sql'] for query in queries
+                          if not query['sql'].startswith('SELECT')], [query['sql'] for query in queries])
+
+    def test_flush_votes_command(self):
+        """flush_votes --once drains the buffer."""
+        enqueue_vote(self.user, self.apple)
+        call_command("flush_votes", once=True, stdout=StringIO())
+        self.assertEqual(self.tallies()['apple'], 1)
+        self.assertFalse(PendingVote.objects.exists())
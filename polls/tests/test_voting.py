@@ -1,7 +1,14 @@
 """Test for voting view."""
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.db import IntegrityError, connection
 from django.test import TestCase
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
-from polls.models import Vote
+from polls.models import Choice, Vote
+from polls.ratelimit import vote_limiter
+from polls.voting import record_vote
 from django.contrib.auth.models import User
 from .test_base import create_question
 
@@ -11,6 +18,7 @@ class VoteViewTest(TestCase):
 
     def setUp(self) -> None:
         """Create user for test."""
+        vote_limiter.buckets.clear()
         self.user = User.objects.create_user(username="demo_test")
         self.user.set_password("test123")
         self.user.save()
@@ -32,7 +40,8 @@ class VoteViewTest(TestCase):
         """Vote count must be increase by 1."""
         question = create_question("")
         choice = question.choice_set.create(choice_text='choice123')
-        Vote.objects.create(question=question, choice=choice, user=self.user)
+        record_vote(self.user, choice)
+        choice.refresh_from_db()
         self.assertEqual(choice.votes, 1)
 
     def test_can_vote_is_authenticated(self):
@@ -77,3 +86,91 @@ class VoteViewTest(TestCase):
         self.assertEqual(self.last_vote(self.user, question).count(), 1)
         # check vote is lasted vote
         self.assertEqual(self.last_vote(self.user, question).get().choice, recent_choice)
+
+    def test_change_vote_moves_tally(self):
+        """Changing a vote takes one from the old choice and gives it to the new one."""
+        question = create_question("test")
+        prev_choice = question.choice_set.create(choice_text="apple")
+        recent_choice = question.choice_set.create(choice_text="banana")
+        self.post_choice(self.user, prev_choice)
+        self.post_choice(self.user, recent_choice)
+        self.post_choice(self.user, recent_choice)
+        prev_choice.refresh_from_db()
+        recent_choice.refresh_from_db()
+        self.assertEqual(prev_choice.votes, 0)
+        self.assertEqual(recent_choice.votes, 1)
+
+    def test_deleted_vote_leaves_tally(self):
+        """Deleting a vote (e.g. with its user) takes it off the tally."""
+        question = create_question("test")
+        choice = question.choice_set.create(choice_text="apple")
+        self.post_choice(self.user, choice)
+        self.user.delete()
+        choice.refresh_from_db()
+        self.assertEqual(choice.votes, 0)
+
+    def test_deleting_question_does_not_load_votes(self):
+        """A question's votes are deleted with it in a fixed number of queries, however many there are."""
+        def delete_with_votes(count):
+            question = create_question("test")
+            choice = question.choice_set.create(choice_text="apple")
+            users = User.objects.bulk_create([User(username=f"voter-{question.pk}-{number}")
+                                              for number in range(count)])
+            Vote.objects.bulk_create([Vote(user=user, question=question, choice=choice) for user in users])
+            with CaptureQueriesContext(connection) as queries:
+                question.delete()
+            self.assertFalse(Vote.objects.filter(question_id=choice.question_id).exists())
+            return len(queries)
+        self.assertEqual(delete_with_votes(50), delete_with_votes(2))
+
+    def test_deleted_user_votes_grouped(self):
+        """A deleted user's votes on several questions come off the tallies in one UPDATE."""
+        choices = [create_question(f"test {number}").choice_set.create(choice_text="apple") for number in range(3)]
+        for choice in choices:
+            self.post_choice(self.user, choice)
+        with CaptureQueriesContext(connection) as queries:
+            self.user.delete()
+        self.assertEqual(len([query for query in queries if query['sql'].startswith('UPDATE "polls_choice"')]), 1)
+        self.assertEqual(list(Choice.objects.values_list('votes', flat=True)), [0, 0, 0])
+
+    def test_duplicate_vote_rejected(self):
+        """The database refuses a second vote row for the same user and question."""
+        question = create_question("test")
+        choice = question.choice_set.create(choice_text="apple")
+        record_vote(self.user, choice)
+        with self.assertRaises(IntegrityError):
+            Vote.objects.create(question=question, choice=choice, user=self.user)
+
+    def test_record_vote_returns_previous_choice(self):
+        """record_vote reports what the user had chosen before."""
+        question = create_question("test")
+        prev_choice = question.choice_set.create(choice_text="apple")
+        recent_choice = question.choice_set.create(choice_text="banana")
+        self.assertIsNone(record_vote(self.user, prev_choice))
+        self.assertEqual(record_vote(self.user, recent_choice), prev_choice.id)
+        self.assertEqual(Vote.objects.get(user=self.user).choice, recent_choice)
+
+
+class RebuildTalliesCommandTest(TestCase):
+    """Test for rebuild_tallies management command."""
+
+    def setUp(self) -> None:
+        """Create a question whose tallies have drifted from its votes."""
+        self.user = User.objects.create_user(username="demo_test")
+        question = create_question("test")
+        self.choice = question.choice_set.create(choice_text="apple", votes=5)
+        Vote.objects.create(question=question, choice=self.choice, user=self.user)
+
+    def test_check_reports_stale_tally(self):
+        """--check fails and leaves the wrong tally alone."""
+        with self.assertRaises(CommandError):
+            call_command("rebuild_tallies", check=True, stdout=StringIO())
+        self.choice.refresh_from_db()
+        self.assertEqual(self.choice.votes, 5)
+
+    def test_rebuild_fixes_tally(self):
+        """Rebuilding recounts the votes, after which --check passes."""
+        call_command("rebuild_tallies", stdout=StringIO())
+        self.choice.refresh_from_db()
+        self.assertEqual(self.choice.votes, 1)
+        call_command("rebuild_tallies", check=True, stdout=StringIO())
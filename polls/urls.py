@@ -1,5 +1,5 @@
 """Import the path function from django."""
-from django.urls import path
+from django.urls import path, re_path
 from . import views
 
 app_name = 'polls'
@@ -7,10 +7,20 @@ app_name = 'polls'
 urlpatterns = [
     # /polls/
     path('', views.IndexView.as_view(), name='index'),
+    # /polls/all/?cursor=...
+    path('all/', views.QuestionListView.as_view(), name='list'),
+    # /polls/questions.json?cursor=...
+    path('questions.json', views.question_list_json, name='list_json'),
     # /polls/5/
     path('<int:pk>/', views.DetailView.as_view(), name='detail'),
     # /polls/5/results/
     path('<int:pk>/results/', views.ResultsView.as_view(), name='results'),
+    # /polls/5/results.json
+    path('<int:pk>/results.json', views.results_json, name='results_json'),
+    # /polls/5/results/stream
+    path('<int:pk>/results/stream', views.results_stream, name='results_stream'),
+    # /polls/export/votes.csv?question=5, /polls/export/tallies.jsonl?since=2023-08-01
+    re_path(r'^export/(?P<kind>votes|tallies)\.(?P<fmt>csv|jsonl)$', views.export, name='export'),
     # /polls/5/vote/
     path('<int:question_id>/vote/', views.vote, name='vote'),
 ]
@@ -1,20 +1,32 @@
 """Views for polls app."""
-from django.shortcuts import render
-from django.http import HttpResponseRedirect
+from asgiref.sync import sync_to_async
+from django.core.handlers.asgi import ASGIRequest
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import Http404, HttpResponse, HttpResponseBadRequest, HttpResponseRedirect, JsonResponse, \
+    StreamingHttpResponse
+from django.db.models import OuterRef, Subquery
 from .models import Question, Choice, Vote
+from .cache import achoices_version, alatest_questions, aresults_version, get_results, results_version
+from .export import FORMATS, aexport_lines, export_filters, export_lines
+from . import live
+from .pagination import question_page
+from .snapshots import question_results
+from .ratelimit import OVERLOAD_RETRY_AFTER, Overloaded, pending_writes, retry_later, vote_limiter
+from .voting import aown_pending_vote, buffering, submit_vote, with_own_vote
 from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
 from django.urls import reverse
 from django.views import generic
-from django.utils import timezone
 from django.contrib import messages
-from django.contrib.auth.decorators import login_required
+from django.contrib.auth.views import redirect_to_login
 from django.contrib.auth.mixins import LoginRequiredMixin
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.functional import SimpleLazyObject
+from django.utils.http import http_date
+from django.views.decorators.http import require_safe
 
-
-def get_queryset(self):
-    """Show the last five question that not including those set to be published in the future."""
-    return Question.objects.filter(
-        pub_date__lte=timezone.now()).order_by('-pub_date')[:5]
+# a year, the longest max-age caches are expected to honour
+CLOSED_RESULTS_MAX_AGE = 365 * 24 * 60 * 60
 
 
 class IndexView(generic.ListView):
@@ -23,13 +35,59 @@ class IndexView(generic.ListView):
     template_name = 'polls/index.html'
     context_object_name = 'lastest_question_list'
 
+    async def get(self, request, *args, **kwargs):
+        """Display the last five question in system (cached until the next one is published)."""
+        self.object_list = await alatest_questions()
+        return self.render_to_response(self.get_context_data())
+
+
+class QuestionListView(generic.ListView):
+    """View for browsing every published question, a page at a time."""
+
+    template_name = 'polls/list.html'
+    context_object_name = 'question_list'
+
     def get_queryset(self):
-        """Display the last five question in system."""
-        return Question.objects.filter(
-            pub_date__lte=timezone.now()).order_by('-pub_date')[:5]
+        """Return the page of published questions after the ``cursor`` parameter."""
+        try:
+            questions, self.next_cursor = question_page(
+                Question.objects.published().filter(available=True),
+                self.request.GET.get('cursor'))
+        except ValueError:
+            raise Http404('Invalid page cursor.')
+        return questions
+
+    def get_context_data(self, **kwargs):
+        """Add the cursor of the next page."""
+        context = super().get_context_data(**kwargs)
+        context['next_cursor'] = self.next_cursor
+        return context
 
 
-class DetailView(LoginRequiredMixin, generic.DetailView):
+def question_list_json(request):
+    """Return a page of published questions as JSON, with the URL of the next page."""
+    try:
+        questions, next_cursor = question_page(
+            Question.objects.published().filter(available=True),
+            request.GET.get('cursor'))
+    except ValueError:
+        return JsonResponse({'error': 'Invalid page cursor.'}, status=400)
+    next_url = None
+    if next_cursor:
+        next_url = request.build_absolute_uri(f"{reverse('polls:list_json')}?cursor={next_cursor}")
+    return JsonResponse({
+        'questions': [{
+            'id': question.id,
+            'question_text': question.question_text,
+            'pub_date': question.pub_date,
+            'end_date': question.end_date,
+            'url': reverse('polls:detail', args=(question.id,)),
+        } for question in questions],
+        'next': next_url,
+    })
+
+
+class DetailView(generic.DetailView):
     """View for detail page."""
 
     model = Question
@@ -37,21 +95,29 @@ class DetailView(LoginRequiredMixin, generic.DetailView):
 
     def get_queryset(self):
         """Not! include questions that are not published yet."""
-        return Question.objects.filter(pub_date__lte=timezone.now())
+        return Question.objects.published()
 
-    def get(self, request, pk):
+    async def get(self, request, pk):
         """Overide get method, check if question can be vote.
 
+        The question and the id of the user's chosen choice are loaded in one
+        query. The choices are only fetched (a second query) when the cached
+        choice list fragment has to be rendered again.
+
         Arguments:
             request {HTTP_REQUEST}
 
         Returns:
             httpResponse
         """
-        user = request.user
+        user = await get_user(request)
+        if not user.is_authenticated:
+            return redirect_to_login(request.get_full_path())
+        questions = Question.objects.annotate(user_choice_id=Subquery(
+            Vote.objects.filter(question=OuterRef('pk'), user=user).values('choice_id')[:1]))
         # get question or throw error
         try:
-            question = Question.objects.get(pk=pk)
+            question = await questions.aget(pk=pk)
         except Question.DoesNotExist:
             messages.error(request, 'This question does not exist.')
             return HttpResponseRedirect(reverse('polls:index'))
@@ -59,21 +125,11 @@ class DetailView(LoginRequiredMixin, generic.DetailView):
         if not question.can_vote():
             messages.error(request, 'This question not allow to vote for now.')
             return HttpResponseRedirect(reverse('polls:index'))
-        # else
-        try:
-            if not user.is_authenticated:
-                raise Vote.DoesNotExist
-            user_vote = question.vote_set.get(user=user).choice
-        except Vote.DoesNotExist:
-            # render to parent class (detail page)
-            # render to error message 'You did not select a choice or invalid choice.'
-            return super().get(request, pk)
-        # go to detail page
-        context = {
-            'question': question,
-            'user_vote': user_vote,
-        }
-        return render(request, 'polls/detail.html', context)
+        # else go to detail page, with the user's vote checked if they voted
+        self.object = question
+        return self.render_to_response(self.get_context_data(
+            object=question, choices=question.choice_set.order_by('pk'),
+            choices_version=await achoices_version(question.pk), user_choice_id=question.user_choice_id))
 
 
 class ResultsView(generic.DetailView):
@@ -84,12 +140,12 @@ class ResultsView(generic.DetailView):
 
     def get_queryset(self):
         """Show the total votes for each choice."""
-        return Question.objects.filter(pub_date__lte=timezone.now())
+        return Question.objects.published()
 
-    def get(self, request, pk):
+    async def get(self, request, pk):
         """Return index page, if question does not exist."""
         try:
-            question = Question.objects.get(pk=pk)
+            question = await Question.objects.aget(pk=pk)
         except Question.DoesNotExist:
             messages.error(request, 'This question does not exist.')
             return HttpResponseRedirect(reverse('polls:index'))
@@ -97,48 +153,147 @@ class ResultsView(generic.DetailView):
         if not question.can_vote():
             messages.error(request, 'This question not allow to vote for now.')
             return HttpResponseRedirect(reverse('polls:index'))
-        # else
-        return super().get(request, pk)
+        # the voter always sees their own (possibly still buffered) vote
+        own_vote = await aown_pending_vote(await get_user(request), question) if buffering() else None
+        self.object = question
+        # the results are only fetched when the cached results table has to be rendered again
+        return self.render_to_response(self.get_context_data(
+            object=question, results_version=await aresults_version(question.pk),
+            choices_version=await achoices_version(question.pk), own_vote=own_vote, live=streams(request, question),
+            results=SimpleLazyObject(lambda: with_own_vote(get_results(question.pk), own_vote))))
+
+
+def streams(request, question):
+    """Return whether the results of a question are streamed live: open polls, under ASGI only."""
+    return isinstance(request, ASGIRequest) and not question.is_closed()
 
 
-@login_required(login_url='/accounts/login')
-def vote(request, question_id):
+@require_safe
+def results_json(request, pk):
+    """Return the vote counts of a question as JSON.
+
+    The ETag and Last-Modified come from the question's results version, so a
+    client that already has the current counts gets a 304 without any
+    counting. Results of closed polls can no longer change: they come from
+    the question's snapshot and may be cached for good.
+    """
+    question = get_object_or_404(Question.objects.published(), pk=pk)
+    version = results_version(question.pk)
+    etag = f'"{question.pk}-{version}"'
+    last_modified = version // 1_000_000_000
+    response = get_conditional_response(request, etag=etag, last_modified=last_modified)
+    if response is None:
+        response = JsonResponse(question_results(question))
+    # a 304 carries the validators too, so caches can refresh the entry they hold
+    response.headers['ETag'] = etag
+    response.headers['Last-Modified'] = http_date(last_modified)
+    if question.can_vote():
+        patch_cache_control(response, no_cache=True)
+    else:
+        patch_cache_control(response, public=True, max_age=CLOSED_RESULTS_MAX_AGE, immutable=True)
+    return response
+
+
+async def results_stream(request, pk):
+    """Stream the vote counts of a question as Server-Sent Events.
+
+    Under WSGI a long-lived stream would hold a worker thread, so only the
+    current counts are sent, and the browser is asked not to reconnect for an
+    hour (the results page does not subscribe there at all). The final counts
+    of a closed poll never change and are sent the same way.
+    """
+    try:
+        question = await Question.objects.published().aget(pk=pk)
+    except Question.DoesNotExist:
+        raise Http404('This question does not exist.')
+    if streams(request, question):
+        response = StreamingHttpResponse(live.results_events(question.pk), content_type='text/event-stream')
+    else:
+        version = await sync_to_async(results_version)(question.pk)
+        payload = await sync_to_async(question_results)(question)
+        response = HttpResponse(live.results_event(payload, version, live.FALLBACK_RECONNECT_MS),
+                                content_type='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # keep proxies such as nginx from buffering the stream
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+@staff_member_required
+@require_safe
+def export(request, kind, fmt):
+    """Stream every vote or every choice tally as CSV or JSON lines, for staff.
+
+    ``?question=<id>``, ``?since=YYYY-MM-DD`` and ``?until=YYYY-MM-DD`` (by
+    question publication date) narrow the export down.
+    """
+    try:
+        filters = export_filters(*(request.GET.get(name) for name in ('question', 'since', 'until')))
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    lines = aexport_lines if isinstance(request, ASGIRequest) else export_lines
+    response = StreamingHttpResponse(lines(kind, fmt, **filters), content_type=FORMATS[fmt])
+    response.headers['Content-Disposition'] = f'attachment; filename="{kind}.{fmt}"'
+    return response
+
+
+async def vote(request, question_id):
     """Voting for polls."""
-    user = request.user
-    print("current user is", user.id, "login", user.username)
+    user = await get_user(request)
+    if not user.is_authenticated:
+        return redirect_to_login(request.get_full_path(), '/accounts/login')
+    # turn away a voter over their or the question's vote rate before touching the database
+    wait = await vote_limiter.acheck(user.pk, question_id)
+    if wait:
+        return retry_later(429, wait, 'Too many votes, please try again shortly.')
     # get question or throw error
-    question = get_object_or_404(Question, pk=question_id)
+    try:
+        question = await Question.objects.aget(pk=question_id)
+    except Question.DoesNotExist:
+        raise Http404('No Question matches the given query.')
     try:
         # if user didn't select vote choice,
-        select_choice = question.choice_set.get(pk=request.POST['choice'])
+        select_choice = await question.choice_set.aget(pk=request.POST['choice'])
     # it will render you to detail page and show error messages.
     except (KeyError, Choice.DoesNotExist):
         context = {
             'question': question,
+            'choices': question.choice_set.order_by('pk'),
+            'choices_version': await achoices_version(question.pk),
             'error_message': 'You did not select a choice or invalid choice.',
         }
-        return render(request, 'polls/detail.html', context)
+        return TemplateResponse(request, 'polls/detail.html', context)
     else:
         # check question can vote or not (expired or not)
         if question.can_vote():
+            # transactions are sync only, so the write runs in a thread; when too
+            # many writes are queued for it already, ask the voter to come back
             try:
-                user_vote = question.vote_set.get(user=user)
-                user_vote.choice = select_choice
-                user_vote.save()
-            except Vote.DoesNotExist:
-                Vote.objects.create(
-                                user=user,
-                                choice=select_choice,
-                                question=select_choice.question).save()
+                with pending_writes.slot():
+                    await sync_to_async(submit_vote)(user, select_choice)
+            except Overloaded:
+                return retry_later(503, OVERLOAD_RETRY_AFTER, 'Too many votes at once, please try again shortly.')
         else:
             # if question cannot vote(expired),
             # show error message and redirect to index page.
-            messages.ERROR(request, 'You not allow to vote this question')
+            messages.error(request, 'You not allow to vote this question')
             return HttpResponseRedirect(reverse('polls:index'))
         # vote complete will redicrect to result page
         return HttpResponseRedirect(reverse('polls:results', args=(question.id,)))
 
 
+async def get_user(request):
+    """Return the request's user, resolving the lazy session lookup outside the event loop."""
+    if hasattr(request, 'auser'):
+        return await request.auser()
+
+    def resolve():
+        # touching the lazy object loads the user, after that it is a plain attribute
+        request.user.is_authenticated
+        return request.user
+    return await sync_to_async(resolve)()
+
+
 class EyesOnlyView(LoginRequiredMixin, generic.ListView):
     """Class login view."""
 
@@ -0,0 +1,231 @@
+"""Recording votes and keeping the stored per-choice tallies in step.
+
+Votes are normally applied as they arrive (record_vote). With the
+``POLLS_VOTE_BUFFER`` setting on, the vote view only appends them to the
+PendingVote staging table (enqueue_vote), and ``manage.py flush_votes`` applies
+them in batches (flush_pending_votes), keeping the latest choice of each user
+per question.
+
+Read-your-own-write: a voter is always shown their own vote on the results
+page. The results view reads that voter's latest buffered vote for the
+question, if any, with one indexed SELECT (aown_pending_vote) and moves one
+vote from their applied choice to the buffered one in the payload of that
+response only (with_own_vote). Reading never writes; only the flusher applies
+buffered votes. Other visitors see the vote once the flusher has applied it,
+i.e. after at most ``POLLS_VOTE_BUFFER_INTERVAL`` seconds.
+"""
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import DEFAULT_DB_ALIAS, transaction
+from django.db.models import Case, Count, F, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+from .cache import bump_results_version, results_payload
+from .models import Choice, PendingVote, Vote
+
+
+def record_vote(user, choice):
+    """Record the user's vote for a choice, replacing any earlier vote on that question.
+
+    The vote is written with a single insert-or-update on the (user, question)
+    unique constraint, and the tallies are adjusted in the same transaction: a
+    first vote increments the chosen choice, a changed vote moves one vote from
+    the old choice to the new one, and re-submitting the same choice changes
+    nothing. The voter's row is locked first, so concurrent submissions of the
+    same user are applied one after the other. The question's cached results
+    are invalidated once the transaction has committed.
+
+    Arguments:
+        user {User} -- the voter
+        choice {Choice} -- the selected choice
+
+    Returns:
+        int or None: id of the choice the user voted for before, if any.
+    """
+    question_id = choice.question_id
+    with transaction.atomic():
+        previous = User.objects.select_for_update(of=('self',)).filter(pk=user.pk).annotate(
+            previous=Subquery(Vote.objects.filter(user=OuterRef('pk'), question_id=question_id)
+                              .values('choice_id')[:1])
+        ).values_list('previous', flat=True).first()
+        if previous == choice.id:
+            return previous
+        Vote.objects.bulk_create(
+            [Vote(user=user, question_id=question_id, choice=choice)],
+            update_conflicts=True, unique_fields=['user', 'question'], update_fields=['choice'])
+        if previous is None:
+            Choice.objects.filter(pk=choice.id).update(votes=F('votes') + 1)
+        else:
+            Choice.objects.filter(pk__in=(previous, choice.id)).update(votes=Case(
+                When(pk=choice.id, then=F('votes') + 1), default=F('votes') - 1))
+        # runs at once in autocommit, else after the outermost transaction (e.g. the admin's) commits
+        transaction.on_commit(lambda: bump_results_version(question_id))
+    return previous
+
+
+def enqueue_vote(user, choice):
+    """Append the user's vote for a choice to the write-behind buffer."""
+    return PendingVote.objects.create(user=user, question_id=choice.question_id, choice=choice)
+
+
+def buffering():
+    """Return whether votes go through the write-behind buffer (``POLLS_VOTE_BUFFER``)."""
+    return getattr(settings, 'POLLS_VOTE_BUFFER', False)
+
+
+def submit_vote(user, choice):
+    """Record the vote now, or buffer it when ``POLLS_VOTE_BUFFER`` is on."""
+    if buffering():
+        enqueue_vote(user, choice)
+    else:
+        record_vote(user, choice)
+
+
+def flush_pending_votes(batch_size=500, skip_locked=False, **filters):
+    """Apply up to batch_size buffered votes to Vote and the tallies in one transaction.
+
+    Buffered votes are coalesced per (user, question), keeping the latest
+    choice, written with one bulk upsert, and the tallies of every touched
+    choice are moved with one UPDATE.
+
+    Arguments:
+        batch_size {int} -- the most buffered votes to apply
+        skip_locked {bool} -- leave buffered votes locked by another flush alone
+        filters -- restrict the flush, e.g. ``user=..., question=...``
+
+    Returns:
+        int: the number of buffered votes applied.
+    """
+    with transaction.atomic():
+        pending = list(PendingVote.objects.select_for_update(skip_locked=skip_locked).filter(
+            **filters).order_by('pk').values_list('pk', 'user_id', 'question_id', 'choice_id')[:batch_size])
+        if not pending:
+            return 0
+        latest = {}
+        for _, user_id, question_id, choice_id in pending:
+            latest[user_id, question_id] = choice_id
+        previous = {
+            (user_id, question_id): choice_id
+            for user_id, question_id, choice_id in Vote.objects.filter(
+                user_id__in={key[0] for key in latest},
+                question_id__in={key[1] for key in latest},
+            ).values_list('user_id', 'question_id', 'choice_id')
+            if (user_id, question_id) in latest
+        }
+        changed = []
+        deltas = {}
+        for key, choice_id in latest.items():
+            old_choice_id = previous.get(key)
+            if old_choice_id == choice_id:
+                continue
+            changed.append(Vote(user_id=key[0], question_id=key[1], choice_id=choice_id))
+            deltas[choice_id] = deltas.get(choice_id, 0) + 1
+            if old_choice_id is not None:
+                deltas[old_choice_id] = deltas.get(old_choice_id, 0) - 1
+        Vote.objects.bulk_create(changed, batch_size=batch_size, update_conflicts=True,
+                                 unique_fields=['user', 'question'], update_fields=['choice'])
+        deltas = {choice_id: delta for choice_id, delta in deltas.items() if delta}
+        if deltas:
+            Choice.objects.filter(pk__in=deltas).update(votes=F('votes') + Case(
+                *[When(pk=choice_id, then=Value(delta)) for choice_id, delta in deltas.items()],
+                default=Value(0)))
+        PendingVote.objects.filter(pk__in=[row[0] for row in pending]).delete()
+        for question_id in {vote.question_id for vote in changed}:
+            transaction.on_commit(lambda question_id=question_id: bump_results_version(question_id))
+    return len(pending)
+
+
+async def aown_pending_vote(user, question):
+    """Return the voter's latest buffered vote on a question, without applying it.
+
+    Returns:
+        tuple or None: (buffered choice id, applied choice id or None), or
+        None if the buffer is off or the user has no buffered vote there.
+    """
+    if not buffering() or not user.is_authenticated:
+        return None
+    return await PendingVote.objects.filter(user=user, question=question).order_by('-pk').annotate(
+        applied=Subquery(Vote.objects.filter(user=user, question=question).values('choice_id')[:1])
+    ).values_list('choice_id', 'applied').afirst()
+
+
+def with_own_vote(payload, own_vote):
+    """Return a results payload as the voter sees it, with their buffered vote moved in.
+
+    Arguments:
+        payload {dict} -- results payload, as from polls.cache.get_results
+        own_vote {tuple} -- (buffered, applied) choice ids from aown_pending_vote, or None
+    """
+    if own_vote is None or own_vote[0] == own_vote[1]:
+        return payload
+    buffered, applied = own_vote
+    choices = [dict(choice) for choice in payload['choices']]
+    for choice in choices:
+        if choice['id'] == buffered:
+            choice['votes'] += 1
+        elif choice['id'] == applied:
+            choice['votes'] -= 1
+    return results_payload(payload['question_id'], choices)
+
+
+def release_votes(votes):
+    """Take votes that are about to be deleted off their choices' tallies, with one grouped UPDATE.
+
+    Deleting a choice or question needs no call: its tallies go with it.
+    The results versions of the touched questions are bumped once the
+    transaction has committed.
+
+    Arguments:
+        votes {QuerySet} -- the Vote rows about to be deleted
+    """
+    counts = list(votes.order_by().values('choice', 'question').annotate(count=Count('pk')).values_list(
+        'choice', 'question', 'count'))
+    if not counts:
+        return
+    Choice.objects.filter(pk__in={choice_id for choice_id, _, _ in counts}).update(votes=F('votes') - Case(
+        *[When(pk=choice_id, then=Value(count)) for choice_id, _, count in counts], default=Value(0)))
+    for question_id in {question_id for _, question_id, _ in counts}:
+        transaction.on_commit(lambda question_id=question_id: bump_results_version(question_id))
+
+
+def delete_votes(votes):
+    """Delete votes and take them off the tallies in one transaction (e.g. from the admin).
+
+    Returns:
+        int: the number of votes deleted.
+    """
+    with transaction.atomic():
+        release_votes(votes)
+        return votes.delete()[0]
+
+
+def counted_votes():
+    """Return a subquery expression counting the Vote rows of the outer choice."""
+    counts = Vote.objects.filter(choice=OuterRef('pk')).order_by().values(
+        'choice').annotate(total=Count('pk')).values('total')
+    return Coalesce(Subquery(counts), Value(0))
+
+
+def stale_tallies():
+    """Return choices whose stored tally disagrees with their Vote rows.
+
+    Each choice in the result is annotated with ``counted``, the number of
+    Vote rows that actually point at it.
+    """
+    return Choice.objects.annotate(counted=counted_votes()).exclude(
+        votes=F('counted')).order_by('pk')
+
+
+def rebuild_tallies(using=DEFAULT_DB_ALIAS):
+    """Recompute every stored tally from the Vote rows in a single UPDATE.
+
+    Arguments:
+        using {str} -- database alias
+
+    Returns:
+        int: the number of choices updated.
+    """
+    choices = Choice.objects.using(using)
+    updated = choices.update(votes=counted_votes())
+    for question_id in choices.values_list('question_id', flat=True).distinct():
+        bump_results_version(question_id)
+    return updated